@@ -0,0 +1,43 @@
+"""
+Offline Ethereum address validation
+An address must be 40 hex digits (0x prefix optional) and, when written
+in mixed case, carry a valid EIP-55 checksum. No Web3 instance or RPC is
+needed, so /wallet keeps working while the node is down or unconfigured.
+Results are memoised: claims check the same few addresses over and over.
+"""
+import re
+from functools import lru_cache
+# eth_hash (a web3 dependency) alone, not eth_utils: a fraction of the import time
+from eth_hash.auto import keccak
+
+ADDRESS_CACHE_SIZE = 4096
+_ADDRESS_RE = re.compile(r"^(0x)?[0-9a-fA-F]{40}$")
+
+def _checksum(hex_lower):
+    """EIP-55: uppercase each letter whose nibble in keccak(address) is >= 8"""
+    digest = keccak(hex_lower.encode()).hex()
+    return "0x" + "".join(c.upper() if int(d, 16) >= 8 else c for c, d in zip(hex_lower, digest))
+
+def validate_address(addr):
+    """Checksummed address, or None if addr is malformed or fails its checksum"""
+    # Checked before the cache: lru_cache would raise TypeError hashing a list or dict
+    if not isinstance(addr, str):
+        return None
+    return _validate(addr.strip())
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _validate(addr):
+    if not _ADDRESS_RE.match(addr):
+        return None
+    body = addr[-40:]
+    checksummed = _checksum(body.lower())
+    if body not in (body.lower(), body.upper()) and checksummed[2:] != body:
+        return None
+    return checksummed
+
+def checksum_address(addr):
+    """validate_address for trusted configuration, raises ValueError if invalid"""
+    checksummed = validate_address(addr)
+    if checksummed is None:
+        raise ValueError(f"Invalid Ethereum address: {addr!r}")
+    return checksummed
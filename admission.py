@@ -0,0 +1,143 @@
+"""
+Admission stage for /slot and Spin Again
+The cheap in-memory gates run first: maintenance, topic and a
+process-local mirror of the short cooldown. Only spins that pass them
+touch the state backend. Admitted spins then take one of
+ADMISSION_MAX_SPINS slots; when ADMISSION_MAX_PENDING more are already
+waiting the spin is shed (Busy) so the caller can answer right away.
+Rejected /slot commands get a reply at most once per REJECTION_MEMO_TTL.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime
+from telegram import Update
+from state_backend import get_backend
+from config import (
+    ALLOWED_CHAT_ID,
+    ALLOWED_CHAT_USERNAME,
+    ALLOWED_THREAD_ID,
+    MAINTENANCE_MODE,
+    ADMISSION_MAX_SPINS,
+    ADMISSION_MAX_PENDING,
+    REJECTION_MEMO_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Short cooldown ----------------
+SHORT_COOLDOWN = 3
+
+_last_admitted = {}  # user_id -> monotonic time of the last spin let through (this process)
+
+def can_spin_short(user_id):
+    """Check and record the short cooldown in one atomic step (shared by all workers)"""
+    now = datetime.now().timestamp()
+
+    def _check(last):
+        if last is not None and now - last < SHORT_COOLDOWN:
+            return last, (False, SHORT_COOLDOWN - (now - last))
+        return now, (True, 0)
+
+    return get_backend().update("short_cooldown", str(user_id), _check)
+
+def _recently_admitted(user_id):
+    """Seconds left of the short cooldown according to this process, 0 if none"""
+    now = time.monotonic()
+    last = _last_admitted.get(user_id)
+    if last is not None and now - last < SHORT_COOLDOWN:
+        return SHORT_COOLDOWN - (now - last)
+    _last_admitted[user_id] = now
+    if len(_last_admitted) > 10000:
+        for key in [k for k, t in _last_admitted.items() if now - t >= SHORT_COOLDOWN]:
+            del _last_admitted[key]
+    return 0
+
+# ---------------- Topic check ----------------
+def is_allowed_topic(update: Update) -> bool:
+    if update.callback_query:
+        chat = update.callback_query.message.chat
+        thread_id = getattr(update.callback_query.message, 'message_thread_id', None)
+    else:
+        chat = update.effective_chat
+        thread_id = getattr(update.effective_message, 'message_thread_id', None) if update.effective_message else None
+
+    if chat is None:
+        return False
+    if ALLOWED_CHAT_ID is not None:
+        if chat.id != ALLOWED_CHAT_ID:
+            return False
+        if ALLOWED_THREAD_ID is not None:
+            return thread_id == ALLOWED_THREAD_ID
+        return True
+    if ALLOWED_CHAT_USERNAME:
+        chat_username = getattr(chat, 'username', None)
+        if chat_username != ALLOWED_CHAT_USERNAME.lstrip('@'):
+            return False
+        if ALLOWED_THREAD_ID is not None:
+            return thread_id == ALLOWED_THREAD_ID
+        return True
+    return False
+
+# ---------------- Gates ----------------
+def gate(update, user_id):
+    """
+    In-memory gates, no storage access.
+    Returns None if the spin may go on, else (reason, seconds):
+    ("maintenance", 0), ("topic", 0) or ("short_cooldown", seconds left)
+    """
+    if MAINTENANCE_MODE:
+        return "maintenance", 0
+    if not is_allowed_topic(update):
+        return "topic", 0
+    wait = _recently_admitted(user_id)
+    if wait:
+        return "short_cooldown", wait
+    return None
+
+# ---------------- Rejection memo ----------------
+_told = {}  # user_id -> monotonic time until which rejections are not repeated
+
+def should_tell(user_id):
+    """True if a rejected /slot deserves a reply, at most once per REJECTION_MEMO_TTL"""
+    now = time.monotonic()
+    if _told.get(user_id, 0) > now:
+        return False
+    _told[user_id] = now + REJECTION_MEMO_TTL
+    if len(_told) > 10000:
+        for key in [k for k, until in _told.items() if until <= now]:
+            del _told[key]
+    return True
+
+def forget(user_id):
+    """The user got a spin through, the next rejection is news again"""
+    _told.pop(user_id, None)
+
+# ---------------- Pending spins ----------------
+class Busy(Exception):
+    """Too many spins waiting, the caller should ask the user to retry"""
+
+_slots = None
+_waiting = 0
+shed = 0
+
+@contextlib.asynccontextmanager
+async def spin_slot():
+    """Hold one spin slot for the block; raises Busy when the queue is full"""
+    global _slots, _waiting, shed
+    if _slots is None:
+        _slots = asyncio.Semaphore(ADMISSION_MAX_SPINS)
+    if _slots.locked() and _waiting >= ADMISSION_MAX_PENDING:
+        shed += 1
+        logger.warning(f"🚦 Spin queue full ({_waiting} waiting), shedding load")
+        raise Busy()
+    _waiting += 1
+    try:
+        await _slots.acquire()
+    finally:
+        _waiting -= 1
+    try:
+        yield
+    finally:
+        _slots.release()
@@ -0,0 +1,120 @@
+"""
+Claim throughput benchmark against the local fake RPC (fake_rpc.py)
+Runs process_claim for N winners with a given concurrency and reports
+claims per second, claim latency and JSON-RPC calls per claim (by method).
+No real chain, funded keys or network access needed.
+
+Usage:
+    python bench_claims.py [--claims 50] [--concurrency 10] [--signers 3]
+                           [--latency 0.02] [--block-time 0.5] [--failure-rate 0]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _configure_env(signers, port):
+    """config.py reads the environment at import time, so this runs first"""
+    keys = ["0x" + f"{i + 1:064x}" for i in range(signers)]
+    os.environ["RPC_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["PRIVATE_KEY"] = keys[0]
+    os.environ["PRIVATE_KEYS"] = ",".join(keys[1:])
+    os.environ["CONTRACT_ADDRESS"] = "0x" + "c0" * 20
+    os.environ.setdefault("STATE_BACKEND", "memory")
+    os.environ.setdefault("PAYOUT_LEDGER_FILE", ":memory:")
+
+
+async def _run_claims(process_claim, prizes, claims, concurrency):
+    from circuit_breaker import CircuitOpenError
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, results = [], []
+
+    async def _one(i):
+        prize = random.choice(prizes)
+        wallet = "0x" + random.randbytes(20).hex()
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                success, message, tx_hash = await process_claim(prize['name'], wallet, None, i)
+            except CircuitOpenError:
+                # The bot parks these claims until the RPC recovers
+                success, message = False, "parked (RPC circuit open)"
+            latencies.append(time.perf_counter() - start)
+            results.append((success, message))
+
+    await asyncio.gather(*(_one(i) for i in range(claims)))
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--signers", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per RPC request")
+    parser.add_argument("--block-time", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--poll", type=float, default=0.1, help="receipt poll interval")
+    args = parser.parse_args()
+
+    port = _free_port()
+    _configure_env(args.signers, port)
+
+    from fake_rpc import FakeRPC
+    server = FakeRPC(port=port, contract=os.environ["CONTRACT_ADDRESS"], block_time=args.block_time,
+                     latency=args.latency, failure_rate=args.failure_rate).start()
+    server.chain.seed_prizes(payouts=args.claims * 2)
+
+    import fee_engine
+    import web3_payment
+    from config import PRIZES
+    fee_engine.RECEIPT_POLL_INTERVAL = args.poll
+    if not web3_payment.init_web3():
+        sys.exit("Web3 could not be initialized against the fake RPC")
+    server.chain.calls.clear()
+
+    start = time.perf_counter()
+    latencies, results = asyncio.run(_run_claims(web3_payment.process_claim, PRIZES, args.claims, args.concurrency))
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    ok = sum(1 for success, _ in results if success)
+    pending = sum(1 for success, _ in results if success is None)
+    parked = sum(1 for _, message in results if message.startswith("parked"))
+    errors = {}
+    for success, message in results:
+        if success is False and not message.startswith("parked"):
+            errors[message[:60]] = errors.get(message[:60], 0) + 1
+    calls = server.chain.calls
+    total_calls = sum(calls.values())
+    latencies.sort()
+
+    print("=" * 60)
+    print("CLAIM THROUGHPUT BENCHMARK (fake RPC)")
+    print("=" * 60)
+    print(f"claims: {args.claims}  concurrency: {args.concurrency}  signers: {args.signers}")
+    print(f"rpc latency: {args.latency * 1000:.0f} ms  block time: {args.block_time}s  failure rate: {args.failure_rate}")
+    print(f"succeeded: {ok}  pending: {pending}  parked: {parked}  failed: {args.claims - ok - pending - parked}")
+    print(f"elapsed:   {elapsed:8.2f} s")
+    print(f"claims/s:  {args.claims / elapsed:8.2f}")
+    print(f"latency:   p50 {statistics.median(latencies):.2f}s  p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f}s")
+    print(f"rpc calls per claim: {total_calls / args.claims:.2f}")
+    for method, count in calls.most_common():
+        print(f"  {method:28} {count / args.claims:6.2f}")
+    for message, count in errors.items():
+        print(f"  error x{count}: {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Startup benchmark
+Measures:
+  1. import time of main.py in a fresh interpreter (and whether the web3
+     stack was pulled in at import time)
+  2. time-to-first-update: how long post_init blocks before polling can
+     start, against an RPC endpoint that answers slowly
+  3. time until the payout stack is ready in the background
+The old path is measured in a fresh interpreter: import web3_payment and
+the blocking init_web3() that post_init used to run before polling.
+
+Usage:
+    python bench_startup.py [--runs 5] [--rpc-delay 1.0]
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+IMPORT_SNIPPET = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import main\n"
+    "print(time.perf_counter() - t, 'web3' in sys.modules)\n"
+)
+
+# What post_init used to block on before polling could start
+LEGACY_SNIPPET = (
+    "import time\n"
+    "t = time.perf_counter()\n"
+    "import web3_payment\n"
+    "web3_payment.init_web3()\n"
+    "print(time.perf_counter() - t)\n"
+)
+
+
+class SlowRPCHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every JSON-RPC call with a dummy result after a delay"""
+    delay = 1.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.delay)
+        reply = json.dumps({"jsonrpc": "2.0", "id": body.get("id"), "result": "0x1"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubBot:
+    """Bot stand-in for post_init: cached identity and a slow send_photo"""
+    username = "tribo_bench_bot"
+    id = 1
+
+    async def send_photo(self, **kwargs):
+        await asyncio.sleep(0.3)
+        return SimpleNamespace(message_id=1, photo=[SimpleNamespace(file_id="bench")])
+
+    async def delete_message(self, **kwargs):
+        pass
+
+
+def _run_snippet(snippet):
+    return subprocess.run(
+        [sys.executable, "-c", snippet],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout.split()
+
+
+def bench_import(runs):
+    times, loaded = [], False
+    for _ in range(runs):
+        out = _run_snippet(IMPORT_SNIPPET)
+        times.append(float(out[0]))
+        loaded = loaded or out[1] == "True"
+    return statistics.median(times), loaded
+
+
+def bench_legacy(runs):
+    return statistics.median(float(_run_snippet(LEGACY_SNIPPET)[-1]) for _ in range(runs))
+
+
+async def bench_post_init():
+    import main
+    import web3_payment
+    from state_backend import MemoryBackend, set_backend
+    set_backend(MemoryBackend())
+
+    start = time.perf_counter()
+    await main.post_init(SimpleNamespace(bot=StubBot()))
+    first_update = time.perf_counter() - start
+    await web3_payment.wait_until_ready(timeout=120)
+    payout_ready = time.perf_counter() - start
+    return first_update, payout_ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rpc-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    SlowRPCHandler.delay = args.rpc_delay
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowRPCHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["RPC_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["PRIVATE_KEY"] = "0x" + "11" * 32
+    os.environ["CONTRACT_ADDRESS"] = "0x" + "22" * 20
+
+    import_time, web3_loaded = bench_import(args.runs)
+    legacy_sync = bench_legacy(args.runs)
+    first_update, payout_ready = asyncio.run(bench_post_init())
+    server.shutdown()
+
+    print("=" * 60)
+    print("STARTUP BENCHMARK")
+    print("=" * 60)
+    print(f"import main (median of {args.runs}): {import_time * 1000:8.1f} ms")
+    print(f"web3 imported by main:          {web3_loaded}")
+    print(f"post_init -> first update:      {first_update * 1000:8.1f} ms")
+    print(f"post_init -> payouts ready:     {payout_ready * 1000:8.1f} ms")
+    print(f"old blocking startup path:      {legacy_sync * 1000:8.1f} ms (RPC delay {args.rpc_delay}s)")
+
+
+if __name__ == "__main__":
+    main()
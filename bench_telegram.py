@@ -0,0 +1,128 @@
+"""
+End-to-end throughput benchmark against the local fake Bot API (fake_telegram.py)
+Runs the real Application (all handlers, polling, post_init) against the
+stand-in, injects a synthetic stream of /slot commands and Spin Again
+presses, and reports updates per second, reply latency, backlog over
+time, Bot API calls and flood-control (429) hits.
+
+Usage:
+    python bench_telegram.py [--updates 200] [--users 50] [--concurrent 0]
+                             [--callback-share 0.3] [--chat-rate 0] [--global-rate 30]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def _run(server, application, args):
+    errors = Counter()
+
+    async def _count_error(update, context):
+        errors[type(context.error).__name__] += 1
+
+    application.add_error_handler(_count_error)
+    backlog = []
+
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        start = time.perf_counter()
+        server.inject_stream(args.updates, users=args.users, callback_share=args.callback_share)
+        deadline = start + args.timeout
+        last_calls, idle_since = None, time.perf_counter()
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.25)
+            now = time.perf_counter()
+            queued = server.pending_updates() + application.update_queue.qsize()
+            backlog.append((now - start, queued))
+            calls = sum(server.calls.values()) - server.calls["getUpdates"]
+            if calls != last_calls:
+                last_calls, idle_since = calls, now
+            elif queued == 0 and now - idle_since > 2:
+                break
+        elapsed = idle_since - start
+
+        await application.updater.stop()
+        await application.stop()
+    return elapsed, backlog, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrent", type=int, default=0, help="concurrent updates (0 = sequential, like production)")
+    parser.add_argument("--callback-share", type=float, default=0.3, help="fraction of updates that are Spin Again presses")
+    parser.add_argument("--chat-rate", type=int, default=0, help="fake flood limit per chat, msgs/s (0 = off)")
+    parser.add_argument("--global-rate", type=int, default=30, help="fake flood limit for the bot, msgs/s (0 = off)")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    # Journal and state files go to a scratch directory
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="tribo-bench-"))
+
+    # config.py reads the environment at import time, set it up first
+    port = _free_port()
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:fake"
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{port}/bot"
+    os.environ["STATE_BACKEND"] = "memory"
+
+    from fake_telegram import FakeTelegram
+    server = FakeTelegram(port=port, chat_rate=args.chat_rate, global_rate=args.global_rate).start()
+
+    import main as bot_main
+    application = bot_main.build_application(concurrent_updates=args.concurrent or False)
+
+    logging.disable(logging.CRITICAL)
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, backlog, errors = asyncio.run(_run(server, application, args))
+    logging.disable(logging.NOTSET)
+    server.stop()
+
+    latencies = sorted(server.reply_latencies)
+    print("=" * 60)
+    print("END-TO-END BENCHMARK (fake Bot API)")
+    print("=" * 60)
+    print(f"updates: {args.updates}  users: {args.users}  concurrent: {args.concurrent or 'no'}")
+    print(f"flood limits: {args.chat_rate or '-'} msg/s per chat, {args.global_rate or '-'} msg/s global")
+    print(f"elapsed:     {elapsed:8.2f} s")
+    print(f"updates/s:   {args.updates / elapsed:8.2f}")
+    if latencies:
+        print(f"reply latency: p50 {statistics.median(latencies):.2f}s  p95 {_percentile(latencies, 0.95):.2f}s  max {latencies[-1]:.2f}s  ({len(latencies)} replies)")
+    print("backlog (s: queued updates):")
+    step = max(1, len(backlog) // 12)
+    print("  " + "  ".join(f"{t:.0f}:{q}" for t, q in backlog[::step]))
+    print("bot api calls:")
+    for method, count in server.calls.most_common():
+        limited = server.rate_limited.get(method, 0)
+        print(f"  {method:22} {count:6}" + (f"  (429 x{limited})" if limited else ""))
+    for name, count in errors.most_common():
+        print(f"  handler error x{count}: {name}")
+
+
+if __name__ == "__main__":
+    main()
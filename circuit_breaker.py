@@ -0,0 +1,138 @@
+"""
+Circuit breaker around the RPC endpoint
+Every JSON-RPC request goes through a web3 middleware that records its
+outcome. Transport errors (timeouts, refused connections, HTTP 5xx) and
+node-side internal errors count as failures; reverts and other normal
+JSON-RPC errors do not.
+
+  closed     requests flow; opens when CIRCUIT_ERROR_RATE of the requests in
+             the last CIRCUIT_WINDOW seconds failed (at least CIRCUIT_MIN_CALLS)
+  open       requests fail fast with CircuitOpenError for CIRCUIT_OPEN_SECONDS
+  half-open  one probe request at a time; success closes, failure re-opens
+
+Calls that follow up on an already broadcast transaction (receipts,
+rebroadcasts, and anything run through follow_up(), like the fee
+re-estimate of a replacement) are never blocked, so a payout in flight
+is always tracked.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from config import CIRCUIT_WINDOW, CIRCUIT_MIN_CALLS, CIRCUIT_ERROR_RATE, CIRCUIT_OPEN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+# JSON-RPC error codes that mean the node itself is unhealthy
+UNHEALTHY_CODES = {-32603, -32005, -32002}
+ALWAYS_ALLOWED = {"eth_getTransactionReceipt", "eth_getTransactionByHash", "eth_sendRawTransaction"}
+# -32005 from these means "too many results for the range", not an unhealthy node
+RANGE_LIMITED = {"eth_getLogs"}
+
+class CircuitOpenError(Exception):
+    """The RPC circuit is open, the request was not sent"""
+
+# Set while tracking a broadcast transaction; asyncio.to_thread copies it into the thread
+_follow_up = contextvars.ContextVar("rpc_follow_up", default=False)
+
+def follow_up(fn):
+    """Wrap fn so its RPC requests bypass an open circuit"""
+    def call(*args, **kwargs):
+        token = _follow_up.set(True)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _follow_up.reset(token)
+    return call
+
+class CircuitBreaker:
+    def __init__(self, window=CIRCUIT_WINDOW, min_calls=CIRCUIT_MIN_CALLS,
+                 error_rate=CIRCUIT_ERROR_RATE, open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.outcomes = deque()  # (time, ok)
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.outcomes and now - self.outcomes[0][0] > self.window:
+            self.outcomes.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.probing = False
+        logger.error(f"🔌 RPC circuit open, failing fast for {self.open_seconds}s")
+
+    def current_state(self):
+        """State after applying the open timeout"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                logger.info("🔌 RPC circuit half-open, probing")
+            return self.state
+
+    def is_open(self):
+        return self.current_state() == OPEN
+
+    def allow(self):
+        """True if a request may be sent now (claims the probe slot when half-open)"""
+        state = self.current_state()
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, ok):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if ok:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                    logger.info("🔌 RPC circuit closed")
+                else:
+                    self._open(now)
+                return
+            if self.state == OPEN:
+                return
+            self.outcomes.append((now, ok))
+            self._trim(now)
+            failures = sum(1 for _, good in self.outcomes if not good)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate:
+                self._open(now)
+
+    def status(self):
+        state = self.current_state()
+        with self._lock:
+            failures = sum(1 for _, good in self.outcomes if not good)
+            return {"state": state, "calls": len(self.outcomes), "failures": failures}
+
+breaker = CircuitBreaker()
+
+def middleware(make_request, w3):
+    """web3 middleware feeding and enforcing the module breaker"""
+    def request(method, params):
+        if method not in ALWAYS_ALLOWED and not _follow_up.get() and not breaker.allow():
+            raise CircuitOpenError(f"RPC circuit open, {method} not sent")
+        try:
+            response = make_request(method, params)
+        except Exception:
+            # requests' ConnectionError, Timeout and HTTPError, unparsable replies
+            breaker.record(False)
+            raise
+        error = response.get("error") if isinstance(response, dict) else None
+        code = error.get("code") if isinstance(error, dict) else None
+        breaker.record(code not in UNHEALTHY_CODES or (code == -32005 and method in RANGE_LIMITED))
+        return response
+    return request
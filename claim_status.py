@@ -0,0 +1,79 @@
+"""
+One live-updating status message per claim
+The claim is announced once and that message is edited through its
+stages (queued / retrying, submitted, confirmed or failed) instead of
+posting, deleting and re-posting. Intermediate stages arriving faster
+than CLAIM_STATUS_EDIT_INTERVAL are skipped; the final stage always lands.
+"""
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest
+from config import CLAIM_STATUS_EDIT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class ClaimStatus:
+    def __init__(self, bot, chat_id, message_id=None, thread_id=None):
+        """message_id: edit an existing message (e.g. the failed claim being retried)"""
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.thread_id = thread_id
+        self.text = None
+        self.last_edit = 0.0
+
+    async def start(self, reply_to, text):
+        """Post the status message as a reply, or take over the existing one"""
+        if self.message_id is not None:
+            await self.show(text, final=True)
+            return
+        message = await reply_to.reply_text(text, parse_mode='HTML')
+        self.message_id = message.message_id
+        self.text = text
+        self.last_edit = time.monotonic()
+
+    async def _send_new(self, text, reply_markup):
+        message = await self.bot.send_message(
+            chat_id=self.chat_id,
+            message_thread_id=self.thread_id,
+            text=text,
+            parse_mode='HTML',
+            reply_markup=reply_markup
+        )
+        self.message_id = message.message_id
+
+    async def show(self, text, reply_markup=None, final=False):
+        """Edit the status message; non-final edits inside the interval are dropped"""
+        if text == self.text and reply_markup is None:
+            return
+        wait = CLAIM_STATUS_EDIT_INTERVAL - (time.monotonic() - self.last_edit)
+        if wait > 0:
+            if not final:
+                return
+            await asyncio.sleep(wait)
+
+        if self.message_id is None:
+            await self._send_new(text, reply_markup)
+        else:
+            try:
+                await self.bot.edit_message_text(
+                    chat_id=self.chat_id,
+                    message_id=self.message_id,
+                    text=text,
+                    parse_mode='HTML',
+                    reply_markup=reply_markup
+                )
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    # Deleted or too old to edit: post the stage as a new message
+                    logger.warning(f"⚠️ Could not edit claim status, sending a new message: {e}")
+                    await self._send_new(text, reply_markup)
+        self.text = text
+        self.last_edit = time.monotonic()
+
+    def on_sent(self, render):
+        """Callback for process_claim: render(tx_hash) is shown as the submitted stage"""
+        async def _on_sent(tx_hash):
+            await self.show(render(tx_hash))
+        return _on_sent
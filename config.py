@@ -1,6 +1,17 @@
 import os
+from address_utils import checksum_address
 
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+# Bot API endpoint override (e.g. fake_telegram.py), empty = api.telegram.org
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+# Opt-in anonymised update recording for traffic_replay.py (empty = off)
+RECORD_UPDATES_FILE = os.getenv('RECORD_UPDATES_FILE', '')
+RECORD_SALT = os.getenv('RECORD_SALT', '')  # Secret; empty = random per recording
+# Logging: json or text, root level, per-module overrides ("httpx=WARNING,web3_payment=DEBUG")
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', 'httpx=WARNING,apscheduler=WARNING')
+LOG_REPEAT_WINDOW = 60  # seconds an identical warning/error stays muted
 BOT_NAME = "Tribo Slot Game"
 
 ADMIN_USERNAME = "@Ortegaa13"
@@ -15,6 +26,10 @@ MAINTENANCE_MODE = False
 
 RPC_URL = os.getenv('RPC_URL', '')
 PRIVATE_KEY = os.getenv('PRIVATE_KEY', '')
+# Extra payout wallets (comma separated), each must be allowed to call claim()
+PRIVATE_KEYS = [k.strip() for k in os.getenv('PRIVATE_KEYS', '').split(',') if k.strip()]
+# Workers sharing keys lease them in the state backend: one worker per key
+SIGNER_LEASE_TTL = 60  # seconds a lease lives without renewal (renewed every third of it)
 CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS', '')
 CHAIN_ID = int(os.getenv('CHAIN_ID', '4801'))
 
@@ -73,17 +88,99 @@ PRIZES = [
         'amount': 100 * 10**18
     }
 ]
+# Checksummed once here, claims and balance reads use the tokens as they are
+for _prize in PRIZES:
+    _prize['token'] = checksum_address(_prize['token'])
 
 MAX_SPINS_PER_PERIOD = 15
 
+# --- Admission control for /slot bursts ---
+CONCURRENT_UPDATES = 64             # updates handled at once (python-telegram-bot)
+ADMISSION_MAX_SPINS = 12            # spins running at once (~2 Bot API calls/s each, keeps under 30 msg/s)
+ADMISSION_MAX_PENDING = 32          # spins allowed to wait, beyond this they are shed
+REJECTION_MEMO_TTL = 60             # seconds a /slot rejection is not repeated to the same user
+
+# --- Treasury monitor ---
+# Balances are polled in the background; prizes the contract can't pay
+# are weighted by TREASURY_UNPAYABLE_WEIGHT (0 = never drawn)
+TREASURY_POLL_INTERVAL = 300        # seconds between balance polls
+TREASURY_MIN_ETH = 0.0005           # bot gas balance alert / payability threshold (ETH)
+TREASURY_LOW_PAYOUTS = 10           # alert when a prize has fewer payouts left
+TREASURY_UNPAYABLE_WEIGHT = 0.0
+
+# --- Payout ledger (claim attempts + on-chain reconciliation) ---
+PAYOUT_LEDGER_FILE = os.getenv('PAYOUT_LEDGER_FILE', 'payout_ledger.db')
+LEDGER_START_BLOCK = os.getenv('LEDGER_START_BLOCK', '')  # first scan starts here (empty = LEDGER_MAX_RANGE back)
+LEDGER_RECONCILE_INTERVAL = 300     # seconds between eth_getLogs passes
+LEDGER_CONFIRMATIONS = 3            # blocks behind the head scanned (reorg margin)
+LEDGER_MIN_RANGE = 10               # smallest eth_getLogs block range before giving up a pass
+LEDGER_MAX_RANGE = 5000             # largest eth_getLogs block range
+LEDGER_LOGS_TARGET = 500            # the range grows while a query returns fewer logs than this
+LEDGER_LEASE_TTL = 900              # seconds before another worker takes over reconciliation
+
+# --- Gas estimate cache (claim gas limits per token / amount class) ---
+GAS_ESTIMATE_MARGIN = 1.2           # safety margin on top of the estimate
+GAS_ESTIMATE_REFRESH = 900          # seconds between background re-estimates
+
+# --- Claim transaction fees (EIP-1559) ---
+FEE_HISTORY_BLOCKS = 10             # blocks sampled by eth_feeHistory
+FEE_TIP_PERCENTILE = 50             # priority fee percentile paid by recent txs
+FEE_BASE_MULTIPLIER = 2             # maxFee = base fee * this + tip (survives base fee rises)
+TX_REPLACE_AFTER = 30               # seconds before an unmined claim is rebroadcast
+TX_FEE_BUMP = 1.15                  # fee multiplier per rebroadcast (nodes require >= 1.10)
+TX_MAX_REPLACEMENTS = 4             # give up (tx left pending) after this many bumps
+
+# --- RPC circuit breaker (claims are parked while it is open) ---
+CIRCUIT_WINDOW = 60                 # seconds of RPC outcomes considered
+CIRCUIT_MIN_CALLS = 5               # don't judge the endpoint on fewer requests
+CIRCUIT_ERROR_RATE = 0.5            # failure share that opens the circuit
+CIRCUIT_OPEN_SECONDS = 30           # fail fast this long before probing again
+PARKED_RETRY_INTERVAL = 15          # seconds between parked claim retry passes
+
+# --- Claim status message (edited in place: queued -> submitted -> result) ---
+CLAIM_STATUS_EDIT_INTERVAL = 1.0    # min seconds between edits, in-between stages are skipped
+
+# --- Scheduled posts: one entry per chat/topic ---
+# promo_hours: recurring promo interval (0 disables), jitter in minutes
+# daily_stats: post the global stats once a day
+# reset_reminders: announce when the 15h spin period resets
+SCHEDULED_TARGETS = [
+    {
+        'chat_id': ALLOWED_CHAT_ID,
+        'thread_id': ALLOWED_THREAD_ID,
+        'promo_hours': 3,
+        'promo_jitter_minutes': 0,
+        'daily_stats': False,
+        'reset_reminders': False
+    }
+]
+
 # --- Cooldowns separados ---
 WINNER_COOLDOWN_HOURS = 24     # Ganador debe esperar 24h
 LOSER_COOLDOWN_HOURS = 15      # Perder todos los spins: 15h
+STATS_WINDOW_HOURS = 48        # Ventana deslizante de estadísticas globales
 
 SPINS_FILE = 'user_spins.json'
 LOSERS_COOLDOWN_FILE = 'losers_cooldown.json'
 WINNERS_COOLDOWN_FILE = 'winners_cooldown.json'
 USERS_FILE = 'users.json'
+GLOBAL_STATS_FILE = 'global_stats.json'
+LAST_MESSAGE_FILE = 'last_recurring_message.json'
+
+# --- Event journal (spins, results, cooldowns) ---
+JOURNAL_FILE = 'events.ndjson'
+SNAPSHOT_FILE = 'state_snapshot.json'
+JOURNAL_COMPACT_INTERVAL = 600   # seconds between background compactions
+JOURNAL_COMPACT_EVENTS = 5000    # compact early once this many events piled up
+JOURNAL_KEEP_SEGMENTS = 10       # compacted journal segments kept as audit trail, older ones are deleted
+STORAGE_COMMIT_WINDOW = 0.01     # seconds writes are gathered into one fsync'd commit
+EXPORT_CHUNK_BYTES = 10 * 1024 * 1024  # /export document size (bots may upload up to 50 MB)
+
+# --- Shared state backend: json (default), memory, sqlite or redis ---
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'json')
+STATE_DB_FILE = os.getenv('STATE_DB_FILE', 'tribo_state.db')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+CLAIM_LOCK_TTL = 600             # seconds before a retry lock left by a dead worker is taken over
 
 CONTRACT_ABI = [
     {
@@ -109,3 +206,48 @@ CONTRACT_ABI = [
         "type": "function"
     }
 ]
+
+# Multicall3 (same address on every chain it is deployed to)
+MULTICALL_ADDRESS = os.getenv('MULTICALL_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')
+
+MULTICALL_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "address", "name": "addr", "type": "address"}
+        ],
+        "name": "getEthBalance",
+        "outputs": [
+            {"internalType": "uint256", "name": "balance", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
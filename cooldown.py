@@ -1,28 +1,7 @@
-import json
-import os
 from datetime import datetime, timezone, timedelta
-from config import (
-    SPINS_FILE,
-    MAX_SPINS_PER_PERIOD,
-    LOSERS_COOLDOWN_FILE,
-    WINNERS_COOLDOWN_FILE
-)
-
-# -------------------- Helpers JSON --------------------
-
-def _load_json(filepath):
-    """Load JSON file, create empty dict if not exists"""
-    if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-        with open(filepath, "w") as f:
-            json.dump({}, f, indent=2)
-        return {}
-    with open(filepath, "r") as f:
-        return json.load(f)
-
-def _save_json(data, filepath):
-    """Save data to JSON file"""
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+from config import MAX_SPINS_PER_PERIOD, WINNER_COOLDOWN_HOURS, LOSER_COOLDOWN_HOURS
+from state_backend import get_backend
+import event_journal
 
 # -------------------- Period calculation --------------------
 
@@ -42,47 +21,50 @@ def _get_period_start(period_hours):
 
 # -------------------- Cooldowns --------------------
 
-def _check_winner_cooldown(user_id):
-    """Check if user is in winners cooldown (24h)"""
-    winners = _load_json(WINNERS_COOLDOWN_FILE)
+def _parse_ts(ts):
+    if ts.endswith("Z"):
+        ts = ts.replace("Z", "+00:00")
+    return datetime.fromisoformat(ts)
+
+def _check_cooldown(namespace, user_id, cooldown_hours):
+    """Check if user is in the cooldown stored in namespace"""
+    backend = get_backend()
     user_key = str(user_id)
 
-    if user_key in winners:
-        ts = winners[user_key]
-        if ts.endswith("Z"):
-            ts = ts.replace("Z", "+00:00")
-        last_win_time = datetime.fromisoformat(ts)
-        cooldown_seconds = 24 * 3600  # 24h for winners
-        elapsed_seconds = (datetime.now(timezone.utc) - last_win_time).total_seconds()
-        remaining = cooldown_seconds - elapsed_seconds
-        if remaining > 0:
-            return True, remaining
-        else:
-            del winners[user_key]
-            _save_json(winners, WINNERS_COOLDOWN_FILE)
+    ts = backend.get(namespace, user_key)
+    if ts is None:
+        return False, 0
 
+    last_time = _parse_ts(ts)
+    cooldown_seconds = cooldown_hours * 3600
+    elapsed_seconds = (datetime.now(timezone.utc) - last_time).total_seconds()
+    remaining = cooldown_seconds - elapsed_seconds
+    if remaining > 0:
+        return True, remaining
+
+    # Expirado: borrar (vía journal, así el replay no lo resucita)
+    event_journal.emit("cooldown_expired", namespace=namespace, user=user_key, started=ts)
     return False, 0
 
+def _check_winner_cooldown(user_id):
+    """Check if user is in winners cooldown (24h)"""
+    return _check_cooldown("winners", user_id, WINNER_COOLDOWN_HOURS)
+
 def _check_loser_cooldown(user_id):
     """Check if user is in losers cooldown (15h)"""
-    losers = _load_json(LOSERS_COOLDOWN_FILE)
-    user_key = str(user_id)
+    return _check_cooldown("losers", user_id, LOSER_COOLDOWN_HOURS)
 
-    if user_key in losers:
-        ts = losers[user_key]
-        if ts.endswith("Z"):
-            ts = ts.replace("Z", "+00:00")
-        last_time = datetime.fromisoformat(ts)
-        cooldown_seconds = 15 * 3600  # 15h for losers
-        elapsed_seconds = (datetime.now(timezone.utc) - last_time).total_seconds()
-        remaining = cooldown_seconds - elapsed_seconds
-        if remaining > 0:
-            return True, remaining
-        else:
-            del losers[user_key]
-            _save_json(losers, LOSERS_COOLDOWN_FILE)
-
-    return False, 0
+def iter_active_cooldowns():
+    """Yield (user_id, kind, started, expires) for every cooldown still running"""
+    backend = get_backend()
+    now = datetime.now(timezone.utc)
+    for kind, namespace, hours in (("winner", "winners", WINNER_COOLDOWN_HOURS),
+                                   ("loser", "losers", LOSER_COOLDOWN_HOURS)):
+        for user_key, ts in backend.iter_items(namespace):
+            started = _parse_ts(ts)
+            expires = started + timedelta(hours=hours)
+            if expires > now:
+                yield user_key, kind, started, expires
 
 # -------------------- Funciones principales --------------------
 
@@ -102,61 +84,93 @@ def can_spin(user_id):
         return False, loser_time, "max_spins"
 
     # Revisar spins del periodo actual
-    spins = _load_json(SPINS_FILE)
     period_start = _get_period_start(15)  # 15h period para conteo de spins
     period_key = period_start.isoformat()
     user_key = str(user_id)
 
-    user_data = spins.get(user_key, {})
+    user_data = get_backend().get("spins", user_key, {})
     if user_data.get("period") != period_key:
         return True, 0, "ok"
 
     spin_count = user_data.get("count", 0)
     if spin_count >= MAX_SPINS_PER_PERIOD:
-        losers = _load_json(LOSERS_COOLDOWN_FILE)
-        losers[user_key] = datetime.now(timezone.utc).isoformat()
-        _save_json(losers, LOSERS_COOLDOWN_FILE)
-        return False, 15 * 3600, "max_spins"
+        _start_loser_cooldown(user_key)
+        return False, LOSER_COOLDOWN_HOURS * 3600, "max_spins"
 
     return True, 0, "ok"
 
+def _start_loser_cooldown(user_key):
+    """Put user in losers cooldown unless another worker already did"""
+    event_journal.emit("loser_cooldown", user=user_key)
+
 def record_spin(user_id):
-    """Record a user spin"""
-    spins = _load_json(SPINS_FILE)
+    """
+    Record a user spin.
+    The check and the increment are one atomic operation, so concurrent
+    workers can never record more than MAX_SPINS_PER_PERIOD spins.
+    Returns True if the spin was granted, False if the limit was reached.
+    """
     period_start = _get_period_start(15)  # 15h period para conteo de spins
     period_key = period_start.isoformat()
     user_key = str(user_id)
 
-    user_data = spins.get(user_key, {})
-    if user_data.get("period") != period_key:
-        user_data = {"period": period_key, "count": 0}
-
-    user_data["count"] = user_data.get("count", 0) + 1
-    spins[user_key] = user_data
-    _save_json(spins, SPINS_FILE)
+    granted = event_journal.emit("spin", user=user_key, period=period_key)
+    if not granted:
+        _start_loser_cooldown(user_key)
+    return granted
 
 def record_winner(user_id):
     """Record a winner and put them in 24h cooldown"""
-    winners = _load_json(WINNERS_COOLDOWN_FILE)
-    losers = _load_json(LOSERS_COOLDOWN_FILE)
-    user_key = str(user_id)
-
-    winners[user_key] = datetime.now(timezone.utc).isoformat()
-    _save_json(winners, WINNERS_COOLDOWN_FILE)
-
-    if user_key in losers:
-        del losers[user_key]
-        _save_json(losers, LOSERS_COOLDOWN_FILE)
+    event_journal.emit("winner_cooldown", user=str(user_id))
 
 def spins_left(user_id):
     """Get remaining spins for current period"""
-    spins = _load_json(SPINS_FILE)
     period_start = _get_period_start(15)
     period_key = period_start.isoformat()
     user_key = str(user_id)
 
-    user_data = spins.get(user_key, {})
+    user_data = get_backend().get("spins", user_key, {})
     if user_data.get("period") != period_key:
         return MAX_SPINS_PER_PERIOD
 
     return MAX_SPINS_PER_PERIOD - user_data.get("count", 0)
+
+# -------------------- Journal projections --------------------
+
+def _apply_spin(event):
+    period_key = event["period"]
+
+    def _increment(user_data):
+        if not user_data or user_data.get("period") != period_key:
+            user_data = {"period": period_key, "count": 0}
+        if user_data["count"] >= MAX_SPINS_PER_PERIOD:
+            return user_data, False
+        user_data["count"] += 1
+        return user_data, True
+
+    granted = get_backend().update("spins", event["user"], _increment)
+    return granted, granted
+
+def _apply_loser_cooldown(event):
+    started = get_backend().set_if_absent("losers", event["user"], event["ts"])
+    return None, started
+
+def _apply_winner_cooldown(event):
+    backend = get_backend()
+    backend.set("winners", event["user"], event["ts"])
+    backend.delete("losers", event["user"])
+    return None, True
+
+def _apply_cooldown_expired(event):
+    # Solo si nadie lo renovó mientras tanto
+    def _expire(current):
+        if current == event["started"]:
+            return None, True
+        return current, False
+    deleted = get_backend().update(event["namespace"], event["user"], _expire)
+    return None, deleted
+
+event_journal.register("spin", _apply_spin)
+event_journal.register("loser_cooldown", _apply_loser_cooldown)
+event_journal.register("winner_cooldown", _apply_winner_cooldown)
+event_journal.register("cooldown_expired", _apply_cooldown_expired)
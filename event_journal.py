@@ -0,0 +1,262 @@
+"""
+Append-only spin/win event journal
+Every spin, slot result and cooldown change is appended as one NDJSON
+line instead of rewriting the state files. Lines go through the storage
+writer, which fsyncs them in group commits. Derived state (spin counts,
+cooldowns, global stats) is rebuilt at startup by loading the latest
+snapshot and replaying the journal after it; a background thread
+compacts the journal into a new snapshot periodically.
+
+Journal line:
+    {"seq": 12, "ts": "2025-10-04T07:57:28+00:00", "type": "spin", ...}
+
+Projections: modules register one apply function per event type. The
+same function is used live (emit) and on replay, so they cannot drift.
+An apply function receives the event and returns (result, keep); when
+keep is False the event is not journaled (e.g. a spin over the limit).
+
+Compaction rotates the active journal to events.ndjson.<last seq> and
+then writes the snapshot; a crash between the two steps only means the
+newest archived segment is replayed again on the next start. The rotation
+is queued to the storage writer, so emit() never waits on the disk. The
+newest JOURNAL_KEEP_SEGMENTS segments covered by the snapshot are kept as
+an audit trail, older ones are deleted.
+
+Replay only runs for non-durable backends (json, memory). With sqlite or
+redis the state already survives restarts and the journal is only the
+audit trail: each worker appends to its own file (events.<pid>.ndjson),
+with its own seq, and is never compacted or rotated, so no worker can
+move or overwrite a file another one is still writing.
+"""
+import glob
+import importlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from config import (
+    JOURNAL_FILE,
+    SNAPSHOT_FILE,
+    JOURNAL_COMPACT_INTERVAL,
+    JOURNAL_COMPACT_EVENTS,
+    JOURNAL_KEEP_SEGMENTS
+)
+from state_backend import get_backend
+from storage_writer import writer, atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# Namespaces rebuilt from the journal
+JOURNALED_NAMESPACES = ("spins", "winners", "losers", "global_stats")
+
+# Modules that register projections, imported before any replay
+PROJECTION_MODULES = ("cooldown", "global_stats")
+
+_projections = {}
+_lock = threading.RLock()
+_opened = False
+_journal_file = JOURNAL_FILE  # per worker on durable backends
+_seq = 0
+_events_since_snapshot = 0
+_compactor = None
+_compact_wakeup = threading.Event()
+
+
+def register(event_type, apply_fn):
+    """Register the projection for an event type"""
+    _projections[event_type] = apply_fn
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _read_events(path):
+    """Yield events from a journal file, skipping a torn last line"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ Skipping corrupt journal line in {path}")
+
+
+def _archived_segments():
+    """[(last seq, path)] of rotated journal segments, oldest first"""
+    segments = []
+    for path in glob.glob(JOURNAL_FILE + ".*"):
+        suffix = path.rsplit(".", 1)[-1]
+        if suffix.isdigit():
+            segments.append((int(suffix), path))
+    return sorted(segments)
+
+
+def _load_legacy_state(backend):
+    """First start with the journal: seed from the old per-namespace JSON files"""
+    from state_backend import LEGACY_JSON_FILES
+    for ns, filepath in LEGACY_JSON_FILES.items():
+        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+            continue
+        with open(filepath, "r", encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                backend.set(ns, key, value)
+        logger.info(f"📥 Imported {ns} from legacy file {filepath}")
+
+
+def _restore(backend):
+    """Load the latest snapshot and replay newer journal events"""
+    global _seq
+    for name in PROJECTION_MODULES:
+        importlib.import_module(name)
+
+    snapshot_seq = 0
+    if os.path.exists(SNAPSHOT_FILE):
+        with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        snapshot_seq = snapshot["seq"]
+        for ns, items in snapshot["state"].items():
+            for key, value in items.items():
+                backend.set(ns, key, value)
+    else:
+        _load_legacy_state(backend)
+
+    replayed = 0
+    _seq = snapshot_seq
+    # Archives named <= snapshot seq are fully covered, don't even open them
+    pending = [path for last, path in _archived_segments() if last > snapshot_seq]
+    for path in pending + [JOURNAL_FILE]:
+        for event in _read_events(path):
+            if event["seq"] <= snapshot_seq:
+                continue
+            apply_fn = _projections.get(event["type"])
+            if apply_fn:
+                apply_fn(event)
+            _seq = max(_seq, event["seq"])
+            replayed += 1
+
+    logger.info(f"📜 Journal restored: snapshot seq {snapshot_seq}, {replayed} events replayed")
+    return replayed
+
+
+def _worker_journal():
+    root, ext = os.path.splitext(JOURNAL_FILE)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _last_seq(path):
+    seq = 0
+    for event in _read_events(path):
+        seq = max(seq, event["seq"])
+    return seq
+
+
+def open_journal():
+    """Open the journal, rebuilding state first when the backend is not durable"""
+    global _opened, _journal_file, _seq, _events_since_snapshot
+    with _lock:
+        if _opened:
+            return
+        backend = get_backend()
+        if backend.durable:
+            _journal_file = _worker_journal()
+            _seq = _last_seq(_journal_file)
+        else:
+            _events_since_snapshot = _restore(backend)
+        _opened = True
+
+
+def emit(event_type, **fields):
+    """
+    Apply an event to the live state and append it to the journal.
+    Returns whatever the projection returns.
+    """
+    global _seq, _events_since_snapshot
+    if not _opened:
+        open_journal()
+
+    with _lock:
+        event = {"seq": _seq + 1, "ts": _now(), "pid": os.getpid(), "type": event_type}
+        event.update(fields)
+        result, keep = _projections[event_type](event)
+        if keep:
+            _seq = event["seq"]
+            # Group-committed by the storage writer; await storage_writer.sync() for durability
+            writer.append(_journal_file, json.dumps(event, ensure_ascii=False) + "\n")
+            _events_since_snapshot += 1
+            if _events_since_snapshot >= JOURNAL_COMPACT_EVENTS:
+                _compact_wakeup.set()
+        return result
+
+
+def compact():
+    """
+    Archive the active journal and write a snapshot of the journaled namespaces.
+    The state copy and queueing the rotation happen under the journal lock,
+    the disk work does not. Nothing to do on durable backends.
+    """
+    global _events_since_snapshot
+    backend = get_backend()
+    if not _opened or backend.durable:
+        return False
+
+    with _lock:
+        seq = _seq
+        state = {ns: backend.items(ns) for ns in JOURNALED_NAMESPACES}
+        # Lines up to seq were queued before this: they all land in the archived segment
+        rotated = writer.rotate(JOURNAL_FILE, f"{JOURNAL_FILE}.{seq}")
+        _events_since_snapshot = 0
+
+    rotated.result()
+    atomic_write_text(SNAPSHOT_FILE, json.dumps({"seq": seq, "created": _now(), "state": state}, ensure_ascii=False))
+    _prune_segments(seq)
+    logger.info(f"🗜️ Journal compacted at seq {seq}")
+    return True
+
+
+def _prune_segments(snapshot_seq):
+    """Delete the segments covered by the snapshot beyond the newest JOURNAL_KEEP_SEGMENTS"""
+    covered = [path for last, path in _archived_segments() if last <= snapshot_seq]
+    for path in covered[:max(0, len(covered) - JOURNAL_KEEP_SEGMENTS)]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not delete journal segment {path}: {e}")
+
+
+def _compactor_loop():
+    while True:
+        _compact_wakeup.wait(JOURNAL_COMPACT_INTERVAL)
+        _compact_wakeup.clear()
+        try:
+            if _events_since_snapshot:
+                compact()
+        except Exception as e:
+            logger.error(f"❌ Journal compaction failed: {e}")
+
+
+def start_compactor():
+    """Start the background compaction thread (idempotent)"""
+    global _compactor
+    if _compactor is None:
+        open_journal()
+        if get_backend().durable:
+            return
+        _compactor = threading.Thread(target=_compactor_loop, name="journal-compactor", daemon=True)
+        _compactor.start()
+
+
+def read_events(since_seq=0):
+    """Iterate every journaled event of this worker newer than since_seq, archives included"""
+    writer.flush()
+    archived = [] if get_backend().durable else [path for _, path in _archived_segments()]
+    for path in archived + [_journal_file]:
+        for event in _read_events(path):
+            if event["seq"] > since_seq:
+                yield event
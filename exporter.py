@@ -0,0 +1,167 @@
+"""
+Streaming export of the game state for audits
+Every dataset is a generator of flat rows read from the state backend a
+batch at a time (StateBackend.iter_items), and rows are encoded one by
+one, so memory stays flat whatever the number of users. Output goes to a
+file or stdout (CLI) or, from /export, to Telegram documents of at most
+EXPORT_CHUNK_BYTES, produced in a worker thread so the event loop keeps
+serving updates. CSV chunks each repeat the header.
+
+Datasets:
+    users      user_id, username, wallet
+    wallets    wallet, users, user_ids
+    cooldowns  user_id, kind (winner / loser), started, expires   (active only)
+    stats      metric, prize, value   (current STATS_WINDOW_HOURS window)
+    claims     status (claimed / failed / parked / pending), ref, user_id, prize_name, wallet, error
+    payouts    every claim attempt in the payout ledger and its outcome
+
+Usage:
+    python exporter.py users [--format csv] [--output users.csv]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timezone
+from config import EXPORT_CHUNK_BYTES
+from state_backend import get_backend
+import cooldown
+import event_journal
+import global_stats
+import parked_claims
+import payout_ledger
+import user_directory
+
+# Claim namespaces of main.py (not imported from there: main pulls in the whole bot)
+CLAIM_NAMESPACES = (
+    ("claimed", "claimed_messages"),  # "chat_id:message_id" -> {"user_id", "prize_name"}
+    ("failed", "failed_claims"),
+    ("parked", parked_claims.PARKED_CLAIMS),
+    ("pending", "pending_claims"),
+)
+
+# -------------------- Datasets --------------------
+
+def users():
+    for user_id, user in get_backend().iter_items(user_directory.USERS):
+        yield {"user_id": user_id, "username": user.get("username"), "wallet": user.get("wallet")}
+
+def wallets():
+    user_directory.load()
+    for wallet, ids in get_backend().iter_items(user_directory.WALLET_USERS):
+        yield {"wallet": wallet, "users": len(ids), "user_ids": " ".join(str(i) for i in ids)}
+
+def cooldowns():
+    for user_id, kind, started, expires in cooldown.iter_active_cooldowns():
+        yield {"user_id": user_id, "kind": kind, "started": started.isoformat(), "expires": expires.isoformat()}
+
+def stats():
+    current = global_stats.get_stats()
+    yield {"metric": "window_hours", "prize": "", "value": current["window_hours"]}
+    yield {"metric": "total_spins", "prize": "", "value": current["total_spins"]}
+    for prize_name, count in current["prizes_awarded"].items():
+        yield {"metric": "prizes_awarded", "prize": prize_name, "value": count}
+
+def claims():
+    backend = get_backend()
+    for status, namespace in CLAIM_NAMESPACES:
+        for key, entry in backend.iter_items(namespace):
+            yield {
+                "status": status,
+                "ref": entry.get("ref") or key,
+                "user_id": entry.get("user_id", key),
+                "prize_name": entry.get("prize_name"),
+                "wallet": entry.get("wallet"),
+                "error": entry.get("error"),
+            }
+
+def payouts():
+    yield from payout_ledger.iter_attempts()
+
+DATASETS = {
+    "users": (users, ["user_id", "username", "wallet"]),
+    "wallets": (wallets, ["wallet", "users", "user_ids"]),
+    "cooldowns": (cooldowns, ["user_id", "kind", "started", "expires"]),
+    "stats": (stats, ["metric", "prize", "value"]),
+    "claims": (claims, ["status", "ref", "user_id", "prize_name", "wallet", "error"]),
+    "payouts": (payouts, ["id", "claim_id", "ref", "prize_name", "token", "amount", "wallet",
+                          "status", "tx_hash", "error", "started_at", "finished_at"]),
+}
+FORMATS = ("ndjson", "csv")
+
+# -------------------- Encoding --------------------
+
+def _csv_line(fields, row):
+    buf = io.StringIO()
+    csv.DictWriter(buf, fieldnames=fields, extrasaction="ignore").writerow(row)
+    return buf.getvalue()
+
+def iter_lines(dataset, fmt="ndjson"):
+    """Yield the export of dataset line by line, CSV starting with its header"""
+    rows, fields = DATASETS[dataset]
+    if fmt == "csv":
+        yield _csv_line(fields, dict(zip(fields, fields)))
+        for row in rows():
+            yield _csv_line(fields, row)
+    else:
+        for row in rows():
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+def iter_chunks(dataset, fmt="ndjson", max_bytes=EXPORT_CHUNK_BYTES):
+    """Yield the export as byte chunks of at most max_bytes, split between lines"""
+    lines = iter_lines(dataset, fmt)
+    header = next(lines).encode("utf-8") if fmt == "csv" else b""
+    chunk = bytearray(header)
+    for line in lines:
+        data = line.encode("utf-8")
+        if len(chunk) > len(header) and len(chunk) + len(data) > max_bytes:
+            yield bytes(chunk)
+            chunk = bytearray(header)
+        chunk += data
+    if len(chunk) > len(header):
+        yield bytes(chunk)
+
+# -------------------- Telegram --------------------
+
+async def send_export(bot, chat_id, dataset, fmt="ndjson"):
+    """Send the export as one or more documents, returns how many (0 if empty)"""
+    chunks = iter_chunks(dataset, fmt)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    extension = "csv" if fmt == "csv" else "ndjson"
+    part = 0
+    while True:
+        # Backend reads and encoding run off the event loop
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return part
+        part += 1
+        await bot.send_document(
+            chat_id=chat_id,
+            document=chunk,
+            filename=f"{dataset}-{stamp}-{part}.{extension}",
+            caption=f"📤 {dataset} export, part {part}"
+        )
+
+# -------------------- CLI --------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    # Rebuilds the journaled namespaces for the json/memory backends, read only
+    event_journal.open_journal()
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for line in iter_lines(args.dataset, args.format):
+            out.write(line)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+Local EVM JSON-RPC stand-in for offline claim tests and benchmarks
+Implements the calls the payout path uses against a simulated prize
+contract (getBalance / claim) and Multicall3 (aggregate3 / getEthBalance):
+
+    web3_clientVersion, net_version, eth_chainId, eth_blockNumber,
+    eth_getBlockByNumber, eth_getBalance, eth_getCode, eth_call,
+    eth_estimateGas, eth_gasPrice, eth_maxPriorityFeePerGas,
+    eth_feeHistory, eth_getTransactionCount, eth_sendRawTransaction,
+    eth_getTransactionByHash, eth_getTransactionReceipt, eth_getLogs
+
+Raw transactions are decoded and signature-checked, nonces and
+replacement rules (>= 10% fee bump) are enforced like a real node, and
+transactions are mined every block_time seconds only if their max fee
+covers the current base fee. eth_getLogs refuses queries matching more
+than log_limit logs (-32005), like hosted nodes do. Per-request latency and random failure
+injection are configurable, FakeChain.fail_next[method] = n fails the next n
+calls of one method; every call is counted in FakeChain.calls.
+
+Usage:
+    python fake_rpc.py [port] [--latency 0.05] [--block-time 1] [--failure-rate 0]
+"""
+import argparse
+import http.server
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_account._utils.legacy_transactions import Transaction
+from eth_account._utils.typed_transactions import TypedTransaction
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+
+from config import CHAIN_ID, PRIZES, MULTICALL_ADDRESS
+
+
+def _selector(signature):
+    return keccak(text=signature)[:4]
+
+
+GET_BALANCE = _selector("getBalance(address)")
+CLAIM = _selector("claim(address,uint256,address)")
+AGGREGATE3 = _selector("aggregate3((address,bool,bytes)[])")
+GET_ETH_BALANCE = _selector("getEthBalance(address)")
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+
+DEFAULT_CONTRACT = "0x" + "c0" * 20
+CLAIM_GAS = 52000
+ESTIMATE_GAS = 60000
+DEFAULT_ETH = 10 * 10**18
+
+
+class RPCError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+def _hex(value):
+    return hex(value)
+
+
+def _addr(value):
+    return value.lower() if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+def _uint(value):
+    return encode(["uint256"], [value])
+
+
+class FakeChain:
+    """Chain state: balances, nonces, tx pool, blocks and the prize contract"""
+
+    def __init__(self, contract=DEFAULT_CONTRACT, chain_id=CHAIN_ID, base_fee=10**7, block_time=1.0,
+                 latency=0.0, failure_rate=0.0, default_eth=DEFAULT_ETH, authorized=None,
+                 log_limit=10000):
+        self.lock = threading.RLock()
+        self.contract = contract.lower()
+        self.multicall = MULTICALL_ADDRESS.lower()
+        self.chain_id = chain_id
+        self.base_fee = base_fee
+        self.block_time = block_time
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.default_eth = default_eth
+        self.authorized = {a.lower() for a in authorized} if authorized else None  # None = anyone may claim
+        self.log_limit = log_limit
+        self.calls = Counter()
+        self.fail_next = Counter()  # method -> injected failures left
+
+        self.eth = {}       # address -> wei
+        self.tokens = {}    # token -> contract balance
+        self.nonces = {}    # address -> next mined nonce
+        self.pool = {}      # (sender, nonce) -> tx
+        self.txs = {}       # hash -> tx
+        self.receipts = {}  # hash -> receipt
+        self.logs = []
+        self.blocks = []
+        self._new_block([])
+
+    # -------------------- Setup --------------------
+
+    def fund(self, address, wei):
+        with self.lock:
+            self.eth[address.lower()] = wei
+
+    def set_token_balance(self, token, amount):
+        with self.lock:
+            self.tokens[token.lower()] = amount
+
+    def seed_prizes(self, payouts=1000):
+        """Give the contract enough of every prize token for N payouts"""
+        for prize in PRIZES:
+            token = prize['token'].lower()
+            self.tokens[token] = max(self.tokens.get(token, 0), int(prize['amount']) * payouts)
+
+    def balance_of(self, address):
+        return self.eth.setdefault(address.lower(), self.default_eth)
+
+    # -------------------- Blocks --------------------
+
+    def _new_block(self, tx_hashes):
+        number = len(self.blocks)
+        block = {
+            "number": number,
+            "hash": "0x" + keccak(text=f"block-{number}-{time.time()}").hex(),
+            "parentHash": self.blocks[-1]["hash"] if self.blocks else "0x" + "00" * 32,
+            "timestamp": int(time.time()),
+            "baseFeePerGas": self.base_fee,
+            "transactions": tx_hashes,
+            "gasUsed": CLAIM_GAS * len(tx_hashes),
+        }
+        self.blocks.append(block)
+        return block
+
+    def mine(self):
+        """Mine one block with every pending tx whose fees cover the base fee"""
+        with self.lock:
+            included = []
+            progress = True
+            while progress:
+                progress = False
+                for key, tx in sorted(self.pool.items(), key=lambda item: item[0][1]):
+                    sender, nonce = key
+                    if nonce != self.nonces.get(sender, 0) or tx["max_fee"] < self.base_fee:
+                        continue
+                    del self.pool[key]
+                    self.nonces[sender] = nonce + 1
+                    included.append(tx)
+                    progress = True
+            block = self._new_block([tx["hash"] for tx in included])
+            for index, tx in enumerate(included):
+                self._execute(tx, block, index)
+            return block
+
+    def _execute(self, tx, block, index):
+        price = min(tx["max_fee"], self.base_fee + tx["tip"])
+        self.eth[tx["from"]] = self.balance_of(tx["from"]) - CLAIM_GAS * price
+        status, logs = 1, []
+        try:
+            if tx["to"] == self.contract and tx["data"][:4] == CLAIM:
+                token, amount, to = decode(["address", "uint256", "address"], tx["data"][4:])
+                self._check_claim(tx["from"], token.lower(), amount)
+                self.tokens[token.lower()] -= amount
+                logs.append({
+                    "address": to_checksum_address(token),
+                    "topics": [TRANSFER_TOPIC, "0x" + "00" * 12 + self.contract[2:], "0x" + "00" * 12 + to.lower()[2:]],
+                    "data": "0x" + _uint(amount).hex(),
+                    "blockNumber": _hex(block["number"]),
+                    "blockHash": block["hash"],
+                    "transactionHash": tx["hash"],
+                    "transactionIndex": _hex(index),
+                    "logIndex": _hex(len(self.logs)),
+                    "removed": False,
+                })
+        except RPCError:
+            status = 0
+        self.logs.extend(logs)
+        self.receipts[tx["hash"]] = {
+            "transactionHash": tx["hash"],
+            "transactionIndex": _hex(index),
+            "blockHash": block["hash"],
+            "blockNumber": _hex(block["number"]),
+            "from": to_checksum_address(tx["from"]),
+            "to": to_checksum_address(tx["to"]),
+            "cumulativeGasUsed": _hex(CLAIM_GAS * (index + 1)),
+            "gasUsed": _hex(CLAIM_GAS),
+            "effectiveGasPrice": _hex(price),
+            "contractAddress": None,
+            "logs": logs,
+            "logsBloom": "0x" + "00" * 256,
+            "status": _hex(status),
+            "type": _hex(tx["type"]),
+        }
+
+    def run_miner(self, stop):
+        while not stop.wait(self.block_time):
+            self.mine()
+
+    # -------------------- Contract --------------------
+
+    def _check_claim(self, sender, token, amount):
+        if self.authorized is not None and sender not in self.authorized:
+            raise RPCError(3, "execution reverted: not authorized")
+        if self.tokens.get(token, 0) < amount:
+            raise RPCError(3, "execution reverted: insufficient balance")
+
+    def _call(self, to, data, sender=None):
+        to = to.lower()
+        selector, args = data[:4], data[4:]
+        if to == self.contract and selector == GET_BALANCE:
+            (token,) = decode(["address"], args)
+            return _uint(self.tokens.get(token.lower(), 0))
+        if to == self.contract and selector == CLAIM:
+            token, amount, _ = decode(["address", "uint256", "address"], args)
+            self._check_claim((sender or "").lower(), token.lower(), amount)
+            return b""
+        if to == self.multicall and selector == GET_ETH_BALANCE:
+            (address,) = decode(["address"], args)
+            return _uint(self.balance_of(address))
+        if to == self.multicall and selector == AGGREGATE3:
+            (calls,) = decode(["(address,bool,bytes)[]"], args)
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    results.append((True, self._call(target, call_data, self.multicall)))
+                except RPCError:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+            return encode(["(bool,bytes)[]"], [results])
+        raise RPCError(3, "execution reverted")
+
+    # -------------------- Transactions --------------------
+
+    def _decode_raw(self, raw):
+        sender = Account.recover_transaction(raw).lower()
+        if raw[0] == 2:
+            fields = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+            max_fee, tip, tx_type = fields["maxFeePerGas"], fields["maxPriorityFeePerGas"], 2
+        else:
+            fields = rlp.decode(raw, Transaction).as_dict()
+            max_fee = tip = fields["gasPrice"]
+            tx_type = 0
+        return {
+            "hash": "0x" + keccak(raw).hex(),
+            "from": sender,
+            "to": _addr(fields["to"]),
+            "nonce": fields["nonce"],
+            "gas": fields["gas"],
+            "value": fields["value"],
+            "data": bytes(fields["data"]),
+            "max_fee": max_fee,
+            "tip": tip,
+            "type": tx_type,
+        }
+
+    def send_raw(self, raw):
+        tx = self._decode_raw(raw)
+        with self.lock:
+            sender, nonce = tx["from"], tx["nonce"]
+            if tx["hash"] in self.txs:
+                raise RPCError(-32000, "already known")
+            if nonce < self.nonces.get(sender, 0):
+                raise RPCError(-32000, "nonce too low")
+            current = self.pool.get((sender, nonce))
+            if current and (tx["max_fee"] < current["max_fee"] * 1.1 or tx["tip"] < current["tip"] * 1.1):
+                raise RPCError(-32000, "replacement transaction underpriced")
+            if current:
+                self.txs.pop(current["hash"], None)
+            self.pool[(sender, nonce)] = tx
+            self.txs[tx["hash"]] = tx
+        if self.block_time == 0:
+            self.mine()
+        return tx["hash"]
+
+    def transaction_count(self, address, tag):
+        address = address.lower()
+        with self.lock:
+            count = self.nonces.get(address, 0)
+            if tag == "pending":
+                while (address, count) in self.pool:
+                    count += 1
+            return count
+
+    def fee_history(self, count, newest, percentiles):
+        with self.lock:
+            blocks = self.blocks[-count:]
+            return {
+                "oldestBlock": _hex(blocks[0]["number"]),
+                "baseFeePerGas": [_hex(b["baseFeePerGas"]) for b in blocks] + [_hex(self.base_fee)],
+                "gasUsedRatio": [0.5 for _ in blocks],
+                "reward": [[_hex(10**6) for _ in percentiles] for _ in blocks],
+            }
+
+    def _number(self, tag):
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return len(self.blocks) - 1
+        if tag == "earliest":
+            return 0
+        return tag if isinstance(tag, int) else int(tag, 16)
+
+    def get_logs(self, query):
+        """Logs in [fromBlock, toBlock] matching address and positional topics"""
+        addresses = query.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {a.lower() for a in addresses} if addresses else None
+        topics = [
+            None if t is None else {x.lower() for x in (t if isinstance(t, list) else [t])}
+            for t in query.get("topics") or []
+        ]
+        with self.lock:
+            start, end = self._number(query.get("fromBlock")), self._number(query.get("toBlock"))
+            logs = [
+                log for log in self.logs
+                if start <= int(log["blockNumber"], 16) <= end
+                and (addresses is None or log["address"].lower() in addresses)
+                and all(t is None or (i < len(log["topics"]) and log["topics"][i].lower() in t)
+                        for i, t in enumerate(topics))
+            ]
+        if len(logs) > self.log_limit:
+            raise RPCError(-32005, f"query returned more than {self.log_limit} results")
+        return logs
+
+    def _block(self, tag):
+        with self.lock:
+            if tag in ("latest", "pending", "safe", "finalized"):
+                block = self.blocks[-1]
+            elif tag == "earliest":
+                block = self.blocks[0]
+            else:
+                number = int(tag, 16)
+                if number >= len(self.blocks):
+                    return None
+                block = self.blocks[number]
+        return {
+            "number": _hex(block["number"]),
+            "hash": block["hash"],
+            "parentHash": block["parentHash"],
+            "timestamp": _hex(block["timestamp"]),
+            "baseFeePerGas": _hex(block["baseFeePerGas"]),
+            "gasLimit": _hex(30_000_000),
+            "gasUsed": _hex(block["gasUsed"]),
+            "transactions": block["transactions"],
+            "miner": "0x" + "00" * 20,
+            "difficulty": "0x0",
+            "totalDifficulty": "0x0",
+            "extraData": "0x",
+            "logsBloom": "0x" + "00" * 256,
+            "nonce": "0x" + "00" * 8,
+            "sha3Uncles": "0x" + "00" * 32,
+            "stateRoot": "0x" + "00" * 32,
+            "transactionsRoot": "0x" + "00" * 32,
+            "receiptsRoot": "0x" + "00" * 32,
+            "size": "0x0",
+            "uncles": [],
+        }
+
+    # -------------------- JSON-RPC --------------------
+
+    def handle(self, method, params):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RPCError(-32603, "injected failure")
+        with self.lock:
+            if self.fail_next[method] > 0:
+                self.fail_next[method] -= 1
+                raise RPCError(-32603, "injected failure")
+
+        if method == "web3_clientVersion":
+            return "FakeRPC/1.0"
+        if method == "net_version":
+            return str(self.chain_id)
+        if method == "eth_chainId":
+            return _hex(self.chain_id)
+        if method == "eth_blockNumber":
+            return _hex(len(self.blocks) - 1)
+        if method == "eth_getBlockByNumber":
+            return self._block(params[0])
+        if method == "eth_getBalance":
+            with self.lock:
+                return _hex(self.balance_of(params[0]))
+        if method == "eth_getCode":
+            return "0x6080" if params[0].lower() in (self.contract, self.multicall) else "0x"
+        if method == "eth_call":
+            call = params[0]
+            with self.lock:
+                return "0x" + self._call(call["to"], bytes(HexBytes(call.get("data") or call.get("input", "0x"))), call.get("from")).hex()
+        if method == "eth_estimateGas":
+            call = params[0]
+            with self.lock:
+                self._call(call["to"], bytes(HexBytes(call.get("data") or call.get("input", "0x"))), call.get("from"))
+            return _hex(ESTIMATE_GAS)
+        if method == "eth_gasPrice":
+            return _hex(self.base_fee + 10**6)
+        if method == "eth_maxPriorityFeePerGas":
+            return _hex(10**6)
+        if method == "eth_feeHistory":
+            count = params[0] if isinstance(params[0], int) else int(params[0], 16)
+            return self.fee_history(count, params[1], params[2] if len(params) > 2 else [])
+        if method == "eth_getTransactionCount":
+            return _hex(self.transaction_count(params[0], params[1] if len(params) > 1 else "latest"))
+        if method == "eth_sendRawTransaction":
+            return self.send_raw(bytes(HexBytes(params[0])))
+        if method == "eth_getTransactionReceipt":
+            with self.lock:
+                return self.receipts.get(params[0].lower())
+        if method == "eth_getTransactionByHash":
+            with self.lock:
+                tx = self.txs.get(params[0].lower())
+            if tx is None:
+                return None
+            return {"hash": tx["hash"], "from": to_checksum_address(tx["from"]), "to": to_checksum_address(tx["to"]),
+                    "nonce": _hex(tx["nonce"]), "gas": _hex(tx["gas"]), "value": _hex(tx["value"]),
+                    "input": "0x" + tx["data"].hex(), "type": _hex(tx["type"])}
+        if method == "eth_getLogs":
+            return self.get_logs(params[0])
+        raise RPCError(-32601, f"method {method} not supported")
+
+
+class RPCHandler(http.server.BaseHTTPRequestHandler):
+    def _reply(self, request):
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        try:
+            reply["result"] = self.server.chain.handle(request["method"], request.get("params") or [])
+        except RPCError as e:
+            reply["error"] = {"code": e.code, "message": e.message}
+            if e.data is not None:
+                reply["error"]["data"] = e.data
+        return reply
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        reply = [self._reply(r) for r in body] if isinstance(body, list) else self._reply(body)
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeRPC(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, **chain_options):
+        super().__init__((host, port), RPCHandler)
+        self.chain = FakeChain(**chain_options)
+        self._stop = threading.Event()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve and mine in daemon threads and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        if self.chain.block_time > 0:
+            threading.Thread(target=self.chain.run_miner, args=(self._stop,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("port", type=int, nargs="?", default=8545)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--block-time", type=float, default=1.0, help="seconds per block (0 = mine on send)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--contract", default=DEFAULT_CONTRACT)
+    args = parser.parse_args()
+
+    server = FakeRPC(port=args.port, contract=args.contract, block_time=args.block_time,
+                     latency=args.latency, failure_rate=args.failure_rate)
+    server.chain.seed_prizes()
+    print(f"Fake RPC listening on {server.url} (contract {args.contract}, chain {server.chain.chain_id})")
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,411 @@
+"""
+Local Telegram Bot API stand-in for end-to-end tests and benchmarks
+Serves the Bot API methods the bot uses under /bot<token>/<method>:
+
+    getMe, getUpdates, setWebhook, deleteWebhook, getWebhookInfo,
+    sendMessage, sendPhoto, sendDocument, editMessageText, deleteMessage,
+    answerCallbackQuery
+
+Point the bot at it with TELEGRAM_API_URL=http://127.0.0.1:<port>/bot
+(Application.builder().base_url). Updates are injected with
+inject_message / inject_callback / inject_stream (or inject_update for
+recorded traffic) and delivered through
+long polling, or pushed to the webhook when one is set.
+
+Flood control is modelled like Telegram does it: each chat and the bot
+as a whole have a message budget per second; a send over budget gets a
+429 with parameters.retry_after. Every call, 429 and reply latency
+(injected update -> first bot reply to it) is recorded in stats.
+
+Usage:
+    python fake_telegram.py [port] [--chat-rate 1] [--global-rate 30]
+"""
+import argparse
+import email.parser
+import email.policy
+import http.server
+import itertools
+import json
+import math
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict, deque
+
+from config import ALLOWED_CHAT_ID, ALLOWED_THREAD_ID, ALLOWED_CHAT_USERNAME
+
+# Parameters that are plain strings even when they look like JSON
+STRING_FIELDS = {"text", "caption", "callback_query_id", "parse_mode", "url", "photo", "document", "file_name"}
+
+# Methods that count against the flood limits
+LIMITED_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "editMessageText"}
+
+
+class APIError(Exception):
+    def __init__(self, code, description, retry_after=None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.retry_after = retry_after
+
+
+class FloodControl:
+    """Sliding one-second windows per chat and for the whole bot"""
+
+    def __init__(self, chat_rate, global_rate):
+        self.chat_rate = chat_rate
+        self.global_rate = global_rate
+        self.sent = defaultdict(deque)  # chat_id (None = global) -> send times
+
+    def _check(self, key, rate, now):
+        window = self.sent[key]
+        while window and now - window[0] >= 1:
+            window.popleft()
+        if rate and len(window) >= rate:
+            return max(1, math.ceil(1 - (now - window[0])))
+        return 0
+
+    def acquire(self, chat_id):
+        now = time.monotonic()
+        retry_after = max(self._check(chat_id, self.chat_rate, now), self._check(None, self.global_rate, now))
+        if retry_after:
+            raise APIError(429, f"Too Many Requests: retry after {retry_after}", retry_after)
+        self.sent[chat_id].append(now)
+        self.sent[None].append(now)
+
+
+class FakeTelegram(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, chat_rate=0, global_rate=0, bot_username="tribo_fake_bot"):
+        super().__init__((host, port), BotAPIHandler)
+        self.lock = threading.RLock()
+        self.updates_ready = threading.Condition(self.lock)
+        self.flood = FloodControl(chat_rate, global_rate)
+        self.bot_user = {"id": 7000000001, "is_bot": True, "first_name": "Tribo Fake", "username": bot_username,
+                         "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        self.updates = []              # pending updates, oldest first
+        self.update_ids = itertools.count(1)
+        self.callback_ids = itertools.count(1)
+        self.message_ids = defaultdict(int)  # chat_id -> last message id
+        self.messages = {}             # (chat_id, message_id) -> message
+        self.webhook_url = None
+        self._webhook_thread = None
+
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.injected_at = {}          # (chat_id, message_id) or callback id -> injection time
+        self.reply_latencies = []
+        self.sent = []                 # every message the bot sent or edited, in order
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # Clients dropping long polls on shutdown are expected
+        pass
+
+    def stop(self):
+        self.shutdown()
+
+    # -------------------- Objects --------------------
+
+    def _chat(self, chat_id):
+        if chat_id == ALLOWED_CHAT_ID:
+            return {"id": chat_id, "type": "supergroup", "title": "Tribo", "username": ALLOWED_CHAT_USERNAME, "is_forum": True}
+        if chat_id > 0:
+            return {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"}
+        return {"id": chat_id, "type": "supergroup", "title": f"Chat {chat_id}"}
+
+    @staticmethod
+    def user(user_id, first_name=None):
+        return {"id": user_id, "is_bot": False, "first_name": first_name or f"Player{user_id}", "username": f"player{user_id}"}
+
+    def _new_message(self, chat_id, sender, thread_id=None, **fields):
+        self.message_ids[chat_id] += 1
+        message = {
+            "message_id": self.message_ids[chat_id],
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": sender,
+        }
+        if thread_id is not None:
+            message["message_thread_id"] = thread_id
+            message["is_topic_message"] = True
+        message.update({k: v for k, v in fields.items() if v is not None})
+        self.messages[(chat_id, message["message_id"])] = message
+        return message
+
+    # -------------------- Injection --------------------
+
+    def _push(self, update):
+        with self.lock:
+            update["update_id"] = next(self.update_ids)
+            self.updates.append(update)
+            self.updates_ready.notify_all()
+        return update
+
+    def inject_message(self, text, user_id, chat_id=ALLOWED_CHAT_ID, thread_id=ALLOWED_THREAD_ID, first_name=None):
+        """A user message; commands get their bot_command entity"""
+        with self.lock:
+            entities = None
+            if text.startswith("/"):
+                entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+            message = self._new_message(chat_id, self.user(user_id, first_name), thread_id, text=text, entities=entities)
+            self.injected_at[(chat_id, message["message_id"])] = time.perf_counter()
+        return self._push({"message": message})
+
+    def inject_callback(self, data, user_id, message=None, first_name=None):
+        """A button press on one of the bot's messages (a fresh one if not given)"""
+        with self.lock:
+            if message is None:
+                message = self._new_message(ALLOWED_CHAT_ID, self.bot_user, ALLOWED_THREAD_ID, text="🎰")
+            query_id = f"cb{next(self.callback_ids)}"
+            self.injected_at[query_id] = time.perf_counter()
+            query = {
+                "id": query_id,
+                "from": self.user(user_id, first_name),
+                "message": message,
+                "chat_instance": str(message["chat"]["id"]),
+                "data": data,
+            }
+        return self._push({"callback_query": query})
+
+    def inject_update(self, update):
+        """A recorded update as is (its messages become editable, replies are timed)"""
+        with self.lock:
+            update = dict(update)
+            update.pop("update_id", None)
+            message = update.get("message") or update.get("edited_message")
+            query = update.get("callback_query")
+            if message:
+                key = (message["chat"]["id"], message["message_id"])
+                self.messages[key] = message
+                self.message_ids[key[0]] = max(self.message_ids[key[0]], key[1])
+                self.injected_at[key] = time.perf_counter()
+            if query:
+                if query.get("message"):
+                    self.messages[(query["message"]["chat"]["id"], query["message"]["message_id"])] = query["message"]
+                self.injected_at[query["id"]] = time.perf_counter()
+        return self._push(update)
+
+    def inject_stream(self, count, users=100, text="/slot", callback_share=0.0, callback_data="reroll"):
+        """count synthetic updates from a rotating set of users"""
+        callbacks = int(count * callback_share)
+        for i in range(count):
+            user_id = 1000 + i % users
+            if i < callbacks:
+                self.inject_callback(callback_data, user_id)
+            else:
+                self.inject_message(text, user_id)
+
+    def pending_updates(self):
+        with self.lock:
+            return len(self.updates)
+
+    # -------------------- Delivery --------------------
+
+    def get_updates(self, offset=None, limit=100, timeout=0):
+        deadline = time.monotonic() + (timeout or 0)
+        with self.lock:
+            if offset:
+                # Confirm everything before offset, like Telegram does
+                self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            while not self.updates and self.webhook_url is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.updates_ready.wait(remaining)
+            return list(self.updates[:limit or 100])
+
+    def _webhook_loop(self):
+        while self.webhook_url:
+            with self.lock:
+                while not self.updates and self.webhook_url:
+                    self.updates_ready.wait(1)
+                if not self.webhook_url:
+                    return
+                update = self.updates.pop(0)
+                url = self.webhook_url
+            request = urllib.request.Request(url, data=json.dumps(update).encode(), headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(request, timeout=10).read()
+            except Exception:
+                with self.lock:
+                    self.updates.insert(0, update)
+                time.sleep(1)
+
+    def set_webhook(self, url):
+        with self.lock:
+            self.webhook_url = url or None
+            self.updates_ready.notify_all()
+        if self.webhook_url and (self._webhook_thread is None or not self._webhook_thread.is_alive()):
+            self._webhook_thread = threading.Thread(target=self._webhook_loop, daemon=True)
+            self._webhook_thread.start()
+        return True
+
+    # -------------------- Bot API --------------------
+
+    def _record_reply(self, message, params):
+        reply_to = params.get("reply_to_message_id")
+        if reply_to is None and isinstance(params.get("reply_parameters"), dict):
+            reply_to = params["reply_parameters"].get("message_id")
+        started = self.injected_at.pop((message["chat"]["id"], reply_to), None)
+        if started is not None:
+            self.reply_latencies.append(time.perf_counter() - started)
+        self.sent.append(message)
+
+    def call(self, method, params):
+        self.calls[method] += 1
+        chat_id = params.get("chat_id")
+        if method in LIMITED_METHODS:
+            with self.lock:
+                try:
+                    self.flood.acquire(chat_id)
+                except APIError:
+                    self.rate_limited[method] += 1
+                    raise
+
+        if method == "getMe":
+            return self.bot_user
+        if method == "getUpdates":
+            return self.get_updates(params.get("offset"), params.get("limit", 100), params.get("timeout", 0))
+        if method == "setWebhook":
+            return self.set_webhook(params.get("url"))
+        if method == "deleteWebhook":
+            return self.set_webhook(None)
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": self.pending_updates()}
+        if method == "sendMessage":
+            with self.lock:
+                message = self._new_message(chat_id, self.bot_user, params.get("message_thread_id"),
+                                            text=params["text"], reply_markup=params.get("reply_markup"))
+                self._record_reply(message, params)
+            return message
+        if method == "sendPhoto":
+            with self.lock:
+                photo = {"file_id": f"photo-{len(self.messages)}", "file_unique_id": f"u{len(self.messages)}", "width": 800, "height": 600}
+                message = self._new_message(chat_id, self.bot_user, params.get("message_thread_id"),
+                                            photo=[photo], caption=params.get("caption"), reply_markup=params.get("reply_markup"))
+                self._record_reply(message, params)
+            return message
+        if method == "sendDocument":
+            with self.lock:
+                document = params.get("document")
+                if not isinstance(document, dict):
+                    document = {"filename": document, "size": 0}
+                message = self._new_message(chat_id, self.bot_user, params.get("message_thread_id"), caption=params.get("caption"),
+                                            document={"file_id": f"doc-{len(self.messages)}", "file_unique_id": f"u{len(self.messages)}",
+                                                      "file_name": document["filename"], "file_size": document["size"]})
+                self._record_reply(message, params)
+            return message
+        if method == "editMessageText":
+            with self.lock:
+                message = self.messages.get((chat_id, params.get("message_id")))
+                if message is None:
+                    raise APIError(400, "Bad Request: message to edit not found")
+                if message.get("text") == params["text"] and message.get("reply_markup") == params.get("reply_markup"):
+                    raise APIError(400, "Bad Request: message is not modified")
+                message["text"] = params["text"]
+                message["edit_date"] = int(time.time())
+                if params.get("reply_markup") is not None:
+                    message["reply_markup"] = params["reply_markup"]
+                else:
+                    message.pop("reply_markup", None)
+                self.sent.append(message)
+            return message
+        if method == "deleteMessage":
+            with self.lock:
+                if self.messages.pop((chat_id, params.get("message_id")), None) is None:
+                    raise APIError(400, "Bad Request: message to delete not found")
+            return True
+        if method == "answerCallbackQuery":
+            with self.lock:
+                started = self.injected_at.pop(params.get("callback_query_id"), None)
+                if started is not None:
+                    self.reply_latencies.append(time.perf_counter() - started)
+            return True
+        raise APIError(404, "Not Found")
+
+
+def _coerce(name, value):
+    if name in STRING_FIELDS:
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class BotAPIHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _params(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        params = {}
+        if content_type.startswith("application/json"):
+            params = json.loads(body or b"{}")
+        elif content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+            )
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                filename = part.get_filename()
+                payload = part.get_payload(decode=True)
+                params[name] = {"filename": filename, "size": len(payload)} if filename else _coerce(name, payload.decode())
+        elif body:
+            for name, value in urllib.parse.parse_qsl(body.decode()):
+                params[name] = _coerce(name, value)
+        query = urllib.parse.urlparse(self.path).query
+        for name, value in urllib.parse.parse_qsl(query):
+            params.setdefault(name, _coerce(name, value))
+        return params
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self):
+        path = urllib.parse.urlparse(self.path).path
+        method = path.rstrip("/").rsplit("/", 1)[-1]
+        try:
+            result = self.server.call(method, self._params())
+            self._send(200, {"ok": True, "result": result})
+        except APIError as e:
+            payload = {"ok": False, "error_code": e.code, "description": e.description}
+            if e.retry_after is not None:
+                payload["parameters"] = {"retry_after": e.retry_after}
+            self._send(e.code, payload)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("port", type=int, nargs="?", default=8081)
+    parser.add_argument("--chat-rate", type=int, default=1, help="messages per second per chat (0 = unlimited)")
+    parser.add_argument("--global-rate", type=int, default=30, help="messages per second for the bot (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = FakeTelegram(port=args.port, chat_rate=args.chat_rate, global_rate=args.global_rate)
+    print(f"Fake Bot API listening on {server.url} (TELEGRAM_API_URL)")
+    server.serve_forever()
@@ -0,0 +1,162 @@
+"""
+Claim transaction fees and stuck-transaction replacement
+Fees come from eth_feeHistory (type-2 transactions): the next block base
+fee times FEE_BASE_MULTIPLIER plus the median tip recent blocks paid.
+Chains without EIP-1559 fall back to a legacy gasPrice.
+
+send_with_replacement() tracks a claim until it is mined. When it is not
+mined within TX_REPLACE_AFTER seconds it is signed again with the same
+nonce and bumped fees, so an underpriced claim is replaced instead of
+timing out while holding the nonce.
+
+Once a transaction may have reached the node it is tracked to the end:
+receipt polls and fee re-estimates that fail (transport errors, an open
+RPC circuit) are tolerated until the deadline, so the caller gets
+"pending" instead of an error that would invite a resend with a new nonce.
+"""
+import asyncio
+import logging
+import statistics
+import time
+from hexbytes import HexBytes
+from circuit_breaker import follow_up
+from config import (
+    FEE_HISTORY_BLOCKS,
+    FEE_TIP_PERCENTILE,
+    FEE_BASE_MULTIPLIER,
+    TX_REPLACE_AFTER,
+    TX_FEE_BUMP,
+    TX_MAX_REPLACEMENTS
+)
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_POLL_INTERVAL = 2  # seconds between receipt checks
+
+# (signer address, nonce) -> {"hashes": [tx hash], "fees": dict, "replacements": int, "first_sent": epoch}
+pending = {}
+
+def estimate_fees(w3):
+    """Fee fields for a new transaction (EIP-1559 when the chain supports it)"""
+    try:
+        history = w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [FEE_TIP_PERCENTILE])
+        base_fee = history['baseFeePerGas'][-1]  # base fee of the next block
+    except Exception as e:
+        logger.warning(f"⚠️ eth_feeHistory unavailable, using legacy gasPrice: {e}")
+        return {'gasPrice': w3.eth.gas_price}
+
+    tips = [reward[0] for reward in history.get('reward') or [] if reward]
+    tip = int(statistics.median(tips)) if tips else 0
+    tip = max(tip, 1)
+    return {
+        'maxFeePerGas': base_fee * FEE_BASE_MULTIPLIER + tip,
+        'maxPriorityFeePerGas': tip
+    }
+
+def max_fee_per_gas(fees):
+    """Worst-case price per gas unit of a fee dict"""
+    return fees.get('maxFeePerGas', fees.get('gasPrice'))
+
+def bump_fees(fees, fresh=None):
+    """Replacement fees: every field bumped, never below a fresh estimate"""
+    bumped = {}
+    for field, value in fees.items():
+        bumped[field] = max(int(value * TX_FEE_BUMP), value + 1)
+        if fresh and field in fresh:
+            bumped[field] = max(bumped[field], fresh[field])
+    if 'maxFeePerGas' in bumped:
+        bumped['maxFeePerGas'] = max(bumped['maxFeePerGas'], bumped['maxPriorityFeePerGas'])
+    return bumped
+
+def _error_message(e):
+    if e.args and isinstance(e.args[0], dict):
+        return e.args[0].get('message', '')
+    return str(e)
+
+def _get_receipt(w3, tx_hash):
+    """Receipt or None; RPC errors count as "not mined yet", the caller polls until its deadline"""
+    from web3.exceptions import TransactionNotFound
+    try:
+        return w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+    except Exception as e:
+        logger.warning(f"⚠️ Receipt check of {tx_hash.hex()} failed, retrying: {e}")
+        return None
+
+async def _wait_for_any(w3, hashes, seconds):
+    """Receipt of whichever broadcast of the nonce got mined, or None"""
+    deadline = time.monotonic() + seconds
+    while True:
+        for tx_hash in hashes:
+            receipt = await asyncio.to_thread(_get_receipt, w3, tx_hash)
+            if receipt is not None:
+                return receipt, tx_hash
+        if time.monotonic() >= deadline:
+            return None, None
+        await asyncio.sleep(RECEIPT_POLL_INTERVAL)
+
+async def send_with_replacement(w3, account, tx, on_sent=None):
+    """
+    Sign, send and track tx (fee fields included) until it is mined.
+    Returns (receipt, tx_hash); receipt is None if it is still pending
+    after TX_MAX_REPLACEMENTS fee bumps. on_sent(tx_hash hex) is awaited
+    after every broadcast.
+    """
+    nonce = tx['nonce']
+    fee_fields = ('maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice')
+    fees = {k: tx[k] for k in fee_fields if k in tx}
+    key = (account.address, nonce)
+    entry = pending[key] = {"hashes": [], "fees": fees, "replacements": 0, "first_sent": time.time()}
+
+    try:
+        while True:
+            signed = account.sign_transaction({**tx, **fees})
+            tx_hash = None
+            try:
+                tx_hash = await asyncio.to_thread(w3.eth.send_raw_transaction, signed.rawTransaction)
+            except ValueError as e:
+                message = _error_message(e).lower()
+                if "underpriced" in message and entry["replacements"] < TX_MAX_REPLACEMENTS:
+                    # Our bump was not enough for the node, bump again right away
+                    fees = bump_fees(fees)
+                    entry["replacements"] += 1
+                    continue
+                if not entry["hashes"] or ("nonce too low" not in message and "already known" not in message):
+                    raise
+                # An earlier broadcast was already mined or is known: keep waiting for it
+            except Exception as e:
+                # Transport error: the node may have received it all the same, track it
+                logger.warning(f"⚠️ Broadcast of nonce {nonce} failed, tracking it in case it arrived: {e}")
+                tx_hash = HexBytes(signed.hash)
+
+            if tx_hash is not None:
+                entry["hashes"].append(tx_hash)
+                logger.info(f"📤 Claim tx sent (nonce {nonce}, attempt {entry['replacements'] + 1}): {tx_hash.hex()}")
+                if on_sent is not None:
+                    try:
+                        await on_sent(tx_hash.hex())
+                    except Exception as e:
+                        # A status message must never stop the tx from being tracked
+                        logger.warning(f"⚠️ on_sent callback failed: {e}")
+
+            receipt, mined_hash = await _wait_for_any(w3, entry["hashes"], TX_REPLACE_AFTER)
+            if receipt is not None:
+                return receipt, mined_hash
+
+            if entry["replacements"] >= TX_MAX_REPLACEMENTS:
+                logger.warning(f"⚠️ Claim tx with nonce {nonce} still pending after {entry['replacements']} fee bumps")
+                return None, entry["hashes"][-1]
+
+            try:
+                # Follow-up of a sent tx: allowed through an open circuit
+                fresh = await asyncio.to_thread(follow_up(estimate_fees), w3)
+            except Exception as e:
+                logger.warning(f"⚠️ Fee re-estimate failed, bumping the last fees: {e}")
+                fresh = None
+            fees = bump_fees(fees, fresh)
+            entry["fees"] = fees
+            entry["replacements"] += 1
+            logger.info(f"⛽ Claim tx with nonce {nonce} not mined after {TX_REPLACE_AFTER}s, replacing with {fees}")
+    finally:
+        pending.pop(key, None)
@@ -0,0 +1,78 @@
+"""
+Gas estimate cache
+claim(token, amount, to) costs nearly the same gas for a given token, so
+the estimate is cached per (token, amount class) instead of calling
+estimate_gas on every claim. Entries are seeded at startup, re-estimated
+in the background every GAS_ESTIMATE_REFRESH seconds (which also catches
+calls that started to revert) and dropped when a transaction fails.
+"""
+import asyncio
+import logging
+import time
+from config import PRIZES, GAS_ESTIMATE_MARGIN, GAS_ESTIMATE_REFRESH
+import web3_payment
+
+logger = logging.getLogger(__name__)
+
+# (token, amount class) -> {"gas": limit with margin, "estimate": raw estimate, "ts": epoch}
+_cache = {}
+_refresher_task = None
+
+def _key(prize):
+    # Amount class = number of digits: same order of magnitude, same storage writes
+    return prize['token'].lower(), len(str(int(prize['amount'])))
+
+def _estimate(prize, to):
+    """Blocking estimate_gas of claim() from the bot wallet"""
+    account, contract = web3_payment.account, web3_payment.contract
+    func = contract.functions.claim(prize['token'], int(prize['amount']), to)
+    estimate = func.estimate_gas({'from': account.address})
+    entry = {"gas": int(estimate * GAS_ESTIMATE_MARGIN), "estimate": estimate, "ts": time.time()}
+    _cache[_key(prize)] = entry
+    return entry
+
+def get_gas_limit(prize, wallet):
+    """
+    Gas limit (margin included) for claiming prize to wallet.
+    Estimates live on a cache miss; raises if the call would revert.
+    """
+    entry = _cache.get(_key(prize))
+    if entry is None or time.time() - entry["ts"] > GAS_ESTIMATE_REFRESH * 2:
+        entry = _estimate(prize, wallet)
+    return entry["gas"]
+
+def invalidate(prize):
+    """Forget the estimate after a failed transaction"""
+    if _cache.pop(_key(prize), None) is not None:
+        logger.info(f"⛽ Gas estimate for {prize['name']} invalidated")
+
+def refresh_all():
+    """Re-estimate every prize (blocking), estimating to the bot wallet itself"""
+    seen = set()
+    for prize in PRIZES:
+        key = _key(prize)
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            entry = _estimate(prize, web3_payment.account.address)
+            logger.info(f"⛽ Gas estimate for {prize['name']}: {entry['estimate']} (limit {entry['gas']})")
+        except Exception as e:
+            _cache.pop(key, None)
+            logger.warning(f"⚠️ Gas estimate for {prize['name']} failed: {e}")
+
+async def run_refresher():
+    while True:
+        if await web3_payment.wait_until_ready():
+            try:
+                await asyncio.to_thread(refresh_all)
+            except Exception as e:
+                logger.error(f"❌ Gas estimate refresh failed: {e}")
+        await asyncio.sleep(GAS_ESTIMATE_REFRESH)
+
+def start_refresher():
+    """Seed the cache after the Web3 warm-up and keep it fresh (idempotent)"""
+    global _refresher_task
+    if _refresher_task is None:
+        _refresher_task = asyncio.create_task(run_refresher())
+    return _refresher_task
@@ -1,83 +1,168 @@
 """
 Global statistics tracker for slot game
-Tracks total spins and prizes awarded globally across all users
+Tracks total spins and prizes awarded globally across all users over a
+sliding window of STATS_WINDOW_HOURS, kept as one bucket per hour.
+
+Each bucket is stored in the "global_stats" namespace as hour:<epoch hour>
+so a spin only touches one key, and the window totals are kept in memory
+and adjusted as buckets come in and expire. Reads never scan the buckets.
 """
-import json
-import os
-from datetime import datetime, timedelta
-from config import PRIZES
-
-GLOBAL_STATS_FILE = 'global_stats.json'
-RESET_PERIOD_HOURS = 48  # Reset stats every 24 hours
-
-def _load_stats():
-    """Load global stats from file"""
-    if not os.path.exists(GLOBAL_STATS_FILE) or os.path.getsize(GLOBAL_STATS_FILE) == 0:
-        initial_stats = {
-            "last_reset": datetime.now().isoformat(),
-            "total_spins": 0,
-            "prizes_awarded": {p['name']: 0 for p in PRIZES}
-        }
-        _save_stats(initial_stats)
-        return initial_stats
-    
-    with open(GLOBAL_STATS_FILE, "r") as f:
-        stats = json.load(f)
-        
-    # Check if we need to reset (24h period passed)
-    last_reset = datetime.fromisoformat(stats["last_reset"])
-    if datetime.now() - last_reset > timedelta(hours=RESET_PERIOD_HOURS):
-        stats = {
-            "last_reset": datetime.now().isoformat(),
-            "total_spins": 0,
-            "prizes_awarded": {p['name']: 0 for p in PRIZES}
-        }
-        _save_stats(stats)
-    
-    return stats
-
-def _save_stats(stats):
-    """Save global stats to file"""
-    with open(GLOBAL_STATS_FILE, "w") as f:
-        json.dump(stats, f, indent=2)
-
-def record_spin():
-    """Record a global spin"""
-    stats = _load_stats()
-    stats["total_spins"] += 1
-    _save_stats(stats)
-
-def record_prize(prize_name):
-    """Record a prize being awarded"""
-    stats = _load_stats()
-    if prize_name in stats["prizes_awarded"]:
-        stats["prizes_awarded"][prize_name] += 1
-    else:
-        stats["prizes_awarded"][prize_name] = 1
-    _save_stats(stats)
+import threading
+import time
+from datetime import datetime
+from config import PRIZES, STATS_WINDOW_HOURS
+from state_backend import get_backend
+import event_journal
+
+BUCKET_PREFIX = "hour:"
+
+def _hour(timestamp):
+    """Epoch hour of a unix timestamp"""
+    return int(timestamp // 3600)
+
+class RollingWindow:
+    """
+    Ring buffer of hourly buckets with incrementally maintained totals.
+    Slot hour % hours holds the bucket of the only hour of the window
+    with that remainder, anything older found there has expired.
+    """
+
+    def __init__(self, hours):
+        self.hours = hours
+        self.buckets = [None] * hours
+        self.head = None  # newest hour seen
+        self.total_spins = 0
+        self.prizes_awarded = {}
+
+    def _expire(self, bucket):
+        self.total_spins -= bucket["spins"]
+        for name, count in bucket["prizes"].items():
+            left = self.prizes_awarded.get(name, 0) - count
+            if left > 0:
+                self.prizes_awarded[name] = left
+            else:
+                self.prizes_awarded.pop(name, None)
+
+    def advance(self, hour):
+        """Move the window to end at hour, returns the hours that expired"""
+        if self.head is not None and hour <= self.head:
+            return []
+        expired = []
+        if self.head is not None:
+            # Only the slots of the new hours are reused, at most one full turn
+            for h in range(max(self.head + 1, hour - self.hours + 1), hour + 1):
+                bucket = self.buckets[h % self.hours]
+                if bucket is not None:
+                    self._expire(bucket)
+                    expired.append(bucket["hour"])
+                    self.buckets[h % self.hours] = None
+        self.head = hour
+        return expired
+
+    def add(self, hour, spins, prizes):
+        """Add counts to the bucket of hour, returns the hours that expired"""
+        if self.head is not None and hour <= self.head - self.hours:
+            return []  # already out of the window
+        expired = self.advance(hour)
+        slot = hour % self.hours
+        bucket = self.buckets[slot]
+        if bucket is None:
+            bucket = self.buckets[slot] = {"hour": hour, "spins": 0, "prizes": {}}
+        bucket["spins"] += spins
+        self.total_spins += spins
+        for name, count in prizes.items():
+            bucket["prizes"][name] = bucket["prizes"].get(name, 0) + count
+            self.prizes_awarded[name] = self.prizes_awarded.get(name, 0) + count
+        return expired
+
+_window = None
+_window_lock = threading.RLock()
+
+def _drop_buckets(hours):
+    """Remove expired buckets from the backend"""
+    backend = get_backend()
+    for hour in hours:
+        backend.delete("global_stats", f"{BUCKET_PREFIX}{hour}")
+
+def _load_window(now_hour):
+    """Rebuild the window from the buckets in the backend"""
+    window = RollingWindow(STATS_WINDOW_HOURS)
+    window.advance(now_hour)
+    stale = []
+    for key, bucket in get_backend().items("global_stats").items():
+        if not key.startswith(BUCKET_PREFIX):
+            continue  # contadores del reset de 48h anterior
+        hour = int(key[len(BUCKET_PREFIX):])
+        if hour <= now_hour - STATS_WINDOW_HOURS:
+            stale.append(hour)
+        else:
+            window.add(hour, bucket["spins"], bucket["prizes"])
+    _drop_buckets(stale)
+    return window
+
+def _current_window():
+    """
+    The window moved to the current hour.
+    With a shared backend other workers add to the same buckets, so the
+    totals are reloaded once per hour instead of only advanced.
+    """
+    global _window
+    now_hour = _hour(time.time())
+    with _window_lock:
+        if _window is None or (_window.head != now_hour and get_backend().durable):
+            _window = _load_window(now_hour)
+        elif _window.head != now_hour:
+            _drop_buckets(_window.advance(now_hour))
+        return _window
+
+def record_result(prize_name, symbols):
+    """Record a global spin and the prize it awarded (None if lost)"""
+    event_journal.emit("slot_result", prize=prize_name, symbols=symbols)
+
+# -------------------- Journal projections --------------------
+
+def _apply_slot_result(event):
+    hour = _hour(datetime.fromisoformat(event["ts"]).timestamp())
+    prize_name = event["prize"]
+
+    def _increment(bucket):
+        bucket = bucket or {"spins": 0, "prizes": {}}
+        bucket["spins"] += 1
+        if prize_name:
+            bucket["prizes"][prize_name] = bucket["prizes"].get(prize_name, 0) + 1
+        return bucket, None
+
+    with _window_lock:
+        window = _current_window()
+        if hour > window.head - STATS_WINDOW_HOURS:
+            get_backend().update("global_stats", f"{BUCKET_PREFIX}{hour}", _increment)
+            _drop_buckets(window.add(hour, 1, {prize_name: 1} if prize_name else {}))
+    return None, True
+
+event_journal.register("slot_result", _apply_slot_result)
 
 def get_adjusted_probabilities():
     """
     Calculate adjusted probabilities based on global stats
     Returns dict of {prize_name: adjusted_probability}
     """
-    stats = _load_stats()
-    total_spins = stats["total_spins"]
-    
+    window = _current_window()
+    total_spins = window.total_spins
+
     # If very few spins, use base probabilities
     if total_spins < 10:
         return {p['name']: p['probability'] for p in PRIZES}
-    
+
     adjusted_probs = {}
-    
+
     for prize in PRIZES:
         prize_name = prize['name']
         base_prob = prize['probability']
-        awarded = stats["prizes_awarded"].get(prize_name, 0)
-        
-        # Expected number of prizes that should have been awarded by now
+        awarded = window.prizes_awarded.get(prize_name, 0)
+
+        # Expected number of prizes that should have been awarded in the window
         expected = (base_prob / 100) * total_spins
-        
+
         # If we've awarded more than expected, reduce probability
         # If we've awarded less than expected, increase probability
         if awarded > expected:
@@ -86,12 +171,20 @@ def get_adjusted_probabilities():
         else:
             # Increase probability
             adjustment_factor = min(2.0, 1 + ((expected - awarded) / max(expected, 1)))
-        
+
         adjusted_prob = base_prob * adjustment_factor
         adjusted_probs[prize_name] = max(0.1, min(adjusted_prob, base_prob * 1.5))
-    
+
     return adjusted_probs
 
 def get_stats():
-    """Get current global stats"""
-    return _load_stats()
+    """Get global stats for the last STATS_WINDOW_HOURS"""
+    window = _current_window()
+    with _window_lock:
+        prizes_awarded = {p['name']: 0 for p in PRIZES}
+        prizes_awarded.update(window.prizes_awarded)
+        return {
+            "window_hours": STATS_WINDOW_HOURS,
+            "total_spins": window.total_spins,
+            "prizes_awarded": prizes_awarded
+        }
@@ -1,19 +1,22 @@
 import logging
 import asyncio
-from datetime import datetime
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler
 from scheduler import start_scheduler
 from config import (
     BOT_TOKEN, 
     BOT_NAME, 
+    TELEGRAM_API_URL, 
+    RECORD_UPDATES_FILE, 
     ALLOWED_CHAT_USERNAME, 
     ALLOWED_THREAD_ID, 
     ALLOWED_CHAT_ID, 
     ALLOWED_TOPIC_URL, 
     ADMIN_ID,
-    ADMIN_USERNAME,
-    MAINTENANCE_MODE
+    CONCURRENT_UPDATES,
+    CLAIM_LOCK_TTL,
+    LOSER_COOLDOWN_HOURS
 )
 from slot_game import spin_slot
 from cooldown import can_spin, record_spin, spins_left, record_winner
@@ -21,66 +24,60 @@ from messages import (
     format_result_message, 
     get_spin_animation, 
     get_cooldown_message, 
-    get_start_message
+    get_cooldown_alert,
+    get_start_message,
+    get_prizes_message,
+    get_spin_again_keyboard,
+    get_winner_keyboard,
+    get_retry_claim_keyboard,
+    BUSY_MESSAGE,
+    format_claim_error,
+    format_admin_claim_success,
+    format_admin_claim_error,
+    format_claim_delayed,
+    format_claim_confirmed,
+    format_claim_pending,
+    format_admin_claim_pending,
+    format_claim_status,
+    format_treasury_status,
+    format_admin_shared_wallet,
+    format_shared_wallets
 )
-from wallet_manager import register_user, set_user_wallet, get_user_wallet
-from web3_payment import init_web3, validate_address, process_claim
+import render_cache
+import admission
+from admission import can_spin_short
+import user_directory
+from user_directory import register_user, set_user_wallet, get_user_wallet
+from state_backend import get_backend
+import event_journal
+import treasury
+import gas_cache
+import signer_pool
+import traffic_recorder
+import structured_log
+import storage_writer
+import exporter
+import parked_claims
+import payout_ledger
+from claim_status import ClaimStatus
+from circuit_breaker import breaker as rpc_breaker, CircuitOpenError
+from web3_payment import start_warm_up, process_claim
+from address_utils import validate_address
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
-# ---------------- Short cooldown 5s ----------------
-last_spin_times = {}
-SHORT_COOLDOWN = 3
-
-def can_spin_short(user_id):
-    now = datetime.now()
-    last = last_spin_times.get(user_id)
-    if last is None:
-        return True, 0
-    elapsed = (now - last).total_seconds()
-    if elapsed >= SHORT_COOLDOWN:
-        return True, 0
-    return False, SHORT_COOLDOWN - elapsed
-
-def record_spin_short(user_id):
-    last_spin_times[user_id] = datetime.now()
-
-# ---------------- Topic check ----------------
-def _is_allowed_topic(update: Update) -> bool:
-    if update.callback_query:
-        chat = update.callback_query.message.chat
-        thread_id = getattr(update.callback_query.message, 'message_thread_id', None)
-    else:
-        chat = update.effective_chat
-        thread_id = getattr(update.effective_message, 'message_thread_id', None) if update.effective_message else None
-
-    if chat is None:
-        return False
-    if ALLOWED_CHAT_ID is not None:
-        if chat.id != ALLOWED_CHAT_ID:
-            return False
-        if ALLOWED_THREAD_ID is not None:
-            return thread_id == ALLOWED_THREAD_ID
-        return True
-    if ALLOWED_CHAT_USERNAME:
-        chat_username = getattr(chat, 'username', None)
-        if chat_username != ALLOWED_CHAT_USERNAME.lstrip('@'):
-            return False
-        if ALLOWED_THREAD_ID is not None:
-            return thread_id == ALLOWED_THREAD_ID
-        return True
-    return False
-
 last_winner_id = None
 
 # ---------------- Claim memory ----------------
-claimed_messages = {}  # message_id -> {"user_id": int, "prize_name": str}
-pending_claims = {}  # user_id -> {"prize_name": str, "message_id": int}
-failed_claims = {}  # user_id -> {"prize_name": str, "wallet": str, "error": str, "error_message_id": int}
+# Stored in the shared state backend so every worker sees the same claims
+CLAIMED_MESSAGES = "claimed_messages"  # "chat_id:message_id" -> {"user_id": int, "prize_name": str, "pending"?: True}
+PENDING_CLAIMS = "pending_claims"  # user_id -> {"prize_name": str, "message_id": int, "ref": str}
+FAILED_CLAIMS = "failed_claims"  # user_id -> {"prize_name": str, "wallet": str, "error": str, "error_message_id": int, "ref": str}
+# "ref" is the prize message ("chat_id:message_id"), the payout ledger's prize reference.
+# A prize message stays locked in CLAIMED_MESSAGES once claimed: while the claim waits
+# for a wallet ("pending": True), after a failure (Retry is then the only way to pay it)
+# and after it is paid.
+CLAIM_LOCKS = "claim_locks"  # user_id -> time.time(), held while a retry is being paid
 
 # ---------------- Commands ----------------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -89,19 +86,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(get_start_message(), parse_mode='Markdown')
 
 async def prizes(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    from config import PRIZES
-    prize_list = "\n".join([
-        f"• {p['name']} - {p['symbol']}{p['symbol']}{p['symbol']} (Probability: {p['probability']}%)" 
-        for p in PRIZES
-    ])
-    message = f"""
-🎰 **Tribo Slot Game - Available Prizes** 🎰
-
-{prize_list}
-
-Use /slot to spin and try your luck! 🍀
-"""
-    await update.message.reply_text(message, parse_mode='Markdown')
+    await update.message.reply_text(get_prizes_message(), parse_mode='Markdown')
 
 async def wallet_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Register or update wallet address"""
@@ -147,6 +132,8 @@ async def wallet_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Register user and set wallet
     register_user(user_id, user.username or user.first_name)
     set_user_wallet(user_id, wallet)
+    await storage_writer.sync()
+    await _flag_shared_wallet(context.bot, user, wallet, "wallet registered")
     
     await update.message.reply_text(
         f"✅ Wallet registered successfully!\n\n"
@@ -155,137 +142,158 @@ async def wallet_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode='Markdown'
     )
     
-    if user_id in pending_claims:
-        claim_info = pending_claims[user_id]
+    # Pop atomically so a pending claim is only ever paid by one worker
+    # (threads: a contended read-modify-write retries, never on the loop)
+    claim_info = await asyncio.to_thread(get_backend().pop, PENDING_CLAIMS, str(user_id))
+    if claim_info and not await asyncio.to_thread(_take_pending_prize, claim_info.get('ref'), user_id, claim_info['prize_name']):
+        logger.warning(f"⚠️ Pending claim of {claim_info['prize_name']} dropped, its prize message is already taken")
+        claim_info = None
+    if claim_info:
         prize_name = claim_info['prize_name']
+        username = user.first_name or user.username or "Player"
+        user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
         
-        await update.message.reply_text(
-            f"🔄 Processing your pending claim for {prize_name}...",
-            parse_mode='HTML'
-        )
+        # One status message in the private chat, edited until the result
+        status = ClaimStatus(context.bot, user_id)
+        await status.start(update.message, format_claim_status(user_link, prize_name, "queued"))
         
         # Process the claim
-        success, message, tx_hash = await process_claim(
-            prize_name,
-            wallet,
-            context.bot,
-            user_id  # Send to private chat
+        result = await _claim_or_park(
+            context.bot, user, prize_name, wallet, user_id,
+            on_sent=status.on_sent(lambda tx: format_claim_status(user_link, prize_name, "submitted", tx)),
+            ref=claim_info.get('ref')
         )
         
-        username = user.first_name or user.username or "Player"
-        user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
+        if result is None:
+            await status.show(format_claim_delayed(user_link, prize_name), final=True)
+            return
+        success, message, tx_hash = result
         
         if success:
-            success_msg = (
-                f"✅ {user_link}, your claim was successful!\n\n"
-                f"🎁 Prize: {prize_name}\n"
-                f"👛 Sent to: `{wallet}`\n"
-                f"🔗 TxHash: `{tx_hash}`\n\n"
-                f"Check your wallet!"
-            )
-            await update.message.reply_text(success_msg, parse_mode='HTML')
+            await status.show(*format_claim_confirmed(user_link, prize_name, wallet, tx_hash), final=True)
             
             # Notify admin
-            from config import ADMIN_ID
-            admin_msg = (
-                f"💰 Prize Claimed Successfully\n\n"
-                f"Winner: {user_link}\n"
-                f"Prize: {prize_name}\n"
-                f"Wallet: `{wallet}`\n"
-                f"TxHash: `{tx_hash}`"
-            )
+            admin_msg = format_admin_claim_success(user_link, prize_name, wallet, tx_hash)
             await context.bot.send_message(
                 chat_id=ADMIN_ID,
                 text=admin_msg,
                 parse_mode='HTML'
             )
-        else:
-            from config import ADMIN_USERNAME
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Retry Claim", callback_data=f"retry_claim_{user_id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            error_msg = (
-                f"❌ {user_link}, there was an error processing your claim:\n\n"
-                f"{message}\n\n"
-                f"Please contact {ADMIN_USERNAME} for assistance.\n\n"
-                f"You can also try again by clicking the button below:"
+        elif success is None:
+            # Still unmined: no retry (a new nonce could pay twice), the prize stays locked
+            await status.show(format_claim_pending(user_link, prize_name, tx_hash), final=True)
+            await context.bot.send_message(
+                chat_id=ADMIN_ID,
+                text=format_admin_claim_pending(user_link, prize_name, wallet, tx_hash, " (Pending Claim)"),
+                parse_mode='HTML'
             )
-            error_message = await update.message.reply_text(error_msg, parse_mode='HTML', reply_markup=reply_markup)
+        else:
+            await status.show(format_claim_error(user_link, message), get_retry_claim_keyboard(user_id), final=True)
             
-            # Store failed claim with error message ID for later editing
-            failed_claims[user_id] = {
+            # Store failed claim with its status message ID, a retry edits it in place
+            _store_claim(FAILED_CLAIMS, user_id, {
                 "prize_name": prize_name,
                 "wallet": wallet,
                 "error": message,
-                "error_message_id": error_message.message_id
-            }
+                "error_message_id": status.message_id,
+                "ref": claim_info.get('ref')
+            })
             
             # Notify admin
-            admin_msg = (
-                f"⚠️ Claim Error (Pending Claim)\n\n"
-                f"Winner: {user_link}\n"
-                f"Prize: {prize_name}\n"
-                f"Wallet: `{wallet}`\n"
-                f"Error: {message}"
-            )
+            admin_msg = format_admin_claim_error(user_link, prize_name, wallet, message, " (Pending Claim)")
             await context.bot.send_message(
                 chat_id=ADMIN_ID,
                 text=admin_msg,
                 parse_mode='HTML'
             )
-        
-        # Remove from pending claims
-        del pending_claims[user_id]
 
 # ---------------- Slot spin ----------------
+async def _reject(query, message_func, user_id, text, alert):
+    """
+    Turn a spin down: button presses get a callback alert (no new message),
+    commands get the group reply at most once per REJECTION_MEMO_TTL
+    """
+    if query:
+        await query.answer(alert, show_alert=True)
+    elif admission.should_tell(user_id):
+        await message_func(text, parse_mode='HTML')
+
 async def slot(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.callback_query:
         query = update.callback_query
         user = query.from_user
         message_func = query.message.reply_text
     else:
+        query = None
         user = update.effective_user
         message_func = update.message.reply_text
 
     user_id = user.id
     username = user.first_name or user.username or "Player"
-    
-    register_user(user_id, username)
 
-    if MAINTENANCE_MODE:
-        await message_func("🔧 Tribo Slot Game is under maintenance. Try later.", parse_mode='HTML')
+    # --- Admisión: filtros en memoria, sin tocar el storage ---
+    rejection = admission.gate(update, user_id)
+    if rejection is None:
+        try:
+            async with admission.spin_slot():
+                await _spin(context, query, user_id, username, message_func)
+        except admission.Busy:
+            # Button presses get a free alert; shed commands are dropped, a reply would
+            # spend the flood budget the queue is protecting
+            if query:
+                await query.answer(BUSY_MESSAGE, show_alert=True)
         return
 
+    reason, time_remaining_short = rejection
+    if reason == "maintenance":
+        text = "🔧 Tribo Slot Game is under maintenance. Try later."
+        await _reject(query, message_func, user_id, text, text)
+    elif reason == "topic":
+        url = ALLOWED_TOPIC_URL or "the allowed Tribo topic"
+        await _reject(query, message_func, user_id,
+                      f"⛔ Please use the correct topic for Tribo Slot Game:\n{url}",
+                      "⛔ Please use the correct topic for Tribo Slot Game.")
+    else:
+        await _reject_short_cooldown(query, message_func, user_id, username, time_remaining_short)
+
+async def _reject_short_cooldown(query, message_func, user_id, username, time_remaining):
+    user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
+    wait = int(time_remaining + 1)
+    await _reject(query, message_func, user_id,
+                  f"⏱️ Please wait {wait}s before spinning again, {user_link}",
+                  f"⏱️ Please wait {wait}s before spinning again.")
+
+async def _spin(context, query, user_id, username, message_func):
+    """Storage-backed checks and the spin itself, for requests that passed admission"""
+    register_user(user_id, username)
+
     # --- Cooldown largo (max spins o ganador) antes de girar ---
     can_play_now, time_remaining, reason = can_spin(user_id)
     if not can_play_now:
         is_winner = (reason == "winner_cooldown")
-        await message_func(
-            get_cooldown_message(time_remaining, username, user_id, is_winner),
-            parse_mode='HTML'
-        )
+        await _reject(query, message_func, user_id,
+                      get_cooldown_message(time_remaining, username, user_id, is_winner),
+                      get_cooldown_alert(time_remaining, is_winner))
         return
 
-    # --- Cooldown corto 5s ---
+    # --- Cooldown corto, compartido entre workers ---
     can_spin_now, time_remaining_short = can_spin_short(user_id)
     if not can_spin_now:
-        user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
-        await message_func(
-            f"⏱️ Please wait {int(time_remaining_short+1)}s before spinning again, {user_link}",
-            parse_mode='HTML'
-        )
+        await _reject_short_cooldown(query, message_func, user_id, username, time_remaining_short)
         return
-    record_spin_short(user_id)
 
-    # --- Topic permitido ---
-    if not _is_allowed_topic(update):
-        url = ALLOWED_TOPIC_URL or "the allowed Tribo topic"
-        await message_func(f"⛔ Please use the correct topic for Tribo Slot Game:\n{url}")
+    # --- Reservar el spin (atómico entre workers) ---
+    remaining = spins_left(user_id)
+    if not record_spin(user_id):
+        await _reject(query, message_func, user_id,
+                      get_cooldown_message(LOSER_COOLDOWN_HOURS * 3600, username, user_id, False),
+                      get_cooldown_alert(LOSER_COOLDOWN_HOURS * 3600))
         return
 
+    admission.forget(user_id)
+    if query:
+        await query.answer()
+
     # --- Spin animation ---
     sent_message = await message_func(get_spin_animation())
     await asyncio.sleep(1)
@@ -293,10 +301,8 @@ async def slot(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # --- Spin resultado ---
     prize, symbols = spin_slot()
     result_message = format_result_message(prize, symbols, username, user_id)
-    remaining = spins_left(user_id) if not prize else 0
 
-    # --- Registrar spin y ganador ---
-    record_spin(user_id)
+    # --- Registrar ganador ---
     if prize:
         record_winner(user_id)
         global last_winner_id
@@ -304,15 +310,13 @@ async def slot(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- Preparar teclado ---
     if prize:
-        keyboard = [
-            [InlineKeyboardButton("🎰 Spin", callback_data="reroll")],
-            [InlineKeyboardButton("💰 Claim", callback_data=f"claim_{user_id}_{prize['name']}")]
-        ]
+        reply_markup = get_winner_keyboard(user_id, prize['name'])
     else:
         result_message += f"\n\n🎰 Spins Left: {remaining}"
-        keyboard = [[InlineKeyboardButton("🎰 Spin Again", callback_data="reroll")]]
+        reply_markup = get_spin_again_keyboard()
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    # No mostrar el resultado antes de que esté en disco
+    await storage_writer.sync()
 
     await context.bot.edit_message_text(
         chat_id=sent_message.chat_id,
@@ -322,12 +326,186 @@ async def slot(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+# ---------------- Claims ----------------
+def _user_link(user_id, username=None):
+    username = username or user_directory.get_username(user_id)
+    return f'<a href="tg://user?id={user_id}">{username}</a>'
+
+def _take_pending_prize(ref, user_id, prize_name):
+    """
+    Move a prize message from "waiting for a wallet" to "being paid" (compare-and-set).
+    False if it is already held by anything else, then the claim must not be paid.
+    """
+    if not ref:
+        return True
+
+    def _take(entry):
+        if entry is None or (entry.get("pending") and entry.get("user_id") == user_id):
+            return {"user_id": user_id, "prize_name": prize_name}, True
+        return entry, False
+
+    return get_backend().update(CLAIMED_MESSAGES, ref, _take)
+
+def _release_prize(ref):
+    """Unlock a prize message whose claim was dropped, its Claim button works again"""
+    get_backend().delete(CLAIMED_MESSAGES, ref)
+
+def _store_claim(namespace, user_id, entry):
+    """
+    Store the user's pending or failed claim (one per user). The claim it
+    replaces is not paid from there any more, so its prize message is unlocked.
+    """
+    previous = get_backend().update(namespace, str(user_id), lambda old: (entry, old))
+    if previous and previous.get('ref') and previous['ref'] != entry.get('ref'):
+        _release_prize(previous['ref'])
+
+def _acquire_claim_lock(user_id):
+    """
+    Take the user's retry lock, returns its token or None if another retry is in flight.
+    A lock older than CLAIM_LOCK_TTL was left by a dead worker and is taken over.
+    """
+    now = time.time()
+
+    def _take(held):
+        if held is not None and now - held < CLAIM_LOCK_TTL:
+            return held, None
+        return now, now
+
+    return get_backend().update(CLAIM_LOCKS, str(user_id), _take)
+
+def _release_claim_lock(user_id, token):
+    """Release the lock only if it is still ours (not taken over meanwhile)"""
+    get_backend().update(CLAIM_LOCKS, str(user_id), lambda held: (None if held == token else held, None))
+
+async def _flag_shared_wallet(bot, user, wallet, label):
+    """Tell the admin when other accounts use the same wallet (multi-account farming)"""
+    others = user_directory.others_on_wallet(user.id, wallet)
+    if not others:
+        return
+    logger.warning(f"🕵️ Wallet shared by {len(others) + 1} accounts ({label})")
+    try:
+        await bot.send_message(
+            chat_id=ADMIN_ID,
+            text=format_admin_shared_wallet(
+                _user_link(user.id, user.first_name or user.username or "Player"),
+                wallet, [_user_link(i) for i in others], label
+            ),
+            parse_mode='HTML'
+        )
+    except Exception as e:
+        logger.error(f"❌ Could not notify admin about shared wallet: {e}")
+
+async def _claim_or_park(bot, user, prize_name, wallet, chat_id, thread_id=None, on_sent=None, ref=None):
+    """process_claim, or None if the RPC circuit is open and the claim was parked"""
+    if not rpc_breaker.is_open():
+        try:
+            return await process_claim(prize_name, wallet, bot, chat_id, on_sent, ref)
+        except CircuitOpenError:
+            pass
+    parked_claims.park(user.id, user.first_name or user.username or "Player", prize_name, wallet, chat_id, thread_id, ref)
+    return None
+
+async def _deliver_parked_claim(bot, user_id, entry, result):
+    """Announce the outcome of a parked claim retried after the RPC came back"""
+    success, message, tx_hash = result
+    prize_name, wallet = entry['prize_name'], entry['wallet']
+    user_link = f'<a href="tg://user?id={user_id}">{entry["username"]}</a>'
+    where = {"chat_id": entry['chat_id'], "message_thread_id": entry.get('thread_id'), "parse_mode": 'HTML'}
+    
+    if success:
+        text, promo_markup = format_claim_confirmed(user_link, prize_name, wallet, tx_hash)
+        await bot.send_message(text=text, reply_markup=promo_markup, **where)
+        admin_msg = format_admin_claim_success(user_link, prize_name, wallet, tx_hash, " (Parked)")
+    elif success is None:
+        await bot.send_message(text=format_claim_pending(user_link, prize_name, tx_hash), **where)
+        admin_msg = format_admin_claim_pending(user_link, prize_name, wallet, tx_hash, " (Parked)")
+    else:
+        error_message = await bot.send_message(
+            text=format_claim_error(user_link, message),
+            reply_markup=get_retry_claim_keyboard(user_id),
+            **where
+        )
+        _store_claim(FAILED_CLAIMS, user_id, {
+            "prize_name": prize_name,
+            "wallet": wallet,
+            "error": message,
+            "error_message_id": error_message.message_id,
+            "ref": entry.get('ref')
+        })
+        admin_msg = format_admin_claim_error(user_link, prize_name, wallet, message, " (Parked)")
+    await bot.send_message(chat_id=ADMIN_ID, text=admin_msg, parse_mode='HTML')
+
 # ---------------- Button callbacks ----------------
+async def _retry_claim(query, context, user_id, claim_info):
+    """Retry a failed claim, caller holds the user's claim lock"""
+    prize_name = claim_info['prize_name']
+    wallet = claim_info['wallet']
+    error_message_id = claim_info.get('error_message_id')
+    
+    user = query.from_user
+    username = user.first_name or user.username or "Player"
+    user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
+    
+    # The failed claim's message becomes the status message of the retry
+    status = ClaimStatus(context.bot, query.message.chat_id, error_message_id, query.message.message_thread_id)
+    await status.start(query.message, format_claim_status(user_link, prize_name, "retrying"))
+    
+    # Process blockchain claim
+    try:
+        result = await _claim_or_park(
+            context.bot, user, prize_name, wallet, query.message.chat_id, query.message.message_thread_id,
+            on_sent=status.on_sent(lambda tx: format_claim_status(user_link, prize_name, "submitted", tx)),
+            ref=claim_info.get('ref')
+        )
+    except Exception as e:
+        logger.exception(f"❌ Exception in process_claim (retry): {e}")
+        result = (False, f"Unexpected error: {str(e)}", None)
+    
+    if result is None:
+        # The parked claim replaces the failed one
+        get_backend().delete(FAILED_CLAIMS, str(user_id))
+        await status.show(format_claim_delayed(user_link, prize_name), final=True)
+        return
+    success, message, tx_hash = result
+    
+    if success:
+        get_backend().delete(FAILED_CLAIMS, str(user_id))
+        await status.show(*format_claim_confirmed(user_link, prize_name, wallet, tx_hash), final=True)
+        
+        # Notify admin
+        admin_msg = format_admin_claim_success(user_link, prize_name, wallet, tx_hash, " (Retry)")
+        await context.bot.send_message(
+            chat_id=ADMIN_ID,
+            text=admin_msg,
+            parse_mode='HTML'
+        )
+    elif success is None:
+        # The sent transaction settles it, another retry could pay twice
+        get_backend().delete(FAILED_CLAIMS, str(user_id))
+        await status.show(format_claim_pending(user_link, prize_name, tx_hash), final=True)
+        await context.bot.send_message(
+            chat_id=ADMIN_ID,
+            text=format_admin_claim_pending(user_link, prize_name, wallet, tx_hash, " (Retry)"),
+            parse_mode='HTML'
+        )
+    else:
+        await status.show(format_claim_error(user_link, message), get_retry_claim_keyboard(user_id), final=True)
+        claim_info['error'] = message
+        claim_info['error_message_id'] = status.message_id
+        get_backend().set(FAILED_CLAIMS, str(user_id), claim_info)
+        
+        admin_msg = format_admin_claim_error(user_link, prize_name, wallet, message, " (Retry Failed)")
+        await context.bot.send_message(
+            chat_id=ADMIN_ID,
+            text=admin_msg,
+            parse_mode='HTML'
+        )
+
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
 
     if query.data == "reroll":
-        await query.answer()
+        # slot answers the callback itself (busy alert or plain ack)
         await slot(update, context)
         return
     
@@ -345,131 +523,28 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         # Check if there's a failed claim to retry
-        if user_id not in failed_claims:
+        backend = get_backend()
+        claim_info = backend.get(FAILED_CLAIMS, str(user_id))
+        if not claim_info:
             await query.answer("✅ This claim was already completed successfully!", show_alert=True)
             return
         
-        await query.answer()
-        
-        claim_info = failed_claims[user_id]
-        prize_name = claim_info['prize_name']
-        wallet = claim_info['wallet']
-        error_message_id = claim_info.get('error_message_id')
-        
-        user = query.from_user
-        username = user.first_name or user.username or "Player"
-        user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
-        
-        loading_msg = await query.message.reply_text(
-            f"🔄 Retrying claim for {prize_name}...\n"
-            f"Please wait, this may take a few moments...",
-            parse_mode='HTML'
-        )
-        
-        # Process blockchain claim
-        try:
-            success, message, tx_hash = await process_claim(
-                prize_name, 
-                wallet, 
-                context.bot, 
-                query.message.chat_id
-            )
-        except Exception as e:
-            import traceback
-            success = False
-            message = f"Unexpected error: {str(e)}"
-            tx_hash = None
+        # Only one retry may be in flight per user, across all workers
+        lock = await asyncio.to_thread(_acquire_claim_lock, user_id)
+        if lock is None:
+            await query.answer("⏳ Your claim is already being processed!", show_alert=True)
+            return
         
         try:
-            await context.bot.delete_message(
-                chat_id=query.message.chat_id,
-                message_id=loading_msg.message_id
-            )
-        except:
-            pass
-        
-        if success:
-            del failed_claims[user_id]
-            
-            if error_message_id:
-                try:
-                    await context.bot.edit_message_text(
-                        chat_id=query.message.chat_id,
-                        message_id=error_message_id,
-                        text=(
-                            f"❌ {user_link}, there was an error processing your claim.\n\n"
-                            f"✅ <b>This claim was successfully retried!</b>"
-                        ),
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    print(f"[v0] Could not edit error message: {e}")
-            
-            success_msg = (
-                f"✅ {user_link}, your claim was successful!\n\n"
-                f"🎁 Prize: {prize_name}\n"
-                f"👛 Sent to: <code>{wallet}</code>\n"
-                f"🔗 TxHash: <code>{tx_hash}</code>\n\n"
-                f"Check your wallet!"
-            )
-            await query.message.reply_text(success_msg, parse_mode='HTML')
-            
-            promo_keyboard = [
-                [InlineKeyboardButton("🏦 Tribo Vault", url="https://worldcoin.org/mini-app?app_id=app_adf5744abe7aef9fe2a5841d4f1552d3&path=/?ref=Ortegaa")],
-                [InlineKeyboardButton("🔄 Tribo Swap", url="https://world.org/mini-app?app_id=app_06c91355851c7bcacf352395ef93a51c")]
-            ]
-            promo_markup = InlineKeyboardMarkup(promo_keyboard)
-            
-            promo_msg = (
-                f"💡 <b>Don't forget!</b>\n\n"
-                f"🏦 Enter <b>Tribo Vault</b> every day to claim your WLD for holding CDT!\n\n"
-                f"🛒 Use your TSN to buy more NFTs in <b>Tribo Swap & NFT</b>!"
-            )
-            await query.message.reply_text(promo_msg, parse_mode='HTML', reply_markup=promo_markup)
-            
-            # Notify admin
-            admin_msg = (
-                f"💰 Prize Claimed Successfully (Retry)\n\n"
-                f"Winner: {user_link}\n"
-                f"Prize: {prize_name}\n"
-                f"Wallet: <code>{wallet}</code>\n"
-                f"TxHash: <code>{tx_hash}</code>"
-            )
-            await context.bot.send_message(
-                chat_id=ADMIN_ID,
-                text=admin_msg,
-                parse_mode='HTML'
-            )
-        else:
-            failed_claims[user_id]['error'] = message
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Retry Claim", callback_data=f"retry_claim_{user_id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            error_msg = (
-                f"❌ {user_link}, there was an error processing your claim:\n\n"
-                f"{message}\n\n"
-                f"Please contact {ADMIN_USERNAME} for assistance.\n\n"
-                f"You can also try again by clicking the button below:"
-            )
-            new_error_msg = await query.message.reply_text(error_msg, parse_mode='HTML', reply_markup=reply_markup)
-            failed_claims[user_id]['error_message_id'] = new_error_msg.message_id
-            
-            admin_msg = (
-                f"⚠️ Claim Error (Retry Failed)\n\n"
-                f"Winner: {user_link}\n"
-                f"Prize: {prize_name}\n"
-                f"Wallet: <code>{wallet}</code>\n"
-                f"Error: {message}"
-            )
-            await context.bot.send_message(
-                chat_id=ADMIN_ID,
-                text=admin_msg,
-                parse_mode='HTML'
-            )
-        
+            # Re-read under the lock, another worker may have just paid it
+            claim_info = backend.get(FAILED_CLAIMS, str(user_id))
+            if not claim_info:
+                await query.answer("✅ This claim was already completed successfully!", show_alert=True)
+                return
+            await query.answer()
+            await _retry_claim(query, context, user_id, claim_info)
+        finally:
+            await asyncio.to_thread(_release_claim_lock, user_id, lock)
         return
     
     elif query.data.startswith("register_wallet_"):
@@ -491,7 +566,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = user.id
         username = user.first_name or user.username or "Player"
         
-        bot_username = (await context.bot.get_me()).username
+        bot_username = render_cache.get_bot_username() or (await context.bot.get_me()).username
         
         instructions = (
             f"👋 Hi {username}!\n\n"
@@ -517,14 +592,24 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         clicker_id = query.from_user.id
         msg_id = query.message.message_id
 
-        if msg_id in claimed_messages:
-            await query.answer("⛔ This prize has already been claimed!", show_alert=True)
-            return
-
         if clicker_id != winner_id:
             await query.answer("⛔ This is not your prize!", show_alert=True)
             return
 
+        # Lock the prize message atomically so it can only be paid once
+        backend = get_backend()
+        claim_key = f"{query.message.chat_id}:{msg_id}"
+        if not backend.set_if_absent(CLAIMED_MESSAGES, claim_key, {"user_id": clicker_id, "prize_name": prize_name}):
+            held = backend.get(CLAIMED_MESSAGES, claim_key) or {}
+            if held.get("pending"):
+                await query.answer("📝 Register your wallet with /wallet in private chat, "
+                                   "the prize is sent right after.", show_alert=True)
+            elif (backend.get(FAILED_CLAIMS, str(clicker_id)) or {}).get("ref") == claim_key:
+                await query.answer("🔄 Use the Retry button of your failed claim.", show_alert=True)
+            else:
+                await query.answer("⛔ This prize has already been claimed!", show_alert=True)
+            return
+
         await query.answer()
         
         user = query.from_user
@@ -535,10 +620,13 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         wallet = get_user_wallet(user_id)
         
         if not wallet:
-            pending_claims[user_id] = {
+            # The prize message stays locked, /wallet pays the pending claim
+            backend.set(CLAIMED_MESSAGES, claim_key, {"user_id": user_id, "prize_name": prize_name, "pending": True})
+            _store_claim(PENDING_CLAIMS, user_id, {
                 "prize_name": prize_name,
-                "message_id": msg_id
-            }
+                "message_id": msg_id,
+                "ref": claim_key
+            })
             
             keyboard = [
                 [InlineKeyboardButton("📝 How to Register Wallet", callback_data=f"register_wallet_{user_id}")]
@@ -554,111 +642,59 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        print(f"[v0] Processing claim for user {user_id}, prize: {prize_name}, wallet: {wallet}")
+        await _flag_shared_wallet(context.bot, user, wallet, f"claim of {prize_name}")
         
-        claimed_messages[msg_id] = {
-            "user_id": user_id,
-            "prize_name": prize_name
-        }
-        
-        loading_msg = await query.message.reply_text(
-            f"⏳ Processing your claim for {prize_name}...\n"
-            f"Please wait, this may take a few moments...",
-            parse_mode='HTML'
-        )
+        # One status message, edited from queued to the final result
+        status = ClaimStatus(context.bot, query.message.chat_id, thread_id=query.message.message_thread_id)
+        await status.start(query.message, format_claim_status(user_link, prize_name, "queued"))
         
         try:
-            print(f"[v0] Calling process_claim with prize_name={prize_name}, wallet={wallet}")
-            success, message, tx_hash = await process_claim(
-                prize_name, 
-                wallet, 
-                context.bot, 
-                query.message.chat_id
+            result = await _claim_or_park(
+                context.bot, user, prize_name, wallet, query.message.chat_id, query.message.message_thread_id,
+                on_sent=status.on_sent(lambda tx: format_claim_status(user_link, prize_name, "submitted", tx)),
+                ref=claim_key
             )
-            print(f"[v0] process_claim returned: success={success}, message={message}, tx_hash={tx_hash}")
         except Exception as e:
-            print(f"[v0] Exception in process_claim: {str(e)}")
-            import traceback
-            print(f"[v0] Traceback: {traceback.format_exc()}")
-            success = False
-            message = f"Unexpected error: {str(e)}"
-            tx_hash = None
+            logger.exception(f"❌ Exception in process_claim: {e}")
+            result = (False, f"Unexpected error: {str(e)}", None)
         
-        try:
-            await context.bot.delete_message(
-                chat_id=query.message.chat_id,
-                message_id=loading_msg.message_id
-            )
-        except:
-            pass
+        if result is None:
+            # The prize message stays locked, the parked claim owns it
+            await status.show(format_claim_delayed(user_link, prize_name), final=True)
+            return
+        success, message, tx_hash = result
         
         if success:
-            success_msg = (
-                f"✅ {user_link}, your claim was successful!\n\n"
-                f"🎁 Prize: {prize_name}\n"
-                f"👛 Sent to: <code>{wallet}</code>\n"
-                f"🔗 TxHash: <code>{tx_hash}</code>\n\n"
-                f"Check your wallet!"
-            )
-            await query.message.reply_text(success_msg, parse_mode='HTML')
-            
-            promo_keyboard = [
-                [InlineKeyboardButton("🏦 Tribo Vault", url="https://worldcoin.org/mini-app?app_id=app_adf5744abe7aef9fe2a5841d4f1552d3&path=/?ref=Ortegaa")],
-                [InlineKeyboardButton("🔄 Tribo Swap", url="https://world.org/mini-app?app_id=app_06c91355851c7bcacf352395ef93a51c")]
-            ]
-            promo_markup = InlineKeyboardMarkup(promo_keyboard)
-            
-            promo_msg = (
-                f"💡 <b>Don't forget!</b>\n\n"
-                f"🏦 Enter <b>Tribo Vault</b> every day to claim your WLD for holding CDT!\n\n"
-                f"🛒 Use your TSN to buy more NFTs in <b>Tribo Swap & NFT</b>!"
-            )
-            await query.message.reply_text(promo_msg, parse_mode='HTML', reply_markup=promo_markup)
+            await status.show(*format_claim_confirmed(user_link, prize_name, wallet, tx_hash), final=True)
             
             # Notify admin
-            admin_msg = (
-                f"💰 Prize Claimed Successfully\n\n"
-                f"Winner: {user_link}\n"
-                f"Prize: {prize_name}\n"
-                f"Wallet: <code>{wallet}</code>\n"
-                f"TxHash: <code>{tx_hash}</code>"
-            )
+            admin_msg = format_admin_claim_success(user_link, prize_name, wallet, tx_hash)
             await context.bot.send_message(
                 chat_id=ADMIN_ID,
                 text=admin_msg,
                 parse_mode='HTML'
             )
-        else:
-            if msg_id in claimed_messages:
-                del claimed_messages[msg_id]
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Retry Claim", callback_data=f"retry_claim_{user_id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            error_msg = (
-                f"❌ {user_link}, there was an error processing your claim:\n\n"
-                f"{message}\n\n"
-                f"Please contact {ADMIN_USERNAME} for assistance.\n\n"
-                f"You can also try again by clicking the button below:"
+        elif success is None:
+            # Still unmined: no retry (a new nonce could pay twice), the prize stays locked
+            await status.show(format_claim_pending(user_link, prize_name, tx_hash), final=True)
+            await context.bot.send_message(
+                chat_id=ADMIN_ID,
+                text=format_admin_claim_pending(user_link, prize_name, wallet, tx_hash),
+                parse_mode='HTML'
             )
-            error_message = await query.message.reply_text(error_msg, parse_mode='HTML', reply_markup=reply_markup)
+        else:
+            # The prize message stays locked: Retry is the only way to pay it again
+            await status.show(format_claim_error(user_link, message), get_retry_claim_keyboard(user_id), final=True)
             
-            failed_claims[user_id] = {
+            _store_claim(FAILED_CLAIMS, user_id, {
                 "prize_name": prize_name,
                 "wallet": wallet,
                 "error": message,
-                "error_message_id": error_message.message_id
-            }
+                "error_message_id": status.message_id,
+                "ref": claim_key
+            })
             
-            admin_msg = (
-                f"⚠️ Claim Error\n\n"
-                f"Winner: {user_link}\n"
-                f"Prize: {prize_name}\n"
-                f"Wallet: <code>{wallet}</code>\n"
-                f"Error: {message}"
-            )
+            admin_msg = format_admin_claim_error(user_link, prize_name, wallet, message)
             await context.bot.send_message(
                 chat_id=ADMIN_ID,
                 text=admin_msg,
@@ -693,26 +729,125 @@ async def ids(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(info)
 
+# ---------------- Admin treasury ----------------
+async def treasury_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not user or user.id != ADMIN_ID:
+        await update.message.reply_text("⛔ You are not authorized.")
+        return
+
+    # One multicall for every token and signer balance
+    try:
+        ready = await treasury.refresh()
+    except Exception as e:
+        await update.message.reply_text(f"❌ Could not read the treasury: {e}")
+        return
+    if not ready:
+        await update.message.reply_text("⚠️ Web3 is not configured or not ready yet.")
+        return
+
+    # The ledger waits while a reconciliation range commits: read it off the loop
+    ledger = await asyncio.to_thread(payout_ledger.summary)
+    await update.message.reply_text(
+        format_treasury_status(treasury.payability, signer_pool.pool.status(),
+                               rpc_breaker.status(), parked_claims.count(), ledger),
+        parse_mode='HTML'
+    )
+
+# ---------------- Admin shared wallets ----------------
+async def shared_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/shared [wallet]: wallets used by several accounts, or the users of one wallet"""
+    user = update.effective_user
+    if not user or user.id != ADMIN_ID:
+        await update.message.reply_text("⛔ You are not authorized.")
+        return
+
+    if context.args:
+        wallet = context.args[0]
+        ids = user_directory.users_for_wallet(wallet)
+        groups = [(wallet, ids)] if ids else []
+    else:
+        groups = user_directory.shared_wallets()
+    await update.message.reply_text(
+        format_shared_wallets([(w, [_user_link(i) for i in ids]) for w, ids in groups]),
+        parse_mode='HTML'
+    )
+
+# ---------------- Admin export ----------------
+async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export <dataset> [ndjson|csv]: streamed to the admin's private chat as documents"""
+    user = update.effective_user
+    if not user or user.id != ADMIN_ID:
+        await update.message.reply_text("⛔ You are not authorized.")
+        return
+
+    args = context.args or []
+    dataset = args[0] if args else None
+    fmt = args[1] if len(args) > 1 else "ndjson"
+    if dataset not in exporter.DATASETS or fmt not in exporter.FORMATS:
+        await update.message.reply_text(
+            f"Usage: /export <{'|'.join(exporter.DATASETS)}> [{'|'.join(exporter.FORMATS)}]"
+        )
+        return
+
+    # Wallets and usernames never go to a group, only to the admin
+    try:
+        parts = await exporter.send_export(context.bot, user.id, dataset, fmt)
+    except Exception as e:
+        logger.exception(f"❌ Export of {dataset} failed: {e}")
+        await update.message.reply_text(f"❌ Export failed: {e}")
+        return
+    if not parts:
+        await update.message.reply_text(f"📭 Nothing to export in {dataset}.")
+
 # ---------------- Scheduler ----------------
 async def post_init(application):
-    init_web3()
+    # Bot.initialize() already fetched getMe, cache it for the callbacks
+    render_cache.set_bot_identity(application.bot.username, application.bot.id)
+    render_cache.warm_up()
+    # Web3 and the first scheduler post warm up concurrently in the background,
+    # polling (and /slot) starts as soon as post_init returns
+    start_warm_up()
+    treasury.start_monitor(application.bot)
+    gas_cache.start_refresher()
+    signer_pool.start_lease_keeper()
+    parked_claims.start_retrier(application.bot, _deliver_parked_claim)
+    payout_ledger.start_reconciler(application.bot)
     asyncio.create_task(start_scheduler(application.bot))
     logger.info("📅 Scheduler initialized")
 
 # ---------------- Main ----------------
-def main():
-    if not BOT_TOKEN:
-        logger.error("ERROR: TELEGRAM_BOT_TOKEN is not configured!")
-        return
-
-    application = Application.builder().token(BOT_TOKEN).build()
+def build_application(concurrent_updates=False):
+    """Application with every handler registered, pointed at TELEGRAM_API_URL if set"""
+    builder = Application.builder().token(BOT_TOKEN).concurrent_updates(concurrent_updates)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    application = builder.build()
+    structured_log.install(application)
+    if RECORD_UPDATES_FILE:
+        traffic_recorder.install(application, RECORD_UPDATES_FILE)
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("slot", slot))
     application.add_handler(CommandHandler("prizes", prizes))
     application.add_handler(CommandHandler("wallet", wallet_cmd))
     application.add_handler(CommandHandler("ids", ids))
+    application.add_handler(CommandHandler("treasury", treasury_cmd))
+    application.add_handler(CommandHandler("shared", shared_cmd))
+    application.add_handler(CommandHandler("export", export_cmd))
     application.add_handler(CallbackQueryHandler(button_callback))
     application.post_init = post_init
+    return application
+
+def main():
+    structured_log.setup_logging()
+    if not BOT_TOKEN:
+        logger.error("ERROR: TELEGRAM_BOT_TOKEN is not configured!")
+        return
+
+    # Rebuild spins/cooldowns/stats from the journal before the first update
+    event_journal.start_compactor()
+
+    application = build_application(concurrent_updates=CONCURRENT_UPDATES)
 
     logger.info(f"🎰 {BOT_NAME} started successfully!")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
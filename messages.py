@@ -1,8 +1,13 @@
 import random
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import render_cache
 from config import ADMIN_USERNAME, PRIZES
 
 SPIN_ANIMATION = "🎰 Spinning the slot...\n\n[▓▓▓▓▓▓▓▓▓] 100%\nGood luck! 🍀"
 
+TRIBO_VAULT_URL = "https://worldcoin.org/mini-app?app_id=app_adf5744abe7aef9fe2a5841d4f1552d3&path=/?ref=Ortegaa"
+TRIBO_SWAP_URL = "https://world.org/mini-app?app_id=app_06c91355851c7bcacf352395ef93a51c"
+
 LOSE_MESSAGES = [
     "❌ You didn't win this time.\nTry your luck again!",
     "❌ Almost there! Not quite a winning combination.\nSpin again!",
@@ -43,11 +48,14 @@ def format_result_message(prize, symbols, username, user_id):
 
     return base_message + message + footer
 
-def get_cooldown_message(time_remaining, username, user_id, is_winner=False):
-    """Format cooldown message"""
+def _format_time_left(time_remaining):
     minutes, seconds = divmod(int(time_remaining), 60)
     hours, minutes = divmod(minutes, 60)
-    time_str = f"{hours}h {minutes}m {seconds}s" if hours else f"{minutes}m {seconds}s"
+    return f"{hours}h {minutes}m {seconds}s" if hours else f"{minutes}m {seconds}s"
+
+def get_cooldown_message(time_remaining, username, user_id, is_winner=False):
+    """Format cooldown message"""
+    time_str = _format_time_left(time_remaining)
 
     user_link = f'<a href="tg://user?id={user_id}">{username}</a>'
 
@@ -56,8 +64,16 @@ def get_cooldown_message(time_remaining, username, user_id, is_winner=False):
     else:
         return f"⏳ {user_link}, you reached the max spins for today!\n\nYou can play again in: {time_str}"
 
-def get_start_message():
-    """Get the start message with all prizes"""
+def get_cooldown_alert(time_remaining, is_winner=False):
+    """Cooldown as a callback alert (plain text, 200 chars max)"""
+    time_str = _format_time_left(time_remaining)
+    if is_winner:
+        return f"🎉 You already won a prize!\n\nYou can play again in: {time_str}"
+    return f"⏳ You reached the max spins for today!\n\nYou can play again in: {time_str}"
+
+# -------------------- Pre-rendered (render_cache) --------------------
+
+def _build_start_message():
     prize_list = "\n".join([f"• {p['name']} - {p['symbol']}{p['symbol']}{p['symbol']}" for p in PRIZES])
 
     return f"""
@@ -72,3 +88,214 @@ Use /slot to spin the reels!
 
 Good luck! 🎯
 """
+
+def _build_prizes_message():
+    prize_list = "\n".join([
+        f"• {p['name']} - {p['symbol']}{p['symbol']}{p['symbol']} (Probability: {p['probability']}%)"
+        for p in PRIZES
+    ])
+    return f"""
+🎰 **Tribo Slot Game - Available Prizes** 🎰
+
+{prize_list}
+
+Use /slot to spin and try your luck! 🍀
+"""
+
+def _build_promo():
+    keyboard = [
+        [InlineKeyboardButton("🏦 Tribo Vault", url=TRIBO_VAULT_URL)],
+        [InlineKeyboardButton("🔄 Tribo Swap", url=TRIBO_SWAP_URL)]
+    ]
+    message = (
+        f"💡 <b>Don't forget!</b>\n\n"
+        f"🏦 Enter <b>Tribo Vault</b> every day to claim your WLD for holding CDT!\n\n"
+        f"🛒 Use your TSN to buy more NFTs in <b>Tribo Swap & NFT</b>!"
+    )
+    return message, InlineKeyboardMarkup(keyboard)
+
+def _build_spin_again_keyboard():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("🎰 Spin Again", callback_data="reroll")]])
+
+render_cache.register("start_message", _build_start_message)
+render_cache.register("prizes_message", _build_prizes_message)
+render_cache.register("promo", _build_promo)
+render_cache.register("spin_again_keyboard", _build_spin_again_keyboard)
+
+def get_start_message():
+    """Get the start message with all prizes"""
+    return render_cache.get("start_message")
+
+def get_prizes_message():
+    """Get the /prizes message with probabilities"""
+    return render_cache.get("prizes_message")
+
+def get_promo_message():
+    """Get the post-claim promo message and its keyboard"""
+    return render_cache.get("promo")
+
+BUSY_MESSAGE = "🎰 The slot machine is busy right now, try again in a few seconds!"
+
+def get_spin_again_keyboard():
+    """Keyboard shown under a losing spin"""
+    return render_cache.get("spin_again_keyboard")
+
+def get_winner_keyboard(user_id, prize_name):
+    """Keyboard shown under a winning spin"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🎰 Spin", callback_data="reroll")],
+        [InlineKeyboardButton("💰 Claim", callback_data=f"claim_{user_id}_{prize_name}")]
+    ])
+
+def get_retry_claim_keyboard(user_id):
+    """Keyboard with the retry button for a failed claim"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔄 Retry Claim", callback_data=f"retry_claim_{user_id}")]
+    ])
+
+# -------------------- Claim templates --------------------
+
+def format_claim_success(user_link, prize_name, wallet, tx_hash):
+    """Message sent to the winner after a successful claim"""
+    return (
+        f"✅ {user_link}, your claim was successful!\n\n"
+        f"🎁 Prize: {prize_name}\n"
+        f"👛 Sent to: <code>{wallet}</code>\n"
+        f"🔗 TxHash: <code>{tx_hash}</code>\n\n"
+        f"Check your wallet!"
+    )
+
+def format_claim_confirmed(user_link, prize_name, wallet, tx_hash):
+    """Final claim status: the success message with the promo merged in, and its keyboard"""
+    promo_msg, promo_markup = get_promo_message()
+    return f"{format_claim_success(user_link, prize_name, wallet, tx_hash)}\n\n{promo_msg}", promo_markup
+
+def format_claim_status(user_link, prize_name, stage, tx_hash=None):
+    """In-progress text of the live claim status message (queued, retrying, submitted)"""
+    if stage == "submitted":
+        return (
+            f"📤 {user_link}, your {prize_name} claim was sent to the network.\n\n"
+            f"🔗 TxHash: <code>{tx_hash}</code>\n\n"
+            f"Waiting for confirmation..."
+        )
+    if stage == "retrying":
+        return (
+            f"🔄 {user_link}, retrying your claim for {prize_name}...\n"
+            f"Please wait, this may take a few moments..."
+        )
+    return (
+        f"⏳ {user_link}, processing your claim for {prize_name}...\n"
+        f"Please wait, this may take a few moments..."
+    )
+
+def format_claim_error(user_link, error):
+    """Message sent to the winner after a failed claim"""
+    return (
+        f"❌ {user_link}, there was an error processing your claim:\n\n"
+        f"{error}\n\n"
+        f"Please contact {ADMIN_USERNAME} for assistance.\n\n"
+        f"You can also try again by clicking the button below:"
+    )
+
+def format_claim_delayed(user_link, prize_name):
+    """Message sent when a claim is parked because the RPC is down"""
+    return (
+        f"⏳ {user_link}, payouts are delayed right now.\n\n"
+        f"Your {prize_name} claim is saved and will be sent automatically "
+        f"as soon as the network is reachable again. No need to click again!"
+    )
+
+def format_claim_pending(user_link, prize_name, tx_hash):
+    """Message sent when the claim transaction is still unmined after every fee bump"""
+    return (
+        f"⏳ {user_link}, your {prize_name} claim is on its way.\n\n"
+        f"🔗 TxHash: <code>{tx_hash}</code>\n\n"
+        f"The network is slow right now; the transaction will confirm on its own. "
+        f"No need to click again!"
+    )
+
+def format_admin_claim_success(user_link, prize_name, wallet, tx_hash, label=""):
+    """Admin notification for a successful claim"""
+    return (
+        f"💰 Prize Claimed Successfully{label}\n\n"
+        f"Winner: {user_link}\n"
+        f"Prize: {prize_name}\n"
+        f"Wallet: <code>{wallet}</code>\n"
+        f"TxHash: <code>{tx_hash}</code>"
+    )
+
+def format_admin_claim_error(user_link, prize_name, wallet, error, label=""):
+    """Admin notification for a failed claim"""
+    return (
+        f"⚠️ Claim Error{label}\n\n"
+        f"Winner: {user_link}\n"
+        f"Prize: {prize_name}\n"
+        f"Wallet: <code>{wallet}</code>\n"
+        f"Error: {error}"
+    )
+
+def format_admin_claim_pending(user_link, prize_name, wallet, tx_hash, label=""):
+    """Admin notification for a claim whose transaction is still unmined"""
+    return (
+        f"⏳ Claim Pending{label}\n\n"
+        f"Winner: {user_link}\n"
+        f"Prize: {prize_name}\n"
+        f"Wallet: <code>{wallet}</code>\n"
+        f"TxHash: <code>{tx_hash}</code>\n"
+        f"The payout ledger settles it once it is mined."
+    )
+
+def format_admin_shared_wallet(user_link, wallet, other_links, label):
+    """Admin notification: a wallet used by more than one account"""
+    return (
+        f"🕵️ Shared Wallet ({label})\n\n"
+        f"User: {user_link}\n"
+        f"Wallet: <code>{wallet}</code>\n"
+        f"Also used by: {', '.join(other_links)}"
+    )
+
+# -------------------- Admin --------------------
+
+def format_treasury_status(payability, signers, circuit=None, parked=0, ledger=None):
+    """/treasury: payability table, signer gas balances, RPC circuit and payout ledger"""
+    prize_lines = "\n".join(
+        f"{'✅' if row['payable'] else '🚫'} {name}: {row['payouts_left']} payouts left"
+        for name, row in payability.items()
+    )
+    signer_lines = "\n".join(
+        f"• <code>{s['address']}</code>: {(s['balance'] or 0) / 10**18:.6f} ETH, {s['in_flight']} in flight"
+        f"{'' if s['leased'] else ' (used by another worker)'}"
+        for s in signers
+    )
+    circuit_line = ""
+    if circuit:
+        circuit_line = (
+            f"\n\n🔌 RPC circuit: {circuit['state']} "
+            f"({circuit['failures']}/{circuit['calls']} failed), {parked} parked claim(s)"
+        )
+    ledger_line = ""
+    if ledger:
+        counts = ", ".join(f"{n} {status}" for status, n in sorted(ledger['attempts'].items())) or "no attempts"
+        scanned = "not scanned yet" if ledger['checkpoint'] is None else f"scanned to block {ledger['checkpoint']}"
+        ledger_line = (
+            f"\n\n📒 Ledger: {counts}; {ledger['orphans']} orphan(s), "
+            f"{ledger['doubles']} double payment(s), {scanned}"
+        )
+    return (
+        f"🏦 <b>Treasury</b>\n\n"
+        f"🎁 Prizes:\n{prize_lines}\n\n"
+        f"⛽ Signers:\n{signer_lines}"
+        f"{circuit_line}"
+        f"{ledger_line}"
+    )
+
+def format_shared_wallets(groups, limit=20):
+    """/shared: [(wallet, [user_link])] of wallets used by several accounts"""
+    if not groups:
+        return "✅ No wallet is shared between accounts."
+    lines = "\n".join(
+        f"• <code>{wallet}</code> ({len(links)}): {', '.join(links)}"
+        for wallet, links in groups[:limit]
+    )
+    more = f"\n… and {len(groups) - limit} more" if len(groups) > limit else ""
+    return f"🕵️ <b>Shared wallets</b>\n\n{lines}{more}"
@@ -0,0 +1,70 @@
+"""
+Bulk balance reads through Multicall3
+Any number of getBalance(token) calls on the prize contract and ETH
+balance reads are packed into a single aggregate3 eth_call, so reading
+every prize token plus every signer costs one RPC round trip.
+Falls back to one call per read where Multicall3 is not deployed.
+"""
+import logging
+from config import MULTICALL_ADDRESS, MULTICALL_ABI
+from address_utils import checksum_address
+
+logger = logging.getLogger(__name__)
+
+_multicall = None
+_unavailable = False  # Multicall3 has no code on this chain, always read one by one
+
+def _bind(w3):
+    global _multicall
+    if _multicall is None or _multicall.w3 is not w3:
+        _multicall = w3.eth.contract(address=w3.to_checksum_address(MULTICALL_ADDRESS), abi=MULTICALL_ABI)
+    return _multicall
+
+def aggregate(w3, calls):
+    """[(target, calldata)] -> [(success, return data)], one eth_call"""
+    multicall = _bind(w3)
+    return multicall.functions.aggregate3([(target, True, data) for target, data in calls]).call()
+
+def _decode_uint(w3, success, data):
+    if not success or len(data) < 32:
+        return None
+    return w3.codec.decode(['uint256'], data)[0]
+
+def _read_aggregated(w3, contract, tokens, addresses):
+    multicall = _bind(w3)
+    calls = [(contract.address, contract.encodeABI(fn_name='getBalance', args=[t])) for t in tokens]
+    calls += [(multicall.address, multicall.encodeABI(fn_name='getEthBalance', args=[a])) for a in addresses]
+    results = [_decode_uint(w3, success, data) for success, data in aggregate(w3, calls)]
+    return dict(zip(tokens, results[:len(tokens)])), dict(zip(addresses, results[len(tokens):]))
+
+def _read_single(w3, contract, tokens, addresses):
+    token_balances, eth_balances = {}, {}
+    for token in tokens:
+        try:
+            token_balances[token] = contract.functions.getBalance(token).call()
+        except Exception as e:
+            logger.warning(f"⚠️ getBalance({token}) failed: {e}")
+            token_balances[token] = None
+    for address in addresses:
+        eth_balances[address] = w3.eth.get_balance(address)
+    return token_balances, eth_balances
+
+def read_balances(w3, contract, tokens=(), addresses=()):
+    """
+    Contract balance of each token and ETH balance of each address (blocking).
+    Returns ({checksum token: balance}, {address: wei}); a failed token read is None.
+    """
+    global _unavailable
+    tokens = list(dict.fromkeys(checksum_address(t) for t in tokens))
+    addresses = list(dict.fromkeys(addresses))
+
+    if not _unavailable:
+        try:
+            return _read_aggregated(w3, contract, tokens, addresses)
+        except Exception as e:
+            try:
+                _unavailable = not w3.eth.get_code(w3.to_checksum_address(MULTICALL_ADDRESS))
+            except Exception:
+                pass
+            logger.warning(f"⚠️ Multicall read failed, reading one by one: {e}")
+    return _read_single(w3, contract, tokens, addresses)
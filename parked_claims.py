@@ -0,0 +1,90 @@
+"""
+Claims parked while the RPC circuit is open
+A claim that arrives while the endpoint is down is stored in the shared
+backend instead of waiting on timeouts. A background task retries the
+parked claims once the circuit lets requests through again (probing it
+when half-open) and hands each outcome to the caller's deliver callback.
+"""
+import asyncio
+import logging
+import time
+import web3_payment
+from circuit_breaker import breaker, CircuitOpenError, CLOSED, HALF_OPEN
+from state_backend import get_backend
+from config import PARKED_RETRY_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# ref (the prize message) -> {"user_id", "prize_name", "wallet", "chat_id", "thread_id", "username", "parked_at", "ref"}
+PARKED_CLAIMS = "parked_claims"
+_retrier_task = None
+
+def park(user_id, username, prize_name, wallet, chat_id, thread_id=None, ref=None):
+    """Park one claim, keyed by its prize so several claims of one user all survive"""
+    key = ref or f"{user_id}:{time.time_ns()}"
+    get_backend().set(PARKED_CLAIMS, key, {
+        "user_id": user_id,
+        "prize_name": prize_name,
+        "wallet": wallet,
+        "chat_id": chat_id,
+        "thread_id": thread_id,
+        "username": username,
+        "parked_at": time.time(),
+        "ref": ref
+    })
+    logger.warning(f"🅿️ Claim for {prize_name} parked, RPC circuit is open")
+
+def count():
+    return len(get_backend().items(PARKED_CLAIMS))
+
+async def _circuit_usable():
+    """True once requests flow; a half-open circuit is probed with eth_blockNumber"""
+    if breaker.current_state() == HALF_OPEN and web3_payment.w3 is not None:
+        try:
+            await asyncio.to_thread(lambda: web3_payment.w3.eth.block_number)
+        except Exception:
+            pass
+    return breaker.current_state() == CLOSED
+
+async def retry_parked(bot, deliver):
+    """
+    One pass over the parked claims, stops early if the circuit opens again.
+    deliver(bot, user_id, entry, result) announces each outcome.
+    """
+    backend = get_backend()
+    for key in backend.items(PARKED_CLAIMS):
+        if not await _circuit_usable():
+            return
+        # Pop first: with several workers only one of them pays the claim
+        entry = backend.pop(PARKED_CLAIMS, key)
+        if entry is None:
+            continue
+        try:
+            result = await web3_payment.process_claim(entry["prize_name"], entry["wallet"], bot, entry["chat_id"],
+                                                      ref=entry.get("ref"))
+        except CircuitOpenError:
+            backend.set(PARKED_CLAIMS, key, entry)
+            return
+        except Exception as e:
+            logger.exception(f"❌ Parked claim retry failed: {e}")
+            result = (False, f"Unexpected error: {str(e)}", None)
+        try:
+            await deliver(bot, entry["user_id"], entry, result)
+        except Exception as e:
+            logger.error(f"❌ Could not announce parked claim result: {e}")
+
+async def run_retrier(bot, deliver):
+    while True:
+        await asyncio.sleep(PARKED_RETRY_INTERVAL)
+        try:
+            if count():
+                await retry_parked(bot, deliver)
+        except Exception as e:
+            logger.error(f"❌ Parked claim retrier error: {e}")
+
+def start_retrier(bot, deliver):
+    """Start the background retry task (idempotent)"""
+    global _retrier_task
+    if _retrier_task is None:
+        _retrier_task = asyncio.create_task(run_retrier(bot, deliver))
+    return _retrier_task
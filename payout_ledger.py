@@ -0,0 +1,422 @@
+"""
+Payout ledger: every claim attempt and what the chain says about it
+process_claim records each attempt in a SQLite file (PAYOUT_LEDGER_FILE)
+when it starts, every transaction broadcast for it, and how it ended:
+
+    paid, reverted, pending (still unmined), failed (nothing sent),
+    unconfirmed (sent, then an error), parked (RPC circuit open)
+
+Writes are queued to one ledger thread, a claim never waits on SQLite
+(or on a reconciliation holding the connection). Every broadcast hash is
+also published to the shared state backend (PAYOUT_SENDS), because each
+worker keeps its own ledger file.
+
+One worker at a time (the holder of the LEDGER_LEASE lease) reconciles:
+it reads the ERC-20 Transfer logs the prize contract emitted (eth_getLogs on the prize tokens, from = contract),
+from the checkpointed block up to LEDGER_CONFIRMATIONS behind the head.
+The block range adapts: halved when the node refuses a query, doubled
+while logs are sparse. Each range commits its transfers together with
+the new checkpoint, so a pass only costs the blocks mined since the last.
+
+Every transfer is matched to the attempt that broadcast its transaction
+(or else to an open attempt with the same token, wallet and amount), and
+that attempt becomes paid; a transaction another worker published in
+PAYOUT_SENDS is its payout. Transfers matching neither are orphans; a
+prize reference (the prize message) paid more than once is a double
+payment. Both are reported to the admin once.
+
+Claims whose transaction was still unmined after every fee bump stay
+"pending" (they are never resent with a new nonce). Each worker runs
+settle_pending() on its own: it marks them paid or "reverted" from their
+receipt and reports the reverted ones to the admin.
+"""
+import asyncio
+import logging
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from eth_hash.auto import keccak
+from config import (
+    ADMIN_ID,
+    CONTRACT_ADDRESS,
+    PRIZES,
+    PAYOUT_LEDGER_FILE,
+    LEDGER_START_BLOCK,
+    LEDGER_RECONCILE_INTERVAL,
+    LEDGER_CONFIRMATIONS,
+    LEDGER_MIN_RANGE,
+    LEDGER_MAX_RANGE,
+    LEDGER_LOGS_TARGET,
+    LEDGER_LEASE_TTL
+)
+from circuit_breaker import breaker, CircuitOpenError
+from signer_pool import LEASE_OWNER
+from state_backend import get_backend
+import web3_payment
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_TOPIC = "0x" + keccak(b"Transfer(address,address,uint256)").hex()
+# Attempts that may still turn out paid
+OPEN_STATUSES = ("started", "sent", "pending", "unconfirmed")
+_OPEN = ", ".join("?" * len(OPEN_STATUSES))
+PAYOUT_SENDS = "payout_sends"  # tx hash -> {"ref": str, "worker": "host:pid"}
+LEDGER_LEASE = "ledger_lease"  # "reconciler" -> {"owner": "host:pid", "ts": epoch}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    claim_id TEXT, ref TEXT, prize_name TEXT, token TEXT, amount TEXT, wallet TEXT,
+    status TEXT NOT NULL, tx_hash TEXT, error TEXT,
+    started_at REAL NOT NULL, finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS attempts_payout ON attempts (token, wallet, amount);
+CREATE INDEX IF NOT EXISTS attempts_ref ON attempts (ref);
+CREATE TABLE IF NOT EXISTS sends (tx_hash TEXT PRIMARY KEY, attempt_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS transfers (
+    tx_hash TEXT NOT NULL, log_index INTEGER NOT NULL, block_number INTEGER NOT NULL,
+    token TEXT NOT NULL, wallet TEXT NOT NULL, amount TEXT NOT NULL,
+    attempt_id INTEGER, flag TEXT, ref TEXT,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS transfers_attempt ON transfers (attempt_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_conn = None
+_lock = threading.Lock()
+_span = LEDGER_MAX_RANGE  # current eth_getLogs range, kept between passes
+_reconciler_task = None
+_writes = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(PAYOUT_LEDGER_FILE, timeout=10.0, isolation_level=None, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(SCHEMA)
+        if "ref" not in {row[1] for row in _conn.execute("PRAGMA table_info(transfers)")}:
+            _conn.execute("ALTER TABLE transfers ADD COLUMN ref TEXT")  # ledgers created before PAYOUT_SENDS
+    return _conn
+
+def _run_writes():
+    while True:
+        job = _writes.get()
+        try:
+            job()
+        except Exception as e:
+            # A ledger failure is logged, it never stops a payout
+            logger.error(f"❌ Payout ledger write failed: {e}")
+        finally:
+            _writes.task_done()
+
+def _queue(job):
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_run_writes, name="payout-ledger", daemon=True)
+            _writer_thread.start()
+    _writes.put(job)
+
+def _execute(sql, params):
+    with _lock:
+        _db().execute(sql, params)
+
+def _write(sql, params=()):
+    """Queue one statement for the ledger thread"""
+    _queue(lambda: _execute(sql, params))
+
+def flush():
+    """Block until every queued write is applied (not from the event loop)"""
+    _writes.join()
+
+def _new_id():
+    # Allocated here so start() returns without waiting for the insert: time-ordered, random low bits
+    return (time.time_ns() // 1000) << 12 | secrets.randbelow(4096)
+
+# -------------------- Attempts --------------------
+
+def start(claim_id, ref, prize_name, token, amount, wallet):
+    """Record a new attempt, returns its id"""
+    attempt_id = _new_id()
+    _write(
+        "INSERT INTO attempts (id, claim_id, ref, prize_name, token, amount, wallet, status, started_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 'started', ?)",
+        (attempt_id, claim_id, ref, prize_name, token and token.lower(), amount and str(amount),
+         wallet and wallet.lower(), time.time())
+    )
+    return attempt_id
+
+def _publish(tx_hash, ref):
+    get_backend().set(PAYOUT_SENDS, tx_hash, {"ref": ref, "worker": LEASE_OWNER})
+
+def sent(attempt_id, tx_hash, ref=None):
+    """A transaction was broadcast for the attempt (replacements included)"""
+    if attempt_id is None:
+        return
+    tx_hash = tx_hash.lower()
+    _queue(lambda: _publish(tx_hash, ref))
+    _write("INSERT OR IGNORE INTO sends (tx_hash, attempt_id) VALUES (?, ?)", (tx_hash, attempt_id))
+    _write("UPDATE attempts SET status = 'sent', tx_hash = ? WHERE id = ? AND status = 'started'",
+           (tx_hash, attempt_id))
+
+def finish(attempt_id, status, tx_hash=None, error=None):
+    """Record how the attempt ended"""
+    if attempt_id is None:
+        return
+    _write(
+        "UPDATE attempts SET status = ?, tx_hash = COALESCE(?, tx_hash), error = ?, finished_at = ? "
+        "WHERE id = ? AND finished_at IS NULL",
+        (status, tx_hash and tx_hash.lower(), error, time.time(), attempt_id)
+    )
+
+def close(attempt_id, error=None):
+    """End an attempt not finished explicitly: failed, or unconfirmed if something was sent"""
+    if attempt_id is None:
+        return
+    _write(
+        "UPDATE attempts SET status = CASE status WHEN 'sent' THEN 'unconfirmed' ELSE 'failed' END, "
+        "error = ?, finished_at = ? WHERE id = ? AND finished_at IS NULL",
+        (error, time.time(), attempt_id)
+    )
+
+def iter_attempts(batch=500):
+    """Yield every attempt as a dict, oldest first, reading batch rows at a time"""
+    last = 0
+    while True:
+        with _lock:
+            cursor = _db().execute("SELECT * FROM attempts WHERE id > ? ORDER BY id LIMIT ?", (last, batch))
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        for row in rows:
+            yield dict(zip(names, row))
+        if len(rows) < batch:
+            return
+        last = rows[-1][0]
+
+def summary():
+    """Attempt counts per status, flagged transfers and the checkpoint"""
+    with _lock:
+        db = _db()
+        statuses = dict(db.execute("SELECT status, COUNT(*) FROM attempts GROUP BY status").fetchall())
+        flags = dict(db.execute("SELECT flag, COUNT(*) FROM transfers WHERE flag IS NOT NULL GROUP BY flag").fetchall())
+        checkpoint = _checkpoint(db)
+    return {"attempts": statuses, "orphans": flags.get("orphan", 0), "doubles": flags.get("double", 0),
+            "checkpoint": checkpoint}
+
+# -------------------- Reconciliation --------------------
+
+def _checkpoint(db):
+    row = db.execute("SELECT value FROM meta WHERE key = 'last_block'").fetchone()
+    return None if row is None else int(row[0])
+
+def _topic_address(address):
+    return "0x" + "00" * 12 + address.lower()[2:]
+
+def _decode(log):
+    topics = log["topics"]
+    return {
+        "tx_hash": "0x" + bytes(log["transactionHash"]).hex(),
+        "log_index": int(log["logIndex"]),
+        "block_number": int(log["blockNumber"]),
+        "token": log["address"].lower(),
+        "wallet": "0x" + bytes(topics[2])[-20:].hex(),
+        "amount": str(int.from_bytes(bytes(log["data"]), "big")),
+    }
+
+def _paid_before(db, transfer, attempt_id, ref):
+    return db.execute(
+        "SELECT 1 FROM transfers t LEFT JOIN attempts a ON a.id = t.attempt_id "
+        "WHERE ((? IS NOT NULL AND t.attempt_id = ?) OR (? IS NOT NULL AND COALESCE(t.ref, a.ref) = ?)) "
+        "AND t.tx_hash != ? LIMIT 1",
+        (attempt_id, attempt_id, ref, ref, transfer["tx_hash"])
+    ).fetchone() is not None
+
+def _match(db, transfer):
+    """
+    Link one transfer to its attempt, returns (attempt_id, ref, flag);
+    flag is None, 'orphan' or 'double'. attempt_id is None for another worker's payout.
+    """
+    row = db.execute("SELECT attempt_id FROM sends WHERE tx_hash = ?", (transfer["tx_hash"],)).fetchone()
+    if row is None:
+        published = get_backend().get(PAYOUT_SENDS, transfer["tx_hash"])
+        if published is not None:
+            ref = published.get("ref")
+            return None, ref, "double" if _paid_before(db, transfer, None, ref) else None
+        row = db.execute(
+            f"SELECT id FROM attempts WHERE token = ? AND wallet = ? AND amount = ? AND status IN ({_OPEN}) "
+            "AND id NOT IN (SELECT attempt_id FROM transfers WHERE attempt_id IS NOT NULL) ORDER BY id LIMIT 1",
+            (transfer["token"], transfer["wallet"], transfer["amount"], *OPEN_STATUSES)
+        ).fetchone()
+    if row is None:
+        return None, None, "orphan"
+
+    attempt_id = row[0]
+    ref = db.execute("SELECT ref FROM attempts WHERE id = ?", (attempt_id,)).fetchone()[0]
+    paid_before = _paid_before(db, transfer, attempt_id, ref)
+    db.execute(
+        f"UPDATE attempts SET status = 'paid', tx_hash = ? WHERE id = ? AND status IN ({_OPEN})",
+        (transfer["tx_hash"], attempt_id, *OPEN_STATUSES)
+    )
+    return attempt_id, ref, "double" if paid_before else None
+
+def _store(logs, last_block):
+    """Match and store one range of logs and move the checkpoint, in one transaction"""
+    flagged = []
+    with _lock:
+        db = _db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for log in logs:
+                transfer = _decode(log)
+                exists = db.execute("SELECT 1 FROM transfers WHERE tx_hash = ? AND log_index = ?",
+                                    (transfer["tx_hash"], transfer["log_index"])).fetchone()
+                if exists:
+                    continue
+                attempt_id, ref, flag = _match(db, transfer)
+                db.execute(
+                    "INSERT INTO transfers (tx_hash, log_index, block_number, token, wallet, amount, attempt_id, flag, ref) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (transfer["tx_hash"], transfer["log_index"], transfer["block_number"], transfer["token"],
+                     transfer["wallet"], transfer["amount"], attempt_id, flag, ref)
+                )
+                if flag:
+                    flagged.append(dict(transfer, flag=flag))
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)", (str(last_block),))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    return flagged
+
+def reconcile(w3):
+    """
+    Scan the blocks mined since the checkpoint (blocking).
+    Returns the transfers flagged on the way.
+    """
+    global _span
+    flush()  # the attempts queued so far take part in the matching
+    head = w3.eth.block_number - LEDGER_CONFIRMATIONS
+    with _lock:
+        checkpoint = _checkpoint(_db())
+    if checkpoint is None:
+        checkpoint = int(LEDGER_START_BLOCK) - 1 if LEDGER_START_BLOCK else max(-1, head - LEDGER_MAX_RANGE)
+    log_filter = {
+        "address": sorted({prize['token'] for prize in PRIZES}),
+        "topics": [TRANSFER_TOPIC, _topic_address(CONTRACT_ADDRESS)],
+    }
+
+    flagged = []
+    start = checkpoint + 1
+    while start <= head:
+        end = min(head, start + _span - 1)
+        try:
+            logs = w3.eth.get_logs(dict(log_filter, fromBlock=start, toBlock=end))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            # Too many results / range too large / timeout: retry a smaller range
+            if _span <= LEDGER_MIN_RANGE:
+                raise
+            _span = max(LEDGER_MIN_RANGE, _span // 2)
+            logger.info(f"📒 eth_getLogs refused {start}-{end} ({e}), range now {_span} blocks")
+            continue
+        flagged.extend(_store(logs, end))
+        if len(logs) < LEDGER_LOGS_TARGET:
+            _span = min(LEDGER_MAX_RANGE, _span * 2)
+        start = end + 1
+    return flagged
+
+def settle_pending(w3):
+    """
+    Check the receipts of this worker's pending attempts (blocking).
+    Mined ones become paid, returns the attempts found reverted.
+    """
+    flush()
+    with _lock:
+        db = _db()
+        pending = db.execute(
+            "SELECT a.id, a.ref, a.prize_name, a.wallet, s.tx_hash FROM attempts a "
+            "JOIN sends s ON s.attempt_id = a.id WHERE a.status = 'pending' ORDER BY a.id"
+        ).fetchall()
+    reverted = []
+    for attempt_id, ref, prize_name, wallet, tx_hash in pending:
+        try:
+            receipt = w3.eth.get_transaction_receipt(tx_hash)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            continue  # not mined (or dropped) yet
+        # One nonce: this is the only replacement that will ever be mined
+        if receipt["status"] == 1:
+            _write("UPDATE attempts SET status = 'paid', tx_hash = ? WHERE id = ? AND status = 'pending'",
+                   (tx_hash, attempt_id))
+        else:
+            _write("UPDATE attempts SET status = 'reverted', tx_hash = ? WHERE id = ? AND status = 'pending'",
+                   (tx_hash, attempt_id))
+            reverted.append({"id": attempt_id, "ref": ref, "prize_name": prize_name, "wallet": wallet,
+                             "tx_hash": tx_hash})
+    return reverted
+
+async def _notify(bot, text):
+    try:
+        await bot.send_message(chat_id=ADMIN_ID, text=text, parse_mode='HTML')
+    except Exception as e:
+        logger.warning(f"⚠️ Could not send ledger alert: {e}")
+
+async def _alert(bot, flagged, reverted=()):
+    for transfer in flagged:
+        kind = "Double payment" if transfer["flag"] == "double" else "Payout with no ledger entry"
+        text = (
+            f"📒 <b>{kind}</b>\n\n"
+            f"To: <code>{transfer['wallet']}</code>\n"
+            f"Token: <code>{transfer['token']}</code>, amount {transfer['amount']}\n"
+            f"Block {transfer['block_number']}, tx <code>{transfer['tx_hash']}</code>"
+        )
+        await _notify(bot, text)
+    for attempt in reverted:
+        await _notify(bot, (
+            f"📒 <b>Pending payout reverted</b>\n\n"
+            f"Prize: {attempt['prize_name']} (message {attempt['ref']})\n"
+            f"To: <code>{attempt['wallet']}</code>\n"
+            f"Tx <code>{attempt['tx_hash']}</code>\n"
+            f"The prize is still locked, pay it manually if it is owed."
+        ))
+
+def hold_lease():
+    """Take or renew the reconciler lease (blocking), True if this worker reconciles"""
+    now = time.time()
+
+    def _take(held):
+        if held is None or held["owner"] == LEASE_OWNER or now - held["ts"] >= LEDGER_LEASE_TTL:
+            return {"owner": LEASE_OWNER, "ts": now}, True
+        return held, False
+    return get_backend().update(LEDGER_LEASE, "reconciler", _take)
+
+async def run_reconciler(bot):
+    while True:
+        await asyncio.sleep(LEDGER_RECONCILE_INTERVAL)
+        if breaker.is_open() or not await web3_payment.wait_until_ready():
+            continue
+        try:
+            flagged = []
+            if await asyncio.to_thread(hold_lease):
+                flagged = await asyncio.to_thread(reconcile, web3_payment.w3)
+            reverted = await asyncio.to_thread(settle_pending, web3_payment.w3)
+        except Exception as e:
+            logger.error(f"❌ Payout reconciliation failed: {e}")
+            continue
+        if flagged or reverted:
+            logger.warning(f"📒 Reconciliation flagged {len(flagged)} transfer(s), {len(reverted)} reverted pending payout(s)")
+            await _alert(bot, flagged, reverted)
+
+def start_reconciler(bot):
+    """Start the background reconciliation task (idempotent)"""
+    global _reconciler_task
+    if _reconciler_task is None:
+        _reconciler_task = asyncio.create_task(run_reconciler(bot))
+    return _reconciler_task
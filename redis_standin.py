@@ -0,0 +1,177 @@
+"""
+Local Redis stand-in for testing RedisBackend without a real server
+Speaks RESP and implements only the commands the bot uses:
+PING, AUTH, SELECT, HGET, HSET, HDEL, HGETALL, HSCAN, HSETNX,
+INCR, DEL, WATCH, UNWATCH, MULTI, EXEC, DISCARD
+
+Usage:
+    python redis_standin.py [port]
+"""
+import socketserver
+import sys
+import threading
+
+
+def _run(server, cmd, args):
+    """Execute one command against the server store, caller holds server.lock"""
+    store = server.store
+
+    def _bump(key):
+        server.versions[key] = server.versions.get(key, 0) + 1
+
+    if cmd == "PING":
+        return ("+", "PONG")
+    if cmd in ("AUTH", "SELECT"):
+        return ("+", "OK")
+    if cmd == "HGET":
+        return ("$", store.get(args[0], {}).get(args[1]))
+    if cmd == "HSET":
+        h = store.setdefault(args[0], {})
+        added = 0
+        for i in range(1, len(args), 2):
+            added += args[i] not in h
+            h[args[i]] = args[i + 1]
+        _bump(args[0])
+        return (":", added)
+    if cmd == "HSETNX":
+        h = store.setdefault(args[0], {})
+        if args[1] in h:
+            return (":", 0)
+        h[args[1]] = args[2]
+        _bump(args[0])
+        return (":", 1)
+    if cmd == "HDEL":
+        h = store.get(args[0], {})
+        removed = sum(1 for f in args[1:] if h.pop(f, None) is not None)
+        if removed:
+            _bump(args[0])
+        return (":", removed)
+    if cmd == "INCR":
+        value = int(store.get(args[0], 0)) + 1
+        store[args[0]] = value
+        _bump(args[0])
+        return (":", value)
+    if cmd == "DEL":
+        removed = [key for key in args if store.pop(key, None) is not None]
+        for key in removed:
+            _bump(key)
+        return (":", len(removed))
+    if cmd == "HGETALL":
+        flat = []
+        for field, value in store.get(args[0], {}).items():
+            flat.extend([field, value])
+        return ("*", flat)
+    if cmd == "HSCAN":
+        # The cursor is an offset into the sorted fields, enough for a stand-in
+        fields = sorted(store.get(args[0], {}))
+        start = int(args[1])
+        count = int(args[3]) if len(args) > 3 and args[2].upper() == "COUNT" else 10
+        flat = []
+        for field in fields[start:start + count]:
+            flat.extend([field, store[args[0]][field]])
+        cursor = start + count if start + count < len(fields) else 0
+        return ("*", [("$", str(cursor)), ("*", flat)])
+    return ("-", f"ERR unknown command '{cmd}'")
+
+
+def _encode(reply):
+    kind, value = reply
+    if kind in ("+", "-"):
+        return f"{kind}{value}\r\n".encode("utf-8")
+    if kind == ":":
+        return f":{value}\r\n".encode("utf-8")
+    if kind == "$":
+        if value is None:
+            return b"$-1\r\n"
+        data = value.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if kind == "*":
+        if value is None:
+            return b"*-1\r\n"
+        out = [b"*%d\r\n" % len(value)]
+        for item in value:
+            out.append(_encode(item) if isinstance(item, tuple) else _encode(("$", item)))
+        return b"".join(out)
+    raise ValueError(kind)
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.decode("utf-8").split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+        return args
+
+    def handle(self):
+        server = self.server
+        watched = {}
+        queued = None
+        while True:
+            args = self._read_command()
+            if not args:
+                return
+            cmd, args = args[0].upper(), args[1:]
+
+            if cmd == "WATCH":
+                with server.lock:
+                    for key in args:
+                        watched[key] = server.versions.get(key, 0)
+                reply = ("+", "OK")
+            elif cmd == "UNWATCH":
+                watched.clear()
+                reply = ("+", "OK")
+            elif cmd == "MULTI":
+                queued = []
+                reply = ("+", "OK")
+            elif cmd == "DISCARD":
+                queued = None
+                watched.clear()
+                reply = ("+", "OK")
+            elif cmd == "EXEC":
+                with server.lock:
+                    dirty = any(server.versions.get(k, 0) != v for k, v in watched.items())
+                    reply = ("*", None) if dirty else ("*", [_run(server, c, a) for c, a in queued or []])
+                queued = None
+                watched.clear()
+            elif queued is not None:
+                queued.append((cmd, args))
+                reply = ("+", "QUEUED")
+            else:
+                with server.lock:
+                    reply = _run(server, cmd, args)
+
+            self.wfile.write(_encode(reply))
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), RESPHandler)
+        self.store = {}       # key -> {field: value}
+        self.versions = {}    # key -> int, bumped on every write
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        """Serve in a daemon thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+    server = RedisStandIn(port=port)
+    print(f"Redis stand-in listening on {server.url}")
+    server.serve_forever()
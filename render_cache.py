@@ -0,0 +1,63 @@
+"""
+Pre-rendered UI cache
+Static texts and keyboards are built once from config.PRIZES and reused on
+every call. Modules register a builder per entry; the whole cache is
+rebuilt when the prize configuration changes.
+"""
+import logging
+from config import PRIZES
+
+logger = logging.getLogger(__name__)
+
+_builders = {}
+_cache = {}
+_fingerprint = None
+_bot_identity = {"username": None, "id": None}
+
+
+def _prizes_fingerprint():
+    """Cheap signature of everything the renderers read from PRIZES"""
+    return tuple((p['name'], p['symbol'], p['probability'], p['message']) for p in PRIZES)
+
+
+def register(name, builder):
+    """Register a builder function for a cached entry"""
+    _builders[name] = builder
+    _cache.pop(name, None)
+
+
+def get(name):
+    """Return a cached entry, rebuilding everything if PRIZES changed"""
+    global _fingerprint
+    fingerprint = _prizes_fingerprint()
+    if fingerprint != _fingerprint:
+        _cache.clear()
+        _fingerprint = fingerprint
+    if name not in _cache:
+        _cache[name] = _builders[name]()
+    return _cache[name]
+
+
+def warm_up():
+    """Build every registered entry, called once at startup"""
+    for name in _builders:
+        get(name)
+    logger.info(f"🎨 Render cache ready ({len(_cache)} entries)")
+
+
+def invalidate():
+    """Drop all cached entries, they are rebuilt on next access"""
+    global _fingerprint
+    _cache.clear()
+    _fingerprint = None
+
+
+def set_bot_identity(username, bot_id=None):
+    """Remember the bot's own identity, fetched once in post_init"""
+    _bot_identity["username"] = username
+    _bot_identity["id"] = bot_id
+
+
+def get_bot_username():
+    """Cached bot username or None if post_init has not run yet"""
+    return _bot_identity["username"]
@@ -1,21 +1,50 @@
+"""
+Scheduled posts engine
+A single task sleeps on a timer heap and fires every scheduled job
+(promos, daily stats, spin reset reminders) for every configured chat
+and topic. Each job has its own interval and jitter; due times are wall
+clock based and persisted, so clock drift, restarts and extra workers
+neither skip nor double post.
+"""
 import asyncio
+import heapq
+import itertools
 import logging
-import json
-import os
+import random
+import time
 from datetime import datetime
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from config import PRIZES, ALLOWED_CHAT_ID, ALLOWED_THREAD_ID
+from telegram.error import BadRequest
+import render_cache
+from config import PRIZES, SCHEDULED_TARGETS, MAX_SPINS_PER_PERIOD
+from state_backend import get_backend
+from global_stats import get_stats
 
 logger = logging.getLogger(__name__)
 
-RECURRING_MESSAGE_INTERVAL_HOURS = 3 # Send message every 3 hours
-LAST_MESSAGE_FILE = 'last_recurring_message.json'
+RECURRING_MESSAGE_INTERVAL_HOURS = 3 # Default promo interval
+RECURRING_PHOTO_URL = "https://files.catbox.moe/wacjw8.jpg"
+SPIN_PERIOD_HOURS = 15  # Same period as cooldown._get_period_start(15)
+MAX_SLEEP_SECONDS = 60  # Re-check the wall clock at least this often
 
-last_message_data = {"message_id": None}
+# Persisted in the "scheduler" namespace (LAST_MESSAGE_FILE with the json backend):
+#   <job name> -> {"next_run": epoch, "base": epoch, "message_id": int}
+#   "photo"    -> {"file_id": str}
+PHOTO_KEY = "photo"
 
-def get_recurring_message():
-    """Generate the recurring promotional message"""
+def _load_state(key):
+    return get_backend().get("scheduler", key, {})
+
+def _update_state(key, **fields):
+    def _merge(state):
+        state = state or {}
+        state.update(fields)
+        return state, None
+    get_backend().update("scheduler", key, _merge)
+
+# -------------------- Messages --------------------
 
+def _build_recurring_message():
     prize_list = "\n".join([
         f"• {p['name']} - {p['symbol']}{p['symbol']}{p['symbol']}"
         for p in PRIZES
@@ -46,51 +75,271 @@ Good luck! 🍀"""
 
     return message, reply_markup
 
-async def send_recurring_message(bot):
-    """Send a recurring message to the configured chat"""
-    global last_message_data
+render_cache.register("recurring_message", _build_recurring_message)
 
-    try:
-        if last_message_data["message_id"]:
-            try:
-                await bot.delete_message(
-                    chat_id=ALLOWED_CHAT_ID,
-                    message_id=last_message_data["message_id"]
-                )
-                logger.info(f"🗑️ Deleted previous recurring message (ID: {last_message_data['message_id']})")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not delete previous message: {e}")
+def get_recurring_message():
+    """Get the recurring promotional message (pre-rendered)"""
+    return render_cache.get("recurring_message")
+
+def get_stats_message():
+    """Daily global stats post"""
+    stats = get_stats()
+    lines = "\n".join(f"• {name}: {count}" for name, count in stats["prizes_awarded"].items())
+    return (
+        f"📊 <b>Tribo Slot Game - Daily Stats</b>\n\n"
+        f"🎰 Spins (last {stats['window_hours']}h): {stats['total_spins']}\n\n"
+        f"🏆 Prizes awarded:\n{lines}"
+    )
 
-        message, reply_markup = get_recurring_message()
+def get_reset_reminder_message():
+    """Spin period reset reminder"""
+    return (
+        f"🔄 <b>Spins have been reset!</b>\n\n"
+        f"You have {MAX_SPINS_PER_PERIOD} new spins. Type /slot to play! 🍀"
+    )
 
-        sent_message = await bot.send_photo(
-            chat_id=ALLOWED_CHAT_ID,
-            message_thread_id=ALLOWED_THREAD_ID,
-            photo="https://files.catbox.moe/wacjw8.jpg",
-            caption=message,
-            reply_markup=reply_markup,
-            parse_mode='HTML'
-        )
+# -------------------- Jobs --------------------
 
-        last_message_data["message_id"] = sent_message.message_id
+async def _send_photo(bot, job, photo, message, reply_markup):
+    return await bot.send_photo(
+        chat_id=job.chat_id,
+        message_thread_id=job.thread_id,
+        photo=photo,
+        caption=message,
+        reply_markup=reply_markup,
+        parse_mode='HTML'
+    )
 
-        logger.info(f"✅ Recurring message sent successfully at {datetime.now()} (ID: {sent_message.message_id})")
+async def _delete_previous(bot, job):
+    message_id = _load_state(job.name).get("message_id")
+    if not message_id:
+        return
+    try:
+        await bot.delete_message(chat_id=job.chat_id, message_id=message_id)
+        logger.info(f"🗑️ Deleted previous {job.name} message (ID: {message_id})")
     except Exception as e:
-        logger.error(f"❌ Error sending recurring message: {e}")
+        logger.warning(f"⚠️ Could not delete previous message: {e}")
 
-async def start_scheduler(bot):
-    """Start the recurring message scheduler"""
-    interval_seconds = RECURRING_MESSAGE_INTERVAL_HOURS * 3600
-
-    logger.info(f"📅 Scheduler started - sending messages every {RECURRING_MESSAGE_INTERVAL_HOURS} hour(s)")
- 
-    # 🔹 Enviar el primer mensaje inmediatamente al iniciar
-    await send_recurring_message(bot)
-    
-    while True:
+async def send_recurring_message(bot, job):
+    """Send the recurring promo to the job's chat, replacing the previous one"""
+    await _delete_previous(bot, job)
+
+    message, reply_markup = get_recurring_message()
+
+    # Reuse the file_id Telegram gave us, only upload from the URL once
+    file_id = _load_state(PHOTO_KEY).get("file_id")
+    sent_message = None
+    if file_id:
+        try:
+            sent_message = await _send_photo(bot, job, file_id, message, reply_markup)
+        except BadRequest as e:
+            logger.warning(f"⚠️ Cached photo file_id rejected, uploading again: {e}")
+    if sent_message is None:
+        sent_message = await _send_photo(bot, job, RECURRING_PHOTO_URL, message, reply_markup)
+        if sent_message.photo:
+            _update_state(PHOTO_KEY, file_id=sent_message.photo[-1].file_id)
+
+    _update_state(job.name, message_id=sent_message.message_id)
+    logger.info(f"✅ Recurring message sent successfully at {datetime.now()} (ID: {sent_message.message_id})")
+
+async def send_stats_message(bot, job):
+    """Post the daily global stats"""
+    sent_message = await bot.send_message(
+        chat_id=job.chat_id,
+        message_thread_id=job.thread_id,
+        text=get_stats_message(),
+        parse_mode='HTML'
+    )
+    _update_state(job.name, message_id=sent_message.message_id)
+
+async def send_reset_reminder(bot, job):
+    """Announce a new spin period, replacing the previous reminder"""
+    await _delete_previous(bot, job)
+    sent_message = await bot.send_message(
+        chat_id=job.chat_id,
+        message_thread_id=job.thread_id,
+        text=get_reset_reminder_message(),
+        reply_markup=render_cache.get("spin_now_keyboard"),
+        parse_mode='HTML'
+    )
+    _update_state(job.name, message_id=sent_message.message_id)
+
+render_cache.register(
+    "spin_now_keyboard",
+    lambda: InlineKeyboardMarkup([[InlineKeyboardButton("🎰 Spin Now!", callback_data="reroll")]])
+)
+
+class ScheduledJob:
+    """
+    One recurring post.
+    align: fire on multiples of the interval since the epoch (period
+    boundaries) instead of relative to the previous run.
+    run_at_start: fire immediately when there is no persisted schedule.
+    """
+
+    def __init__(self, name, callback, interval_seconds, chat_id, thread_id=None,
+                 jitter_seconds=0, align=False, run_at_start=False):
+        self.name = name
+        self.callback = callback
+        self.interval = interval_seconds
+        self.chat_id = chat_id
+        self.thread_id = thread_id
+        self.jitter = jitter_seconds
+        self.align = align
+        self.run_at_start = run_at_start
+        self.base = None  # due time without jitter
+        self.next_run = None
+        self.cancelled = False
+
+    def schedule_after(self, now):
+        """
+        Compute the next due time strictly after now.
+        Missed slots (downtime, clock jumps) are skipped instead of fired
+        in a burst, and the jitter never accumulates into the base.
+        """
+        if self.align:
+            base = (now // self.interval + 1) * self.interval
+        elif self.base is None:
+            base = now + self.interval
+        else:
+            base = self.base + self.interval
+            if base <= now:
+                base += ((now - base) // self.interval + 1) * self.interval
+        self.base = base
+        self.next_run = base + random.uniform(0, self.jitter)
+        return self.next_run
+
+class SchedulerEngine:
+    """Runs many ScheduledJobs from one sleeping task"""
+
+    def __init__(self):
+        self._heap = []
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running = set()
+
+    def add_job(self, job):
+        """Add a job, resuming its persisted schedule if there is one"""
+        state = _load_state(job.name)
+        now = time.time()
+        if state.get("next_run") is not None:
+            job.base = state.get("base", state["next_run"])
+            job.next_run = state["next_run"]
+        elif job.run_at_start:
+            job.base = job.next_run = now
+        else:
+            job.schedule_after(now)
+        self._jobs[job.name] = job
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+        self._wakeup.set()
+        return job
+
+    def remove_job(self, name):
+        job = self._jobs.pop(name, None)
+        if job:
+            job.cancelled = True
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def _claim(self, job, now):
+        """
+        Atomically advance the persisted schedule if the job is due.
+        Returns the next run time if this worker should fire the job now,
+        otherwise None (another worker or a previous process already did).
+        """
+        def _advance(state):
+            state = state or {}
+            if state.get("next_run") is not None and state["next_run"] > now:
+                return state, (False, state["next_run"], state.get("base", state["next_run"]))
+            if state.get("base") is not None:
+                job.base = state["base"]
+            next_run = job.schedule_after(now)
+            state["next_run"] = next_run
+            state["base"] = job.base
+            return state, (True, next_run, job.base)
+
+        fire, next_run, base = get_backend().update("scheduler", job.name, _advance)
+        job.next_run, job.base = next_run, base
+        return fire
+
+    async def _execute(self, bot, job):
         try:
-            await asyncio.sleep(interval_seconds)
-            await send_recurring_message(bot)
+            await job.callback(bot, job)
         except Exception as e:
-            logger.error(f"❌ Scheduler error: {e}")
-            await asyncio.sleep(60)
+            logger.error(f"❌ Scheduler job {job.name} failed: {e}")
+
+    async def run(self, bot):
+        """Main loop: sleep until the earliest job is due, fire, reschedule"""
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, job = self._heap[0]
+            if job.cancelled:
+                heapq.heappop(self._heap)
+                continue
+
+            delay = due - time.time()
+            if delay > 0:
+                # Short bounded sleeps keep us honest if the wall clock jumps
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            try:
+                if self._claim(job, time.time()):
+                    task = asyncio.create_task(self._execute(bot, job))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            except Exception as e:
+                logger.error(f"❌ Scheduler error: {e}")
+                job.next_run = time.time() + MAX_SLEEP_SECONDS
+            heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+
+def build_jobs(targets=SCHEDULED_TARGETS):
+    """Create the jobs for every configured chat/topic"""
+    jobs = []
+    for target in targets:
+        chat_id = target['chat_id']
+        thread_id = target.get('thread_id')
+        suffix = f"{chat_id}:{thread_id}" if thread_id is not None else f"{chat_id}"
+
+        promo_hours = target.get('promo_hours', RECURRING_MESSAGE_INTERVAL_HOURS)
+        if promo_hours:
+            jobs.append(ScheduledJob(
+                f"promo:{suffix}", send_recurring_message, promo_hours * 3600,
+                chat_id, thread_id,
+                jitter_seconds=target.get('promo_jitter_minutes', 0) * 60,
+                run_at_start=True
+            ))
+        if target.get('daily_stats'):
+            jobs.append(ScheduledJob(
+                f"stats:{suffix}", send_stats_message, 24 * 3600,
+                chat_id, thread_id, align=True
+            ))
+        if target.get('reset_reminders'):
+            jobs.append(ScheduledJob(
+                f"reset:{suffix}", send_reset_reminder, SPIN_PERIOD_HOURS * 3600,
+                chat_id, thread_id, align=True
+            ))
+    return jobs
+
+scheduler_engine = None
+
+async def start_scheduler(bot):
+    """Start the scheduled posts engine for every configured target"""
+    global scheduler_engine
+    scheduler_engine = SchedulerEngine()
+    for job in build_jobs():
+        scheduler_engine.add_job(job)
+        logger.info(f"📅 Scheduled {job.name} every {job.interval / 3600:g} hour(s)")
+
+    await scheduler_engine.run(bot)
@@ -0,0 +1,185 @@
+"""
+Hot-wallet signer pool
+Payouts are spread over every key in PRIVATE_KEYS (plus PRIVATE_KEY), each
+with its own nonce sequence, so a prize burst is not serialized behind a
+single wallet. Every signer must be allowed to call claim() on the contract.
+
+Nonces are handed out locally (read once from the pending block) so
+concurrent claims from the same signer never reuse one; when a claim
+fails before its nonce was surely used, the signer re-reads the nonce
+once it has no claim in flight.
+
+Local nonces are only safe while one process sends from a key, so with
+several workers each key is leased in the shared state backend: a worker
+only pays from the keys it holds, renews them every SIGNER_LEASE_TTL / 3
+and takes over a lease its owner stopped renewing (re-reading the nonce).
+"""
+import asyncio
+import atexit
+import contextlib
+import logging
+import os
+import socket
+import threading
+import time
+from config import PRIVATE_KEY, PRIVATE_KEYS, TREASURY_MIN_ETH, SIGNER_LEASE_TTL
+from state_backend import get_backend
+
+logger = logging.getLogger(__name__)
+
+MIN_ETH_WEI = int(TREASURY_MIN_ETH * 10**18)
+SIGNER_LEASES = "signer_leases"  # lowercased address -> {"owner": "host:pid", "ts": epoch}
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+_lease_task = None
+
+class Signer:
+    def __init__(self, account):
+        self.account = account
+        self.address = account.address
+        self.next_nonce = None  # read from the chain on first use
+        self.in_flight = 0
+        self.balance = None
+        self.needs_resync = False
+        self.leased = False
+        self._nonce_lock = threading.Lock()  # claims allocate from worker threads
+
+    def allocate_nonce(self, w3):
+        with self._nonce_lock:
+            return self._allocate_nonce(w3)
+
+    def _allocate_nonce(self, w3):
+        if self.next_nonce is None:
+            self.next_nonce = w3.eth.get_transaction_count(self.address, 'pending')
+        nonce = self.next_nonce
+        self.next_nonce += 1
+        return nonce
+
+    @property
+    def has_gas(self):
+        return self.balance is None or self.balance >= MIN_ETH_WEI
+
+class SignerPool:
+    def __init__(self):
+        self.signers = []
+
+    def load(self, keys):
+        from eth_account import Account
+        self.signers = [Signer(Account.from_key(key)) for key in keys]
+        return self.signers
+
+    @property
+    def primary(self):
+        return self.signers[0] if self.signers else None
+
+    @property
+    def available(self):
+        """Signers this worker may send from"""
+        return [s for s in self.signers if s.leased]
+
+    def pick(self):
+        """Least-loaded leased signer, preferring those with gas and then the richest"""
+        return min(
+            self.available,
+            key=lambda s: (not s.has_gas, s.in_flight, -(s.balance or 0))
+        )
+
+    def claim_leases(self):
+        """Renew this worker's leases and take free or expired ones (blocking), returns the leased signers"""
+        backend = get_backend()
+        now = time.time()
+
+        def _take(held):
+            if held is None or held["owner"] == LEASE_OWNER or now - held["ts"] >= SIGNER_LEASE_TTL:
+                return {"owner": LEASE_OWNER, "ts": now}, True
+            return held, False
+
+        for signer in self.signers:
+            leased = backend.update(SIGNER_LEASES, signer.address.lower(), _take)
+            if leased and not signer.leased:
+                # Another worker may have sent from this key: never trust a local nonce
+                signer.next_nonce = None
+                logger.info(f"🔑 Signer {signer.address} leased to this worker")
+            elif signer.leased and not leased:
+                logger.warning(f"⚠️ Signer {signer.address} lease lost to another worker")
+            signer.leased = leased
+        return self.available
+
+    def release_leases(self):
+        """Give this worker's keys back (shutdown)"""
+        backend = get_backend()
+        for signer in self.signers:
+            if signer.leased:
+                backend.update(SIGNER_LEASES, signer.address.lower(),
+                               lambda held: (None if held and held["owner"] == LEASE_OWNER else held, None))
+                signer.leased = False
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """Reserve the least-loaded signer for one claim"""
+        signer = self.pick()
+        signer.in_flight += 1
+        try:
+            yield signer
+        finally:
+            signer.in_flight -= 1
+            if signer.in_flight == 0 and signer.needs_resync:
+                signer.next_nonce = None
+                signer.needs_resync = False
+
+    def update_balances(self, balances):
+        """Store polled balances ({address: wei}), returns signers that need gas"""
+        for signer in self.signers:
+            if signer.address in balances:
+                signer.balance = balances[signer.address]
+        return self.needs_top_up()
+
+    def needs_top_up(self):
+        return [s for s in self.signers if s.balance is not None and s.balance < MIN_ETH_WEI]
+
+    def status(self):
+        return [
+            {"address": s.address, "balance": s.balance, "in_flight": s.in_flight, "next_nonce": s.next_nonce,
+             "leased": s.leased}
+            for s in self.signers
+        ]
+
+pool = SignerPool()
+
+def configured_keys():
+    """PRIVATE_KEYS plus PRIVATE_KEY, without duplicates"""
+    keys = []
+    for key in PRIVATE_KEYS + [PRIVATE_KEY]:
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+def load_pool():
+    """Load every configured key and lease the free ones (blocking: imports eth_account)"""
+    signers = pool.load(configured_keys())
+    leased = pool.claim_leases()
+    logger.info(f"🔑 Signer pool loaded with {len(signers)} wallet(s), {len(leased)} leased to this worker")
+    if not leased:
+        logger.error("❌ Every signer key is leased by another worker, claims wait for a free one")
+    return pool
+
+async def run_lease_keeper():
+    while True:
+        await asyncio.sleep(SIGNER_LEASE_TTL / 3)
+        try:
+            await asyncio.to_thread(pool.claim_leases)
+        except Exception as e:
+            logger.error(f"❌ Signer lease renewal failed: {e}")
+
+def start_lease_keeper():
+    """Start the background lease renewal task (idempotent)"""
+    global _lease_task
+    if _lease_task is None:
+        _lease_task = asyncio.create_task(run_lease_keeper())
+    return _lease_task
+
+@atexit.register
+def _release_on_exit():
+    try:
+        pool.release_leases()
+    except Exception as e:
+        logger.error(f"❌ Could not release signer leases: {e}")
@@ -1,6 +1,7 @@
 import random
 from config import SLOT_SYMBOLS, PRIZES
-from global_stats import get_adjusted_probabilities, record_spin, record_prize
+from global_stats import get_adjusted_probabilities, record_result
+from treasury import prize_weight
 
 def get_random_symbol(exclude_symbols=None):
     """Get a random slot symbol, optionally excluding certain symbols"""
@@ -12,6 +13,7 @@ def get_random_symbol(exclude_symbols=None):
 def generate_slot_result():
     """
     Generate slot result with multiple prize tiers using GLOBAL probabilities
+    Prizes the treasury can't currently pay are weighted down (or excluded)
     Returns: (prize_data or None, symbols)
     """
     # Get globally adjusted probabilities
@@ -24,7 +26,7 @@ def generate_slot_result():
     # Check each prize with adjusted probabilities
     for prize in PRIZES:
         prize_name = prize['name']
-        adjusted_prob = adjusted_probs.get(prize_name, prize['probability'])
+        adjusted_prob = adjusted_probs.get(prize_name, prize['probability']) * prize_weight(prize_name)
         cumulative_prob += adjusted_prob
 
         if rand < cumulative_prob:
@@ -43,14 +45,10 @@ def generate_slot_result():
 
 def spin_slot():
     """Execute a slot spin and return result"""
-    # Record this spin in global stats
-    record_spin()
-
     # Generate result with global probabilities
     prize, symbols = generate_slot_result()
 
-    # If prize won, record it globally
-    if prize:
-        record_prize(prize['name'])
+    # Journal the spin and its prize (updates global stats)
+    record_result(prize['name'] if prize else None, symbols)
 
     return prize, symbols
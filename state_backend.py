@@ -0,0 +1,499 @@
+"""
+Shared state backends for the slot game
+All game state (users, cooldowns, global stats, claim locks) goes through a
+StateBackend so several bot workers can share it.
+
+State is organised in namespaces; each namespace is a flat mapping of
+string keys to JSON-serializable values. Every backend offers the same
+atomic primitives (update, set_if_absent), which is what keeps two workers
+from both granting the 16th spin or paying the same prize twice.
+
+Backends:
+    json    - JSON files in the working directory (default, single worker)
+    memory  - process-local dicts (tests, throwaway runs)
+    sqlite  - one SQLite database shared by workers on the same host
+    redis   - any server speaking the Redis protocol (RESP)
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+from storage_writer import writer
+
+from config import (
+    STATE_BACKEND,
+    STATE_DB_FILE,
+    REDIS_URL,
+    SPINS_FILE,
+    LOSERS_COOLDOWN_FILE,
+    WINNERS_COOLDOWN_FILE,
+    USERS_FILE,
+    GLOBAL_STATS_FILE,
+    LAST_MESSAGE_FILE
+)
+
+# Namespaces persisted to their historical JSON files by the json backend
+JSON_NAMESPACE_FILES = {
+    "users": USERS_FILE,
+    "scheduler": LAST_MESSAGE_FILE,
+}
+
+# Namespaces now rebuilt from the event journal; their old files are only
+# read once, to seed the first snapshot
+LEGACY_JSON_FILES = {
+    "spins": SPINS_FILE,
+    "losers": LOSERS_COOLDOWN_FILE,
+    "winners": WINNERS_COOLDOWN_FILE,
+    "global_stats": GLOBAL_STATS_FILE,
+}
+
+
+class StateBackend:
+    """Base interface for state backends"""
+
+    # True when the state survives a restart on its own; otherwise the
+    # event journal rebuilds the journaled namespaces at startup
+    durable = False
+
+    def get(self, ns, key, default=None):
+        raise NotImplementedError
+
+    def set(self, ns, key, value):
+        raise NotImplementedError
+
+    def delete(self, ns, key):
+        """Delete a key, returns True if it existed"""
+        raise NotImplementedError
+
+    def items(self, ns):
+        """Return a dict copy of the whole namespace"""
+        raise NotImplementedError
+
+    def iter_items(self, ns, batch=500):
+        """Yield (key, value) pairs, reading the namespace batch keys at a time"""
+        yield from self.items(ns).items()
+
+    def update(self, ns, key, fn, default=None):
+        """
+        Atomically read-modify-write one key.
+        fn(current) must return (new_value, result); a new_value of None
+        deletes the key. Returns result.
+        """
+        raise NotImplementedError
+
+    def set_if_absent(self, ns, key, value):
+        """Set key only if it does not exist, returns True if it was set"""
+        def _fn(current):
+            if current is not None:
+                return current, False
+            return value, True
+        return self.update(ns, key, _fn)
+
+    def pop(self, ns, key, default=None):
+        """Atomically remove a key and return its value"""
+        def _fn(current):
+            return None, current
+        result = self.update(ns, key, _fn)
+        return default if result is None else result
+
+    def close(self):
+        pass
+
+
+# -------------------- Memory --------------------
+
+class MemoryBackend(StateBackend):
+    """Process-local backend, atomic within one process"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def _ns(self, ns):
+        return self._data.setdefault(ns, {})
+
+    def get(self, ns, key, default=None):
+        with self._lock:
+            value = self._ns(ns).get(key)
+        return default if value is None else json.loads(value)
+
+    def set(self, ns, key, value):
+        with self._lock:
+            self._ns(ns)[key] = json.dumps(value)
+
+    def delete(self, ns, key):
+        with self._lock:
+            return self._ns(ns).pop(key, None) is not None
+
+    def items(self, ns):
+        with self._lock:
+            return {k: json.loads(v) for k, v in self._ns(ns).items()}
+
+    def iter_items(self, ns, batch=500):
+        with self._lock:
+            keys = list(self._ns(ns))
+        for i in range(0, len(keys), batch):
+            with self._lock:
+                raws = [(k, self._ns(ns).get(k)) for k in keys[i:i + batch]]
+            for k, raw in raws:
+                if raw is not None:
+                    yield k, json.loads(raw)
+
+    def update(self, ns, key, fn, default=None):
+        with self._lock:
+            raw = self._ns(ns).get(key)
+            current = default if raw is None else json.loads(raw)
+            new_value, result = fn(current)
+            if new_value is None:
+                self._ns(ns).pop(key, None)
+            else:
+                self._ns(ns)[key] = json.dumps(new_value)
+            return result
+
+
+# -------------------- JSON files --------------------
+
+class JsonFileBackend(MemoryBackend):
+    """
+    Default backend, keeps the historical JSON files.
+    Namespaces listed in `files` are loaded from disk on first use and
+    served from memory after that; every change queues a rewrite on the
+    storage writer thread (group commit, atomic rename). The rest live in
+    memory (the journaled ones are persisted by event_journal). Only safe
+    for a single worker.
+    """
+
+    def __init__(self, files=None):
+        super().__init__()
+        self.files = dict(JSON_NAMESPACE_FILES if files is None else files)
+
+    def _ns(self, ns):
+        filepath = self.files.get(ns)
+        if filepath is None or ns in self._data:
+            return super()._ns(ns)
+        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+            data = {}
+        else:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        raw = {k: json.dumps(v) for k, v in data.items()}
+        self._data[ns] = raw
+        return raw
+
+    def _render(self, ns):
+        with self._lock:
+            data = {k: json.loads(v) for k, v in self._data[ns].items()}
+        return json.dumps(data, indent=2, ensure_ascii=False)
+
+    def _save(self, ns):
+        filepath = self.files.get(ns)
+        if filepath is None:
+            return
+        writer.replace(filepath, lambda: self._render(ns))
+
+    def set(self, ns, key, value):
+        with self._lock:
+            super().set(ns, key, value)
+            self._save(ns)
+
+    def delete(self, ns, key):
+        with self._lock:
+            existed = super().delete(ns, key)
+            if existed:
+                self._save(ns)
+            return existed
+
+    def update(self, ns, key, fn, default=None):
+        with self._lock:
+            before = self._ns(ns).get(key)
+            result = super().update(ns, key, fn, default)
+            if self._data[ns].get(key) != before:
+                self._save(ns)
+            return result
+
+
+# -------------------- SQLite --------------------
+
+class SQLiteBackend(StateBackend):
+    """
+    SQLite backend, shared by every worker on the same host.
+    Updates run inside BEGIN IMMEDIATE so the read-modify-write holds the
+    database write lock for its whole duration.
+    """
+
+    durable = True
+
+    def __init__(self, path=STATE_DB_FILE, timeout=10.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (ns, key))"
+        )
+
+    def get(self, ns, key, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE ns = ? AND key = ?", (ns, key)
+            ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, ns, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (ns, key, value) VALUES (?, ?, ?)",
+                (ns, key, json.dumps(value))
+            )
+
+    def delete(self, ns, key):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM state WHERE ns = ? AND key = ?", (ns, key))
+            return cur.rowcount > 0
+
+    def items(self, ns):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM state WHERE ns = ?", (ns,)).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def iter_items(self, ns, batch=500):
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key, value FROM state WHERE ns = ? AND key > ? ORDER BY key LIMIT ?",
+                    (ns, last, batch)
+                ).fetchall()
+            for k, v in rows:
+                yield k, json.loads(v)
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    def update(self, ns, key, fn, default=None):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM state WHERE ns = ? AND key = ?", (ns, key)
+                ).fetchone()
+                current = default if row is None else json.loads(row[0])
+                new_value, result = fn(current)
+                if new_value is None:
+                    self._conn.execute("DELETE FROM state WHERE ns = ? AND key = ?", (ns, key))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO state (ns, key, value) VALUES (?, ?, ?)",
+                        (ns, key, json.dumps(new_value))
+                    )
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        self._conn.close()
+
+
+# -------------------- Redis --------------------
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Minimal blocking RESP client, just enough for RedisBackend"""
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, timeout=5.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile("rb")
+        if password:
+            self.execute("AUTH", password)
+        if db:
+            self.execute("SELECT", db)
+
+    def _encode(self, args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise RedisError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(rest)
+            if length == -1:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RedisError(f"Unknown reply type: {line!r}")
+
+    def execute(self, *args):
+        self._sock.sendall(self._encode(args))
+        return self._read()
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._sock.close()
+
+
+class RedisBackend(StateBackend):
+    """
+    Redis-protocol backend, shared by workers on any host.
+    Each namespace is one hash. Every field has a version key (prefix:ns:v:field)
+    that each write of the field touches, so update() WATCHes only that key and
+    retries, right away, only when another worker wrote the same field.
+    """
+
+    durable = True
+
+    def __init__(self, url=REDIS_URL, prefix="tribo", max_retries=1000):
+        parsed = urlparse(url or "redis://localhost:6379/0")
+        db = int(parsed.path.lstrip("/") or 0)
+        self._conn_args = dict(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=db,
+            password=parsed.password
+        )
+        self.prefix = prefix
+        self.max_retries = max_retries
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = RedisConnection(**self._conn_args)
+            self._local.conn = conn
+        return conn
+
+    def _key(self, ns):
+        return f"{self.prefix}:{ns}"
+
+    def _version_key(self, ns, key):
+        return f"{self.prefix}:{ns}:v:{key}"
+
+    def _transaction(self, conn, *commands):
+        """MULTI/EXEC, returns the replies (None if a watched key changed)"""
+        conn.execute("MULTI")
+        for command in commands:
+            conn.execute(*command)
+        return conn.execute("EXEC")
+
+    def get(self, ns, key, default=None):
+        raw = self._conn().execute("HGET", self._key(ns), key)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, ns, key, value):
+        self._transaction(self._conn(), ("HSET", self._key(ns), key, json.dumps(value)),
+                          ("INCR", self._version_key(ns, key)))
+
+    def delete(self, ns, key):
+        removed, _ = self._transaction(self._conn(), ("HDEL", self._key(ns), key),
+                                       ("DEL", self._version_key(ns, key)))
+        return removed > 0
+
+    def items(self, ns):
+        flat = self._conn().execute("HGETALL", self._key(ns)) or []
+        return {flat[i]: json.loads(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    def iter_items(self, ns, batch=500):
+        cursor = "0"
+        while True:
+            cursor, flat = self._conn().execute("HSCAN", self._key(ns), cursor, "COUNT", batch)
+            for i in range(0, len(flat), 2):
+                yield flat[i], json.loads(flat[i + 1])
+            if cursor == "0":
+                return
+
+    def set_if_absent(self, ns, key, value):
+        added, _ = self._transaction(self._conn(), ("HSETNX", self._key(ns), key, json.dumps(value)),
+                                     ("INCR", self._version_key(ns, key)))
+        return added == 1
+
+    def update(self, ns, key, fn, default=None):
+        conn = self._conn()
+        hkey, vkey = self._key(ns), self._version_key(ns, key)
+        for _ in range(self.max_retries):
+            conn.execute("WATCH", vkey)
+            try:
+                raw = conn.execute("HGET", hkey, key)
+                current = default if raw is None else json.loads(raw)
+                new_value, result = fn(current)
+            except BaseException:
+                conn.execute("UNWATCH")
+                raise
+            if new_value is None:
+                write = (("HDEL", hkey, key), ("DEL", vkey))
+            else:
+                write = (("HSET", hkey, key, json.dumps(new_value)), ("INCR", vkey))
+            # A conflict means another worker just wrote this field: retry at once, no sleep
+            if self._transaction(conn, *write) is not None:
+                return result
+        raise RedisError(f"Too much contention updating {hkey}/{key}")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# -------------------- Selection --------------------
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=STATE_BACKEND):
+    """Create a backend by name"""
+    if name == "json":
+        return JsonFileBackend()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown state backend: {name}")
+
+
+def get_backend():
+    """Return the configured backend, created on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the active backend (tests, benchmarks, embedding)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,148 @@
+"""
+Single writer thread for state files, with group commit
+File writes never run on the event loop: callers queue them and one
+background thread commits whatever arrived within STORAGE_COMMIT_WINDOW
+in a single pass:
+
+  - replace(path, render): full rewrites, only the latest per path is
+    written, through a temp file + fsync + rename (never a torn file)
+  - append(path, text): journal lines, one write + one fsync per path
+  - rotate(path, target): rename path to target once every line appended
+    to it before the call is on disk; lines appended after land in a new path
+
+Both return a Future that resolves once the commit is on disk; async
+code awaits sync() to wait for durability without blocking the loop.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from config import STORAGE_COMMIT_WINDOW
+
+logger = logging.getLogger(__name__)
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_text(path, text):
+    """Replace path so readers see the old or the new content, never half of it"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+class StorageWriter:
+    def __init__(self, window=STORAGE_COMMIT_WINDOW):
+        self.window = window
+        self._cond = threading.Condition()
+        self._replace = {}   # path -> render() returning the full text
+        self._appends = {}   # path -> [text]
+        self._rotations = [] # [(path, target, [text appended before the rotation])]
+        self._future = None  # resolved when the queued batch is committed
+        self._thread = None
+        self.commits = 0
+        self.mutations = 0
+
+    def _batch_future(self):
+        if self._future is None:
+            self._future = Future()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+        return self._future
+
+    def replace(self, path, render):
+        """Queue a full rewrite of path; render() runs on the writer thread"""
+        with self._cond:
+            self._replace[path] = render
+            self.mutations += 1
+            return self._batch_future()
+
+    def append(self, path, text):
+        """Queue text to be appended to path"""
+        with self._cond:
+            self._appends.setdefault(path, []).append(text)
+            self.mutations += 1
+            return self._batch_future()
+
+    def rotate(self, path, target):
+        """Queue renaming path to target, ordered with the appends around it"""
+        with self._cond:
+            self._rotations.append((path, target, self._appends.pop(path, [])))
+            self.mutations += 1
+            return self._batch_future()
+
+    def barrier(self):
+        """Future resolved once everything queued so far is on disk"""
+        with self._cond:
+            return self._batch_future()
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is on disk (not from the event loop)"""
+        self.barrier().result(timeout)
+
+    def _append(self, path, chunks):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _commit(self, replace, appends, rotations=()):
+        for path, target, chunks in rotations:
+            if chunks:
+                self._append(path, chunks)
+            if os.path.exists(path) and os.path.getsize(path):
+                os.replace(path, target)
+                _fsync_dir(path)
+        for path, chunks in appends.items():
+            self._append(path, chunks)
+        for path, render in replace.items():
+            atomic_write_text(path, render())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._future is None:
+                    self._cond.wait()
+            # Let the mutations of concurrent handlers join this commit
+            time.sleep(self.window)
+            with self._cond:
+                replace, appends, rotations, future = self._replace, self._appends, self._rotations, self._future
+                self._replace, self._appends, self._rotations, self._future = {}, {}, [], None
+            try:
+                self._commit(replace, appends, rotations)
+                self.commits += 1
+                future.set_result(None)
+            except Exception as e:
+                logger.error(f"❌ Storage commit failed: {e}")
+                future.set_exception(e)
+
+writer = StorageWriter()
+
+async def sync():
+    """Wait until every write queued so far is durable, without blocking the loop"""
+    await asyncio.wrap_future(writer.barrier())
+
+@atexit.register
+def _flush_on_exit():
+    if writer._thread is not None:
+        try:
+            writer.flush(timeout=5)
+        except Exception as e:
+            logger.error(f"❌ Could not flush pending writes on exit: {e}")
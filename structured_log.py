@@ -0,0 +1,152 @@
+"""
+Non-blocking structured logging
+Handlers only put records on an in-memory queue (QueueHandler); a
+background QueueListener thread formats and writes them, so log I/O never
+runs on the event loop thread.
+
+  - LOG_FORMAT json (one object per line) or text
+  - LOG_LEVEL for the root logger, LOG_LEVELS for per-module overrides
+    ("httpx=WARNING,web3_payment=DEBUG")
+  - identical warnings/errors are emitted once per LOG_REPEAT_WINDOW,
+    the next emission carries how many were suppressed ("repeated")
+  - user_id / claim_id context (contextvars) is attached to every record
+    logged while handling an update or a claim
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from telegram import Update
+from telegram.ext import TypeHandler
+from config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_REPEAT_WINDOW
+
+CONTEXT_FIELDS = ("user_id", "claim_id")
+_context = contextvars.ContextVar("log_context", default={})
+_listener = None
+
+# -------------------- Context --------------------
+@contextlib.contextmanager
+def log_context(**fields):
+    """Attach fields (user_id, claim_id) to every record logged inside the block"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+async def _bind_update(update, context):
+    user = update.effective_user
+    _context.set({"user_id": user.id} if user else {})
+
+def install(application):
+    """Bind user_id for every update before any other handler runs (group -2)"""
+    application.add_handler(TypeHandler(Update, _bind_update), group=-2)
+
+class ContextFilter(logging.Filter):
+    """Copies the current context onto the record (runs in the caller's task)"""
+    def filter(self, record):
+        for key, value in _context.get().items():
+            setattr(record, key, value)
+        return True
+
+# -------------------- Repeat limiter --------------------
+class RepeatFilter(logging.Filter):
+    """Lets an identical WARNING+ message through once per window"""
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.seen = {}  # (logger, level, message) -> [last emitted, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.window <= 0:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self.seen.get(key)
+            if entry and now - entry[0] < self.window:
+                entry[1] += 1
+                return False
+            if entry and entry[1]:
+                record.repeated = entry[1]
+            self.seen[key] = [now, 0]
+            if len(self.seen) > 1000:
+                self.seen = {k: v for k, v in self.seen.items() if now - v[0] < self.window}
+        return True
+
+# -------------------- Formatting --------------------
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback here, but leave the formatting to the listener
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in CONTEXT_FIELDS + ("repeated",):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = " ".join(f"{key}={getattr(record, key)}" for key in CONTEXT_FIELDS + ("repeated",) if hasattr(record, key))
+        return f"{line} [{extra}]" if extra else line
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+# -------------------- Setup --------------------
+def setup_logging(stream=None):
+    """Route every logger through the queue, writes happen on the listener thread"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RepeatFilter(LOG_REPEAT_WINDOW))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -5,6 +5,7 @@ This helps verify the claim functionality works correctly
 import asyncio
 from web3_payment import init_web3, process_claim, validate_address, w3, account, contract
 from config import PRIZES, CONTRACT_ADDRESS
+from structured_log import setup_logging
 
 class MockBot:
     """Mock bot for testing"""
@@ -136,4 +137,5 @@ async def test_claim():
 
 if __name__ == "__main__":
     print("\n🧪 Claim Functionality Test Script\n")
+    setup_logging()
     asyncio.run(test_claim())
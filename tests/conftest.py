@@ -0,0 +1,16 @@
+"""
+config.py reads the environment at import time, so the test settings are
+applied here, before any bot module is imported. State files land in a
+throwaway directory.
+"""
+import os
+
+import pytest
+
+os.environ["STATE_BACKEND"] = "memory"
+os.environ["PAYOUT_LEDGER_FILE"] = ":memory:"
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _state_dir(tmp_path_factory):
+    os.chdir(tmp_path_factory.mktemp("state"))
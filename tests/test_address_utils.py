@@ -0,0 +1,46 @@
+"""Offline address validation against the EIP-55 test vectors"""
+import pytest
+
+from address_utils import validate_address, checksum_address
+
+# From the EIP-55 specification
+EIP55_VECTORS = [
+    "0x52908400098527886E0F7030069857D2E4169EE7",
+    "0x8617E340B3D01FA5F11F306F4090FD50E238070D",
+    "0xde709f2102306220921060314715629080e2fb77",
+    "0x27b1fdb04752bbc536007a920d24acb045561c26",
+    "0x5aAeb6053F3E94C9b9A09f33669435E7Ef1BeAed",
+    "0xfB6916095ca1df60bB79Ce92cE3Ea74c37c5d359",
+    "0xdbF03B407c01E7cD3CBea99509d93f8DDDC8C6FB",
+    "0xD1220A0cf47c7B9Be7A2E6BA89F429762e7b9aDb",
+]
+
+
+@pytest.mark.parametrize("address", EIP55_VECTORS)
+def test_checksummed_vectors_are_accepted(address):
+    assert validate_address(address) is not None
+
+
+@pytest.mark.parametrize("address", EIP55_VECTORS[4:])
+def test_mixed_case_vectors_round_trip(address):
+    assert validate_address(address.lower()) == address
+    assert validate_address(address.upper().replace("0X", "0x")) == address
+    assert validate_address(address[2:]) == address
+
+
+def test_a_broken_checksum_is_rejected():
+    address = EIP55_VECTORS[4]
+    broken = address[:-1] + address[-1].swapcase()
+    assert validate_address(broken) is None
+
+
+@pytest.mark.parametrize("value", [None, 42, "", "0x123", "0x" + "g" * 40, "0x" + "a" * 41,
+                                   ["0x" + "a" * 40], {"address": "0x" + "a" * 40}])
+def test_malformed_input_is_rejected(value):
+    assert validate_address(value) is None
+
+
+def test_checksum_address_raises_on_invalid():
+    assert checksum_address(" " + EIP55_VECTORS[4].lower() + " ") == EIP55_VECTORS[4]
+    with pytest.raises(ValueError):
+        checksum_address("0x123")
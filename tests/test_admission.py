@@ -0,0 +1,71 @@
+"""Admission gates: their order, and shedding spins when the queue is full"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import admission
+from admission import Busy
+
+CHAT = -100
+THREAD = 7
+
+
+@pytest.fixture(autouse=True)
+def _fresh(monkeypatch):
+    monkeypatch.setattr(admission, "MAINTENANCE_MODE", False)
+    monkeypatch.setattr(admission, "ALLOWED_CHAT_ID", CHAT)
+    monkeypatch.setattr(admission, "ALLOWED_THREAD_ID", THREAD)
+    monkeypatch.setattr(admission, "_last_admitted", {})
+    monkeypatch.setattr(admission, "_slots", None)
+    monkeypatch.setattr(admission, "_waiting", 0)
+    monkeypatch.setattr(admission, "shed", 0)
+
+
+def _update(chat=CHAT, thread=THREAD):
+    return SimpleNamespace(callback_query=None, effective_chat=SimpleNamespace(id=chat),
+                           effective_message=SimpleNamespace(message_thread_id=thread))
+
+
+def test_gates_run_in_order(monkeypatch):
+    assert admission.gate(_update(), 1) is None
+    reason, wait = admission.gate(_update(), 1)
+    assert reason == "short_cooldown" and 0 < wait <= admission.SHORT_COOLDOWN
+
+    # An off-topic spin is rejected as such, the user's cooldown is not checked
+    assert admission.gate(_update(thread=THREAD + 1), 1) == ("topic", 0)
+    monkeypatch.setattr(admission, "MAINTENANCE_MODE", True)
+    assert admission.gate(_update(thread=THREAD + 1), 1) == ("maintenance", 0)
+
+
+def test_rejected_spins_leave_no_cooldown():
+    assert admission.gate(_update(chat=CHAT - 1), 2) == ("topic", 0)
+    assert admission.gate(_update(), 2) is None
+
+
+def test_spins_beyond_the_queue_are_shed(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MAX_SPINS", 1)
+    monkeypatch.setattr(admission, "ADMISSION_MAX_PENDING", 1)
+
+    async def scenario():
+        release = asyncio.Event()
+        done = []
+
+        async def spin(name):
+            async with admission.spin_slot():
+                await release.wait()
+                done.append(name)
+
+        running = asyncio.create_task(spin("running"))
+        waiting = asyncio.create_task(spin("waiting"))
+        await asyncio.sleep(0)
+        with pytest.raises(Busy):
+            async with admission.spin_slot():
+                pass
+        release.set()
+        await asyncio.gather(running, waiting)
+        return done
+
+    assert asyncio.run(scenario()) == ["running", "waiting"]
+    assert admission.shed == 1
+    assert admission._waiting == 0
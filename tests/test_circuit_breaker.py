@@ -0,0 +1,105 @@
+"""Circuit breaker transitions and the parked claims it leads to"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import circuit_breaker
+import parked_claims
+import web3_payment
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from state_backend import get_backend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=lambda: now.t))
+    return now
+
+
+def test_opens_on_error_rate_then_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(window=60, min_calls=4, error_rate=0.5, open_seconds=30)
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.current_state() == CLOSED  # too few calls to judge
+    breaker.record(False)
+    assert breaker.current_state() == OPEN
+    assert not breaker.allow()
+
+    clock.t += 30
+    assert breaker.current_state() == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    breaker.record(True)
+    assert breaker.current_state() == CLOSED
+    assert breaker.status()["calls"] == 0
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(window=60, min_calls=1, error_rate=0.5, open_seconds=30)
+    breaker.record(False)
+    clock.t += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.current_state() == OPEN
+    clock.t += 29
+    assert breaker.is_open()
+
+
+def test_old_failures_leave_the_window(clock):
+    breaker = CircuitBreaker(window=60, min_calls=2, error_rate=0.5, open_seconds=30)
+    breaker.record(False)
+    clock.t += 61
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.current_state() == CLOSED
+
+
+def test_middleware_fails_fast_but_tracks_sent_transactions(monkeypatch, clock):
+    breaker = CircuitBreaker(window=60, min_calls=1, error_rate=0.5, open_seconds=30)
+    monkeypatch.setattr(circuit_breaker, "breaker", breaker)
+    sent = []
+
+    def make_request(method, params):
+        sent.append(method)
+        return {"error": {"code": -32005, "message": "limit"}}
+
+    request = circuit_breaker.middleware(make_request, None)
+    request("eth_getLogs", [])  # a range limit, not an unhealthy node
+    assert breaker.current_state() == CLOSED
+    request("eth_call", [])
+    assert breaker.current_state() == OPEN
+    with pytest.raises(CircuitOpenError):
+        request("eth_call", [])
+    request("eth_getTransactionReceipt", ["0x01"])
+    circuit_breaker.follow_up(request)("eth_feeHistory", [])  # fee bump of a sent tx
+    assert sent == ["eth_getLogs", "eth_call", "eth_getTransactionReceipt", "eth_feeHistory"]
+    with pytest.raises(CircuitOpenError):
+        request("eth_feeHistory", [])
+
+
+def test_every_parked_prize_is_retried(monkeypatch):
+    for key in get_backend().items(parked_claims.PARKED_CLAIMS):
+        get_backend().delete(parked_claims.PARKED_CLAIMS, key)
+    parked_claims.park(7, "seven", "1 CDT", "0x" + "ab" * 20, -100, ref="-100:1")
+    parked_claims.park(7, "seven", "5 CDT", "0x" + "ab" * 20, -100, ref="-100:2")
+    assert parked_claims.count() == 2
+
+    async def usable():
+        return True
+
+    async def process_claim(prize_name, wallet, bot, chat_id, on_sent=None, ref=None):
+        return True, "paid", ref
+
+    delivered = []
+
+    async def deliver(bot, user_id, entry, result):
+        delivered.append((user_id, entry["prize_name"], result[2]))
+
+    monkeypatch.setattr(parked_claims, "_circuit_usable", usable)
+    monkeypatch.setattr(web3_payment, "process_claim", process_claim)
+    asyncio.run(parked_claims.retry_parked(None, deliver))
+
+    assert sorted(delivered) == [(7, "1 CDT", "-100:1"), (7, "5 CDT", "-100:2")]
+    assert parked_claims.count() == 0
@@ -0,0 +1,158 @@
+"""Claim flow through the Telegram handlers, with process_claim stubbed out"""
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import claim_status
+import main
+from state_backend import get_backend
+
+WINNER = 4242
+CHAT = -100123
+WALLET = "0x" + "ab" * 20
+_ids = itertools.count(1000)
+
+
+class FakeBot:
+    async def send_message(self, **kwargs):
+        return SimpleNamespace(message_id=next(_ids))
+
+    async def edit_message_text(self, **kwargs):
+        return True
+
+
+def _message(chat_id, message_id=None):
+    async def reply_text(text, **kwargs):
+        return SimpleNamespace(message_id=next(_ids), chat_id=chat_id)
+    return SimpleNamespace(message_id=message_id or next(_ids), chat_id=chat_id,
+                           message_thread_id=None, reply_text=reply_text)
+
+
+def _user():
+    return SimpleNamespace(id=WINNER, first_name="Winner", username="winner")
+
+
+def _press(data, prize_message):
+    """Press an inline button of prize_message, returns the callback alerts"""
+    alerts = []
+
+    async def answer(text=None, show_alert=False):
+        alerts.append(text)
+
+    query = SimpleNamespace(data=data, from_user=_user(), message=prize_message, answer=answer)
+    asyncio.run(main.button_callback(SimpleNamespace(callback_query=query), SimpleNamespace(bot=FakeBot())))
+    return alerts
+
+
+def _wallet_cmd(wallet):
+    update = SimpleNamespace(effective_user=_user(), effective_chat=SimpleNamespace(type="private"),
+                             message=_message(WINNER))
+    asyncio.run(main.wallet_cmd(update, SimpleNamespace(args=[wallet], bot=FakeBot())))
+
+
+class Payouts(list):
+    results = None
+
+    def __init__(self):
+        super().__init__()
+        self.results = []
+
+
+@pytest.fixture
+def payouts(monkeypatch):
+    """Every process_claim call; outcomes are popped from .results (default: paid)"""
+    calls = Payouts()
+
+    async def process_claim(prize_name, wallet, bot, chat_id, on_sent=None, ref=None):
+        calls.append(ref)
+        return calls.results.pop(0) if calls.results else (True, "paid", "0x" + "11" * 32)
+
+    for ns in (main.CLAIMED_MESSAGES, main.PENDING_CLAIMS, main.FAILED_CLAIMS, main.CLAIM_LOCKS, "users"):
+        for key in get_backend().items(ns):
+            get_backend().delete(ns, key)
+    main.user_directory._users.clear()
+    monkeypatch.setattr(main, "process_claim", process_claim)
+    monkeypatch.setattr(claim_status, "CLAIM_STATUS_EDIT_INTERVAL", 0)
+    return calls
+
+
+def test_prize_waiting_for_a_wallet_is_paid_once(payouts):
+    prize_message = _message(CHAT)
+    data = f"claim_{WINNER}_1 CDT"
+    _press(data, prize_message)         # no wallet yet: pending
+    assert payouts == []
+
+    _wallet_cmd(WALLET)                 # pays the pending claim
+    alerts = _press(data, prize_message)  # the original button again
+
+    assert payouts == [f"{CHAT}:{prize_message.message_id}"]
+    assert alerts == ["⛔ This prize has already been claimed!"]
+
+
+def test_button_during_pending_claim_points_to_wallet(payouts):
+    prize_message = _message(CHAT)
+    data = f"claim_{WINNER}_1 CDT"
+    _press(data, prize_message)
+    alerts = _press(data, prize_message)
+
+    assert payouts == []
+    assert "/wallet" in alerts[-1]
+
+
+def test_replaced_pending_claim_unlocks_its_prize(payouts):
+    first, second = _message(CHAT), _message(CHAT)
+    _press(f"claim_{WINNER}_1 CDT", first)
+    _press(f"claim_{WINNER}_1 CDT", second)  # only one pending claim per user
+
+    _wallet_cmd(WALLET)
+    _press(f"claim_{WINNER}_1 CDT", first)   # first prize is claimable again
+
+    assert payouts == [f"{CHAT}:{second.message_id}", f"{CHAT}:{first.message_id}"]
+
+
+def test_failed_claim_is_only_paid_through_retry(payouts):
+    main.register_user(WINNER, "winner")
+    main.set_user_wallet(WINNER, WALLET)
+    prize_message = _message(CHAT)
+    payouts.results.append((False, "Error processing claim: boom", None))
+
+    _press(f"claim_{WINNER}_1 CDT", prize_message)
+    alerts = _press(f"claim_{WINNER}_1 CDT", prize_message)
+    assert len(payouts) == 1
+    assert alerts == ["🔄 Use the Retry button of your failed claim."]
+
+    _press(f"retry_claim_{WINNER}", prize_message)
+    _press(f"retry_claim_{WINNER}", prize_message)
+    assert len(payouts) == 2
+    assert get_backend().get(main.FAILED_CLAIMS, str(WINNER)) is None
+
+
+def test_stale_retry_lock_is_taken_over(payouts, monkeypatch):
+    get_backend().set(main.CLAIM_LOCKS, str(WINNER), time.time() - main.CLAIM_LOCK_TTL)
+    assert main._acquire_claim_lock(WINNER) is not None
+
+    lock = main._acquire_claim_lock(WINNER + 1)
+    assert main._acquire_claim_lock(WINNER + 1) is None
+    monkeypatch.setattr(main, "CLAIM_LOCK_TTL", 0)
+    takeover = main._acquire_claim_lock(WINNER + 1)
+    assert takeover is not None
+
+    main._release_claim_lock(WINNER + 1, lock)  # the dead worker's release is a no-op
+    assert get_backend().get(main.CLAIM_LOCKS, str(WINNER + 1)) == takeover
+
+
+def test_pending_transaction_gets_no_retry(payouts):
+    main.register_user(WINNER, "winner")
+    main.set_user_wallet(WINNER, WALLET)
+    prize_message = _message(CHAT)
+    payouts.results.append((None, "Transaction is still pending", "0x" + "22" * 32))
+
+    _press(f"claim_{WINNER}_1 CDT", prize_message)
+    alerts = _press(f"claim_{WINNER}_1 CDT", prize_message)
+
+    assert len(payouts) == 1
+    assert get_backend().get(main.FAILED_CLAIMS, str(WINNER)) is None
+    assert alerts == ["⛔ This prize has already been claimed!"]
@@ -0,0 +1,43 @@
+"""Hourly ring buffer of the global stats window"""
+from global_stats import RollingWindow
+
+
+def test_totals_follow_the_window():
+    window = RollingWindow(3)
+    window.add(100, 2, {"1 CDT": 1})
+    window.add(101, 1, {})
+    window.add(102, 4, {"1 CDT": 2, "5 CDT": 1})
+    assert window.total_spins == 7
+    assert window.prizes_awarded == {"1 CDT": 3, "5 CDT": 1}
+
+    # Hour 103 reuses the slot of hour 100
+    assert window.add(103, 1, {}) == [100]
+    assert window.total_spins == 6
+    assert window.prizes_awarded == {"1 CDT": 2, "5 CDT": 1}
+
+
+def test_a_long_gap_expires_everything_once():
+    window = RollingWindow(3)
+    window.add(100, 1, {"1 CDT": 1})
+    window.add(102, 1, {})
+
+    assert sorted(window.advance(1000)) == [100, 102]
+    assert window.total_spins == 0
+    assert window.prizes_awarded == {}
+    assert window.advance(1000) == []
+
+
+def test_late_counts_inside_the_window_are_kept():
+    window = RollingWindow(3)
+    window.add(105, 1, {})
+    assert window.add(104, 2, {}) == []  # older but still in the window
+    assert window.add(102, 5, {}) == []  # already out of it
+    assert window.total_spins == 3
+    assert window.head == 105
+
+
+def test_same_hour_accumulates_in_one_bucket():
+    window = RollingWindow(48)
+    for _ in range(10):
+        window.add(500, 1, {"1 CDT": 1})
+    assert window.buckets[500 % 48] == {"hour": 500, "spins": 10, "prizes": {"1 CDT": 10}}
@@ -0,0 +1,86 @@
+"""Event journal replay and compaction"""
+import glob
+import os
+
+import pytest
+
+import cooldown
+import event_journal
+from state_backend import get_backend
+from storage_writer import writer
+
+
+@pytest.fixture
+def journal(monkeypatch, tmp_path):
+    """Fresh journal files and module state; restart() simulates a new process"""
+    monkeypatch.chdir(tmp_path)
+    backend = get_backend()
+
+    def restart():
+        writer.flush()
+        for ns in event_journal.JOURNALED_NAMESPACES:
+            for key in backend.items(ns):
+                backend.delete(ns, key)
+        monkeypatch.setattr(event_journal, "_opened", False)
+        monkeypatch.setattr(event_journal, "_journal_file", event_journal.JOURNAL_FILE)
+        event_journal.open_journal()
+
+    restart()
+    yield restart
+    writer.flush()
+
+
+def test_replay_rebuilds_cooldowns(journal):
+    cooldown.record_winner(1)
+    for _ in range(3):
+        cooldown.record_spin(2)
+    journal()
+
+    assert get_backend().get("winners", "1") is not None
+    assert get_backend().get("spins", "2")["count"] == 3
+
+
+def test_expired_cooldown_stays_expired_after_replay(journal, monkeypatch):
+    cooldown.record_winner(1)
+    monkeypatch.setattr(cooldown, "WINNER_COOLDOWN_HOURS", 0)
+    assert cooldown.can_spin(1)[0]
+    assert get_backend().get("winners", "1") is None
+
+    monkeypatch.setattr(cooldown, "WINNER_COOLDOWN_HOURS", 24)
+    journal()
+    assert get_backend().get("winners", "1") is None
+
+
+def test_replay_after_compaction(journal):
+    cooldown.record_winner(1)
+    assert event_journal.compact()
+    cooldown.record_winner(2)
+    journal()
+
+    assert get_backend().get("winners", "1") is not None
+    assert get_backend().get("winners", "2") is not None
+    assert glob.glob(event_journal.JOURNAL_FILE + ".*")
+
+
+def test_old_segments_are_pruned(journal, monkeypatch):
+    monkeypatch.setattr(event_journal, "JOURNAL_KEEP_SEGMENTS", 2)
+    for user in range(4):
+        cooldown.record_winner(user)
+        assert event_journal.compact()
+
+    assert len(event_journal._archived_segments()) == 2
+    journal()
+    assert all(get_backend().get("winners", str(user)) is not None for user in range(4))
+
+
+def test_durable_backends_journal_per_worker(journal, monkeypatch):
+    monkeypatch.setattr(get_backend(), "durable", True)
+    journal()
+    cooldown.record_winner(1)
+    writer.flush()
+
+    root, ext = os.path.splitext(event_journal.JOURNAL_FILE)
+    assert os.path.exists(f"{root}.{os.getpid()}{ext}")
+    assert not os.path.exists(event_journal.JOURNAL_FILE)
+    assert not event_journal.compact()
+    assert [e["type"] for e in event_journal.read_events()] == ["winner_cooldown"]
@@ -0,0 +1,186 @@
+"""Payout ledger matching and eth_getLogs reconciliation, against a stub chain"""
+from types import SimpleNamespace
+
+import pytest
+from hexbytes import HexBytes
+
+import payout_ledger
+from config import PRIZES
+from state_backend import get_backend
+
+TOKEN = PRIZES[0]["token"].lower()
+AMOUNT = int(PRIZES[0]["amount"])
+WALLET = "0x" + "ab" * 20
+
+
+@pytest.fixture(autouse=True)
+def ledger(monkeypatch):
+    """A fresh in-memory ledger per test"""
+    payout_ledger.flush()
+    for namespace in (payout_ledger.PAYOUT_SENDS, payout_ledger.LEDGER_LEASE):
+        for key in get_backend().items(namespace):
+            get_backend().delete(namespace, key)
+    monkeypatch.setattr(payout_ledger, "_conn", None)
+    monkeypatch.setattr(payout_ledger, "_span", payout_ledger.LEDGER_MAX_RANGE)
+    monkeypatch.setattr(payout_ledger, "LEDGER_START_BLOCK", "0")
+    monkeypatch.setattr(payout_ledger, "LEDGER_CONFIRMATIONS", 0)
+
+
+class Chain:
+    """eth.block_number / get_logs / get_transaction_receipt over a list of Transfer logs"""
+
+    def __init__(self, log_limit=None):
+        self.logs = []
+        self.receipts = {}
+        self.log_limit = log_limit
+        self.queries = []
+        self.eth = SimpleNamespace(block_number=0, get_logs=self.get_logs,
+                                   get_transaction_receipt=self.get_transaction_receipt)
+
+    def transfer(self, tx_hash, block, wallet=WALLET, amount=AMOUNT):
+        self.logs.append({
+            "address": PRIZES[0]["token"],
+            "topics": [HexBytes(payout_ledger.TRANSFER_TOPIC), HexBytes(b"\0" * 32),
+                       HexBytes(b"\0" * 12 + bytes.fromhex(wallet[2:]))],
+            "data": HexBytes(amount.to_bytes(32, "big")),
+            "blockNumber": block,
+            "transactionHash": HexBytes(tx_hash),
+            "logIndex": len(self.logs),
+        })
+        self.eth.block_number = max(self.eth.block_number, block)
+
+    def get_logs(self, query):
+        self.queries.append((query["fromBlock"], query["toBlock"]))
+        logs = [log for log in self.logs if query["fromBlock"] <= log["blockNumber"] <= query["toBlock"]]
+        if self.log_limit is not None and len(logs) > self.log_limit:
+            raise ValueError({"code": -32005, "message": "query returned more than 10000 results"})
+        return logs
+
+    def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise LookupError(tx_hash)
+        return self.receipts[tx_hash]
+
+
+def _tx(n):
+    return "0x" + f"{n:064x}"
+
+
+def _attempt(ref, tx_hash=None, status="paid"):
+    attempt = payout_ledger.start("c", ref, PRIZES[0]["name"], TOKEN, AMOUNT, WALLET)
+    if tx_hash:
+        payout_ledger.sent(attempt, tx_hash)
+    payout_ledger.finish(attempt, status, tx_hash)
+    return attempt
+
+
+def _statuses():
+    payout_ledger.flush()
+    return {row["id"]: row["status"] for row in payout_ledger.iter_attempts()}
+
+
+def test_transfers_are_matched_to_their_attempts():
+    chain = Chain()
+    pending = _attempt("-1:10", _tx(1), "pending")
+    failed = _attempt("-1:11", None, "failed")  # nothing was sent
+    chain.transfer(_tx(1), 5)
+
+    assert payout_ledger.reconcile(chain) == []
+    assert _statuses() == {pending: "paid", failed: "failed"}
+    assert payout_ledger.summary()["checkpoint"] == 5
+
+
+def test_transfer_without_attempt_is_an_orphan():
+    chain = Chain()
+    chain.transfer(_tx(9), 3)
+
+    flagged = payout_ledger.reconcile(chain)
+    assert [f["flag"] for f in flagged] == ["orphan"]
+    assert payout_ledger.summary()["orphans"] == 1
+
+
+def test_same_prize_paid_twice_is_a_double():
+    chain = Chain()
+    _attempt("-1:10", _tx(1))
+    _attempt("-1:10", _tx(2))  # a second attempt for the same prize message
+    chain.transfer(_tx(1), 4)
+    chain.transfer(_tx(2), 5)
+
+    flagged = payout_ledger.reconcile(chain)
+    assert [(f["tx_hash"], f["flag"]) for f in flagged] == [(_tx(2), "double")]
+    assert payout_ledger.summary()["doubles"] == 1
+
+
+def test_open_attempt_without_hash_matches_by_payout():
+    chain = Chain()
+    attempt = _attempt("-1:10", None, "unconfirmed")
+    chain.transfer(_tx(3), 2)
+
+    assert payout_ledger.reconcile(chain) == []
+    assert _statuses()[attempt] == "paid"
+
+
+def test_rescanning_is_idempotent():
+    chain = Chain()
+    chain.transfer(_tx(9), 3)
+    payout_ledger.reconcile(chain)
+    payout_ledger._write("DELETE FROM meta")  # lose the checkpoint
+
+    assert payout_ledger.reconcile(chain) == []
+    assert payout_ledger.summary()["orphans"] == 1
+
+
+def test_refused_ranges_are_halved(monkeypatch):
+    monkeypatch.setattr(payout_ledger, "_span", 64)
+    monkeypatch.setattr(payout_ledger, "LEDGER_MIN_RANGE", 1)
+    chain = Chain(log_limit=2)
+    for block in range(1, 9):
+        chain.transfer(_tx(block), block)
+
+    assert len(payout_ledger.reconcile(chain)) == 8
+    assert chain.queries[0] == (0, 8)  # refused: 8 logs
+    assert min(end - start + 1 for start, end in chain.queries) <= 2
+    assert payout_ledger.summary()["checkpoint"] == 8
+
+
+def test_reverted_pending_attempt_is_settled():
+    chain = Chain()
+    reverted = _attempt("-1:10", _tx(1), "pending")
+    waiting = _attempt("-1:11", _tx(2), "pending")
+    chain.receipts[_tx(1)] = {"status": 0}
+
+    settled = payout_ledger.settle_pending(chain)
+    assert [a["id"] for a in settled] == [reverted]
+    assert _statuses() == {reverted: "reverted", waiting: "pending"}
+
+
+def test_another_workers_payout_is_not_an_orphan(monkeypatch):
+    chain = Chain()
+    monkeypatch.setattr(payout_ledger, "LEASE_OWNER", "host:2")
+    payout_ledger.sent(payout_ledger.start("c", "-1:10", PRIZES[0]["name"], TOKEN, AMOUNT, WALLET), _tx(1), "-1:10")
+    payout_ledger.flush()
+    monkeypatch.setattr(payout_ledger, "_conn", None)  # host:1 has its own ledger file
+    monkeypatch.setattr(payout_ledger, "LEASE_OWNER", "host:1")
+    _attempt("-1:10", _tx(2))  # and paid the same prize again
+    chain.transfer(_tx(1), 4)
+    chain.transfer(_tx(2), 5)
+
+    flagged = payout_ledger.reconcile(chain)
+    assert [(f["tx_hash"], f["flag"]) for f in flagged] == [(_tx(2), "double")]
+    assert payout_ledger.summary()["orphans"] == 0
+
+
+def test_one_worker_holds_the_reconciler_lease(monkeypatch):
+    monkeypatch.setattr(payout_ledger, "LEASE_OWNER", "host:1")
+    assert payout_ledger.hold_lease()
+    monkeypatch.setattr(payout_ledger, "LEASE_OWNER", "host:2")
+    assert not payout_ledger.hold_lease()
+
+
+def test_mined_pending_attempt_is_settled_paid():
+    chain = Chain()
+    attempt = _attempt("-1:10", _tx(1), "pending")
+    chain.receipts[_tx(1)] = {"status": 1}
+
+    assert payout_ledger.settle_pending(chain) == []
+    assert _statuses() == {attempt: "paid"}
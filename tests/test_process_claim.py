@@ -0,0 +1,76 @@
+"""process_claim against the fake RPC: a sent payout is never reported as failed"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+import circuit_breaker
+import fee_engine
+import payout_ledger
+import web3_payment
+from config import CONTRACT_ABI, PRIZES
+from fake_rpc import FakeRPC, TRANSFER_TOPIC
+from signer_pool import Signer, SignerPool
+
+CONTRACT = "0x" + "c0" * 20
+WALLET = "0x" + "ab" * 20
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    server = FakeRPC(contract=CONTRACT, block_time=0.05).start()
+    server.chain.seed_prizes()
+    w3 = Web3(Web3.HTTPProvider(server.url))
+    w3.middleware_onion.add(circuit_breaker.middleware, "circuit_breaker")
+    signer = Signer(Account.from_key("0x" + "11" * 32))
+    signer.leased = True
+    pool = SignerPool()
+    pool.signers = [signer]
+
+    monkeypatch.setattr(circuit_breaker, "breaker", circuit_breaker.CircuitBreaker())
+    monkeypatch.setattr(web3_payment, "w3", w3)
+    monkeypatch.setattr(web3_payment, "account", signer.account)
+    monkeypatch.setattr(web3_payment, "contract", w3.eth.contract(address=Web3.to_checksum_address(CONTRACT), abi=CONTRACT_ABI))
+    monkeypatch.setattr(web3_payment, "pool", pool)
+    monkeypatch.setattr(fee_engine, "RECEIPT_POLL_INTERVAL", 0.02)
+    monkeypatch.setattr(fee_engine, "TX_REPLACE_AFTER", 0.3)
+    monkeypatch.setattr(fee_engine, "TX_MAX_REPLACEMENTS", 1)
+    monkeypatch.setattr(payout_ledger, "_conn", None)
+    yield server.chain
+    server.stop()
+    payout_ledger.flush()
+
+
+def _claim():
+    async def on_sent(tx_hash):
+        pass
+    return asyncio.run(web3_payment.process_claim(PRIZES[0]["name"], WALLET, None, 1, on_sent, ref="m:1"))
+
+
+def _transfers(chain):
+    return [log for log in chain.logs if log["topics"][0] == TRANSFER_TOPIC]
+
+
+def test_a_failed_receipt_check_is_polled_again(chain):
+    chain.fail_next["eth_getTransactionReceipt"] = 1
+
+    success, message, tx_hash = _claim()
+
+    assert success is True, message
+    assert len(_transfers(chain)) == 1
+
+
+def test_an_untrackable_payout_is_pending_not_failed(chain):
+    chain.fail_next["eth_getTransactionReceipt"] = 10**6
+    chain.fail_next["eth_feeHistory"] = 10**6
+
+    success, message, tx_hash = _claim()
+
+    assert success is None, message
+    assert tx_hash
+    payout_ledger.flush()
+    [attempt] = payout_ledger.iter_attempts()
+    assert attempt["status"] == "pending"
+    assert len(_transfers(chain)) == 1
@@ -0,0 +1,66 @@
+"""Scheduled jobs: drift, restarts and several workers sharing one schedule"""
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from scheduler import ScheduledJob, SchedulerEngine
+from state_backend import get_backend
+
+HOUR = 3600
+
+
+@pytest.fixture(autouse=True)
+def _no_schedule():
+    for key in get_backend().items("scheduler"):
+        get_backend().delete("scheduler", key)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(scheduler, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+async def _post(bot, job):
+    pass
+
+
+def _job(**options):
+    return ScheduledJob("promo:-1", _post, HOUR, -1, **options)
+
+
+def test_slots_missed_by_drift_are_skipped_not_replayed(clock):
+    job = _job()
+    engine = SchedulerEngine()
+    engine.add_job(job)
+    first = job.base
+
+    clock[0] = first + 3.5 * HOUR  # the process was asleep for three slots
+    assert engine._claim(job, clock[0])
+    assert job.base == first + 4 * HOUR
+    assert not engine._claim(job, clock[0])  # one post, not a burst of four
+
+
+def test_restart_resumes_the_persisted_schedule(clock):
+    engine = SchedulerEngine()
+    job = engine.add_job(_job(run_at_start=True))
+    assert engine._claim(job, clock[0])
+    next_run = job.next_run
+
+    restarted = SchedulerEngine().add_job(_job(run_at_start=True))
+    assert restarted.next_run == next_run  # not fired again at start
+    assert not SchedulerEngine()._claim(restarted, clock[0] + HOUR / 2)
+
+
+def test_two_engines_fire_each_due_time_once(clock):
+    engines = [SchedulerEngine(), SchedulerEngine()]
+    jobs = [engine.add_job(_job(jitter_seconds=60)) for engine in engines]
+
+    fired = 0
+    for _ in range(5):
+        clock[0] = max(job.next_run for job in jobs)
+        fired += sum(engine._claim(job, clock[0]) for engine, job in zip(engines, jobs))
+        assert jobs[0].next_run == jobs[1].next_run > clock[0]
+    assert fired == 5
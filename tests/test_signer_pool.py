@@ -0,0 +1,68 @@
+"""Signer leases: one worker per key, nonces never shared"""
+from types import SimpleNamespace
+
+import pytest
+
+import signer_pool
+from signer_pool import Signer, SignerPool, SIGNER_LEASES
+from state_backend import get_backend
+
+ADDRESSES = ["0x" + "a1" * 20, "0x" + "b2" * 20]
+
+
+def _worker(monkeypatch, owner):
+    """A pool as another process would load it"""
+    pool = SignerPool()
+    pool.signers = [Signer(SimpleNamespace(address=address)) for address in ADDRESSES]
+
+    def claim():
+        monkeypatch.setattr(signer_pool, "LEASE_OWNER", owner)
+        return pool.claim_leases()
+    return pool, claim
+
+
+@pytest.fixture(autouse=True)
+def _no_leases():
+    for key in get_backend().items(SIGNER_LEASES):
+        get_backend().delete(SIGNER_LEASES, key)
+
+
+def test_a_key_is_leased_to_one_worker(monkeypatch):
+    first, claim_first = _worker(monkeypatch, "host:1")
+    second, claim_second = _worker(monkeypatch, "host:2")
+
+    assert len(claim_first()) == 2
+    assert claim_second() == []
+    assert len(claim_first()) == 2  # renewal keeps them
+
+
+def test_expired_lease_is_taken_over_with_a_fresh_nonce(monkeypatch):
+    first, claim_first = _worker(monkeypatch, "host:1")
+    second, claim_second = _worker(monkeypatch, "host:2")
+    claim_first()
+    monkeypatch.setattr(signer_pool, "SIGNER_LEASE_TTL", 0)
+    for signer in second.signers:
+        signer.next_nonce = 7
+
+    assert len(claim_second()) == 2
+    assert all(signer.next_nonce is None for signer in second.signers)
+    monkeypatch.setattr(signer_pool, "SIGNER_LEASE_TTL", 60)
+    assert claim_first() == []
+
+
+def test_released_keys_are_free_again(monkeypatch):
+    first, claim_first = _worker(monkeypatch, "host:1")
+    second, claim_second = _worker(monkeypatch, "host:2")
+    claim_first()
+    monkeypatch.setattr(signer_pool, "LEASE_OWNER", "host:1")
+    first.release_leases()
+
+    assert len(claim_second()) == 2
+    assert first.available == []
+
+
+def test_pick_only_uses_leased_signers():
+    pool = SignerPool()
+    pool.signers = [Signer(SimpleNamespace(address=address)) for address in ADDRESSES]
+    pool.signers[1].leased = True
+    assert pool.pick() is pool.signers[1]
@@ -0,0 +1,106 @@
+"""Atomic primitives of the shared backends, raced from several "workers" """
+import threading
+
+import pytest
+
+from redis_standin import RedisStandIn
+from state_backend import MemoryBackend, SQLiteBackend, RedisBackend, RedisError
+
+WORKERS = 8
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def workers(request, tmp_path):
+    """One backend instance per worker, all sharing the same state"""
+    if request.param == "memory":
+        shared = MemoryBackend()
+        yield [shared] * WORKERS
+    elif request.param == "sqlite":
+        path = str(tmp_path / "state.db")
+        backends = [SQLiteBackend(path) for _ in range(WORKERS)]
+        yield backends
+        for backend in backends:
+            backend.close()
+    else:
+        server = RedisStandIn().start()
+        backends = [RedisBackend(server.url, prefix="test") for _ in range(WORKERS)]
+        yield backends
+        for backend in backends:
+            backend.close()
+        server.shutdown()
+        server.server_close()
+
+
+def _race(workers, fn):
+    """Run fn(backend) once per worker, all at the same time, returns the results"""
+    barrier = threading.Barrier(len(workers))
+    results = [None] * len(workers)
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn(workers[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_update_never_loses_an_increment(workers):
+    def increment(backend):
+        for _ in range(25):
+            backend.update("spins", "7", lambda n: ((n or 0) + 1, None))
+
+    _race(workers, increment)
+    assert workers[0].get("spins", "7") == WORKERS * 25
+
+
+def test_set_if_absent_has_one_winner(workers):
+    results = _race(workers, lambda backend: backend.set_if_absent("claimed_messages", "1:2", {"user_id": 1}))
+    assert results.count(True) == 1
+
+
+def test_pop_hands_the_value_to_one_worker(workers):
+    workers[0].set("pending_claims", "7", {"prize_name": "1 CDT"})
+    results = _race(workers, lambda backend: backend.pop("pending_claims", "7"))
+
+    assert [r for r in results if r is not None] == [{"prize_name": "1 CDT"}]
+    assert workers[0].get("pending_claims", "7") is None
+
+
+def test_update_returning_none_deletes(workers):
+    backend = workers[0]
+    backend.set("claim_locks", "7", 1.0)
+    assert backend.update("claim_locks", "7", lambda held: (None, held)) == 1.0
+    assert backend.items("claim_locks") == {}
+
+
+def test_iter_items_pages_through_everything(workers):
+    backend = workers[0]
+    for i in range(23):
+        backend.set("users", str(i), {"username": f"u{i}"})
+    assert dict(backend.iter_items("users", batch=5)) == backend.items("users")
+    assert len(backend.items("users")) == 23
+
+
+def test_redis_update_conflicts_only_on_its_own_key():
+    server = RedisStandIn().start()
+    watcher, other = RedisBackend(server.url, prefix="test", max_retries=1), RedisBackend(server.url, prefix="test")
+
+    def write_then(key):
+        def fn(current):
+            other.set("claim_locks", key, 2.0)  # another worker, between WATCH and EXEC
+            return 1.0, "done"
+        return fn
+
+    try:
+        assert watcher.update("claim_locks", "7", write_then("8")) == "done"
+        with pytest.raises(RedisError):
+            watcher.update("claim_locks", "7", write_then("7"))
+    finally:
+        watcher.close()
+        other.close()
+        server.shutdown()
+        server.server_close()
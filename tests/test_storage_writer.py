@@ -0,0 +1,83 @@
+"""Group commits of the storage writer: ordering, latest render, atomic files"""
+import os
+import threading
+
+import pytest
+
+from storage_writer import StorageWriter
+
+
+@pytest.fixture
+def writer():
+    return StorageWriter(window=0.005)
+
+
+def test_appends_keep_their_order_across_commits(writer, tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    for i in range(50):
+        future = writer.append(path, f"{i}\n")
+        if i % 10 == 0:
+            future.result()  # the next lines go to another commit
+    writer.flush()
+
+    assert open(path).read().split() == [str(i) for i in range(50)]
+    assert writer.commits > 1
+
+
+def test_concurrent_appends_share_a_commit(writer, tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    barrier = threading.Barrier(8)
+
+    def append(i):
+        barrier.wait()
+        writer.append(path, f"{i}\n").result()
+
+    threads = [threading.Thread(target=append, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(open(path).read().split(), key=int) == [str(i) for i in range(8)]
+    assert writer.commits < 8
+
+
+def test_replace_writes_the_latest_render_only(writer, tmp_path):
+    path = str(tmp_path / "state.json")
+    rendered = []
+
+    def render(text):
+        def _render():
+            rendered.append(text)
+            return text
+        return _render
+
+    writer.replace(path, render("old"))
+    writer.replace(path, render("new")).result()
+
+    assert open(path).read() == "new"
+    assert rendered == ["new"]
+
+
+def test_replace_leaves_no_temp_file_and_keeps_the_old_file_on_error(writer, tmp_path):
+    path = tmp_path / "state.json"
+    writer.replace(str(path), lambda: "v1").result()
+
+    def broken():
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        writer.replace(str(path), broken).result()
+    assert path.read_text() == "v1"
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_rotate_splits_appends_at_the_call(writer, tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    writer.append(path, "1\n")
+    writer.append(path, "2\n")
+    writer.rotate(path, path + ".2")
+    writer.append(path, "3\n").result()
+
+    assert open(path + ".2").read() == "1\n2\n"
+    assert open(path).read() == "3\n"
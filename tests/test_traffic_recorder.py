@@ -0,0 +1,36 @@
+"""Recorded updates never keep a real wallet address or a reversible user id"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import traffic_recorder
+from storage_writer import writer
+from traffic_recorder import WALLET_PLACEHOLDER
+
+WALLET = "ab" * 20
+
+
+def test_wallets_are_replaced_with_or_without_prefix():
+    prefixed = traffic_recorder._scrub_text(f"/wallet 0x{WALLET}")
+    bare = traffic_recorder._scrub_text(f"/wallet {WALLET}")
+
+    assert prefixed == bare == f"/wallet {WALLET_PLACEHOLDER}"
+
+
+def test_longer_hex_strings_are_left_alone():
+    tx_hash = "0x" + "cd" * 32
+    assert traffic_recorder._scrub_text(tx_hash) == tx_hash
+
+
+def test_updates_are_recorded_through_the_writer(tmp_path):
+    recorder = traffic_recorder.UpdateRecorder(str(tmp_path / "updates.ndjson"))
+    update = SimpleNamespace(to_dict=lambda: {"message": {"from": {"id": 42, "first_name": "Ana"}, "text": f"0x{WALLET}"}})
+
+    asyncio.run(recorder.handle(update, None))
+    writer.flush()
+
+    [line] = (tmp_path / "updates.ndjson").read_text().splitlines()
+    message = json.loads(line)["update"]["message"]
+    assert message["from"]["id"] == traffic_recorder.hash_id(42) != 42
+    assert message["from"]["first_name"] != "Ana"
+    assert message["text"] == WALLET_PLACEHOLDER
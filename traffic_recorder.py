@@ -0,0 +1,104 @@
+"""
+Opt-in recorder of incoming updates (RECORD_UPDATES_FILE)
+Writes every Update the bot receives as one anonymised NDJSON line, so
+real traffic shapes can be replayed offline with traffic_replay.py:
+
+    {"ts": 1760000000.123, "update": {...Bot API update...}}
+
+Anonymisation:
+  - user ids (and private chat ids) are replaced by a salted hash, the
+    same user always maps to the same id so per-user cooldowns replay.
+    The salt is RECORD_SALT when set (keep it secret) or else random per
+    recording: user ids are only ~2^33, a known salt would reverse them
+  - names and usernames are replaced by placeholders
+  - wallet addresses anywhere in text are replaced by WALLET_PLACEHOLDER,
+    nothing derived from the real address is kept
+  - ids inside callback data (claim_<id>_..., retry_claim_<id>) and
+    tg://user?id= links are hashed like the user ids
+Group chat ids and topic ids are kept: they are needed to pass the
+topic check and identify nobody.
+
+Lines are queued to the storage writer thread, recording never does
+file I/O on the event loop.
+"""
+import hashlib
+import json
+import logging
+import re
+import secrets
+import time
+from telegram import Update
+from telegram.ext import TypeHandler
+from config import RECORD_SALT
+from storage_writer import writer
+
+logger = logging.getLogger(__name__)
+
+# The 0x prefix is optional, like in /wallet (address_utils)
+WALLET_RE = re.compile(r"\b(?:0x)?[0-9a-fA-F]{40}\b")
+USER_LINK_RE = re.compile(r"(tg://user\?id=)(\d+)")
+CALLBACK_ID_RE = re.compile(r"(?<=_)(\d{5,})(?=_|$)")
+USER_KEYS = {"from", "user", "forward_from", "via_bot", "sender_user"}
+NAME_KEYS = {"first_name", "last_name", "username", "title"}
+WALLET_PLACEHOLDER = "0x000000000000000000000000000000000000dEaD"
+
+_salt = RECORD_SALT or secrets.token_hex(16)
+
+def _digest(value):
+    return hashlib.sha256(f"{_salt}:{value}".encode()).hexdigest()
+
+def hash_id(user_id):
+    """Stable positive fake id for a real user id"""
+    return int(_digest(user_id)[:12], 16)
+
+def _scrub_text(text):
+    text = WALLET_RE.sub(WALLET_PLACEHOLDER, text)
+    return USER_LINK_RE.sub(lambda m: f"{m.group(1)}{hash_id(m.group(2))}", text)
+
+def anonymise(obj, key=None):
+    """Anonymised copy of a Bot API object (dicts/lists from Update.to_dict())"""
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if k == "id" and key in USER_KEYS:
+                out[k] = hash_id(v)
+            elif k == "id" and key == "chat" and isinstance(v, int) and v > 0:
+                out[k] = hash_id(v)  # private chat id == user id
+            elif k in NAME_KEYS and key in USER_KEYS | {"chat"}:
+                out[k] = f"{k}_{_digest(v)[:6]}" if obj.get("type") != "supergroup" else v
+            elif k == "data" and key == "callback_query" and isinstance(v, str):
+                out[k] = CALLBACK_ID_RE.sub(lambda m: str(hash_id(m.group(1))), v)
+            else:
+                out[k] = anonymise(v, k)
+        return out
+    if isinstance(obj, list):
+        return [anonymise(v, key) for v in obj]
+    if isinstance(obj, str):
+        return _scrub_text(obj)
+    return obj
+
+class UpdateRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+
+    def write(self, update):
+        """Queue one anonymised line (the writer thread appends it)"""
+        line = json.dumps({"ts": time.time(), "update": anonymise(update.to_dict())}, ensure_ascii=False)
+        writer.append(self.path, line + "\n")
+        self.recorded += 1
+
+    async def handle(self, update, context):
+        try:
+            self.write(update)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record update: {e}")
+
+def install(application, path):
+    """Record every update before any other handler sees it (group -1)"""
+    recorder = UpdateRecorder(path)
+    application.add_handler(TypeHandler(Update, recorder.handle), group=-1)
+    if not RECORD_SALT:
+        logger.info("🎙️ RECORD_SALT not set, user ids are hashed with a random salt for this recording")
+    logger.info(f"🎙️ Recording anonymised updates to {path}")
+    return recorder
@@ -0,0 +1,131 @@
+"""
+Replay a recorded update log (traffic_recorder.py) at 1x-100x speed
+Feeds the anonymised updates into the real Application through the fake
+Bot API (fake_telegram.py), with claims paid on the fake chain
+(fake_rpc.py), keeping the original inter-arrival times divided by
+--speed. Reports, per time window, updates fed, replies, reply latency
+and backlog, so performance changes can be compared on real traffic.
+
+Usage:
+    python traffic_replay.py updates.ndjson [--speed 10] [--concurrent 0]
+                             [--window 5] [--chat-rate 0] [--global-rate 30]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from bench_telegram import REPO_DIR, _free_port, _percentile
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r["ts"])
+
+
+async def _replay(server, application, records, args):
+    timeline = []
+    fed = [0]
+
+    async def _feed():
+        first = records[0]["ts"]
+        start = time.perf_counter()
+        for record in records:
+            delay = (record["ts"] - first) / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            server.inject_update(record["update"])
+            fed[0] += 1
+
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        start = time.perf_counter()
+        feeder = asyncio.create_task(_feed())
+        fed_before = replies_before = 0
+        while True:
+            await asyncio.sleep(args.window)
+            now = time.perf_counter() - start
+            latencies = sorted(server.reply_latencies[replies_before:])
+            backlog = server.pending_updates() + application.update_queue.qsize()
+            timeline.append((now, fed[0] - fed_before, len(latencies), latencies, backlog))
+            fed_before, replies_before = fed[0], len(server.reply_latencies)
+            if feeder.done() and backlog == 0 and not latencies:
+                break
+
+        await application.updater.stop()
+        await application.stop()
+    return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="NDJSON file written with RECORD_UPDATES_FILE")
+    parser.add_argument("--speed", type=float, default=10, help="replay speed factor (1-100)")
+    parser.add_argument("--concurrent", type=int, default=0, help="concurrent updates (0 = sequential)")
+    parser.add_argument("--window", type=float, default=5, help="report window in seconds")
+    parser.add_argument("--chat-rate", type=int, default=0)
+    parser.add_argument("--global-rate", type=int, default=30)
+    parser.add_argument("--rpc-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    if not 1 <= args.speed <= 100:
+        parser.error("--speed must be between 1 and 100")
+
+    records = _load(os.path.abspath(args.log))
+    if not records:
+        sys.exit("Empty update log")
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="tribo-replay-"))
+
+    # config.py reads the environment at import time, set it up first
+    tg_port, rpc_port = _free_port(), _free_port()
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:fake"
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{tg_port}/bot"
+    os.environ["STATE_BACKEND"] = "memory"
+    os.environ["RPC_URL"] = f"http://127.0.0.1:{rpc_port}"
+    os.environ["PRIVATE_KEY"] = "0x" + "11" * 32
+    os.environ["CONTRACT_ADDRESS"] = "0x" + "c0" * 20
+    os.environ.pop("RECORD_UPDATES_FILE", None)
+
+    from fake_rpc import FakeRPC
+    from fake_telegram import FakeTelegram
+    rpc = FakeRPC(port=rpc_port, contract=os.environ["CONTRACT_ADDRESS"], latency=args.rpc_latency).start()
+    rpc.chain.seed_prizes()
+    server = FakeTelegram(port=tg_port, chat_rate=args.chat_rate, global_rate=args.global_rate).start()
+
+    import main as bot_main
+    application = bot_main.build_application(concurrent_updates=args.concurrent or False)
+
+    logging.disable(logging.CRITICAL)
+    with contextlib.redirect_stdout(io.StringIO()):
+        timeline = asyncio.run(_replay(server, application, records, args))
+    logging.disable(logging.NOTSET)
+    server.stop()
+    rpc.stop()
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    print("=" * 60)
+    print("TRAFFIC REPLAY")
+    print("=" * 60)
+    print(f"log: {args.log}  updates: {len(records)}  recorded span: {span:.0f}s  speed: {args.speed:g}x")
+    print(f"{'t (s)':>7} {'fed':>6} {'replies':>8} {'p50':>7} {'p95':>7} {'backlog':>8}")
+    for now, fed, replies, latencies, backlog in timeline:
+        p50 = f"{_percentile(latencies, 0.5):.2f}" if latencies else "-"
+        p95 = f"{_percentile(latencies, 0.95):.2f}" if latencies else "-"
+        print(f"{now:7.1f} {fed:6} {replies:8} {p50:>7} {p95:>7} {backlog:8}")
+    limited = sum(server.rate_limited.values())
+    print(f"bot api calls: {sum(server.calls.values()) - server.calls['getUpdates']}  429s: {limited}")
+    print(f"rpc calls: {sum(rpc.chain.calls.values())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Treasury monitor
+Polls the gas balance of every signer and the contract balance of every prize token
+in the background and keeps a payability table in memory, so the slot
+can stop drawing prizes the contract cannot pay and the admin hears
+about it before a winner does.
+"""
+import asyncio
+import logging
+import time
+from config import (
+    PRIZES,
+    ADMIN_ID,
+    TREASURY_POLL_INTERVAL,
+    TREASURY_MIN_ETH,
+    TREASURY_LOW_PAYOUTS,
+    TREASURY_UNPAYABLE_WEIGHT
+)
+import web3_payment
+from signer_pool import pool, MIN_ETH_WEI
+from multicall import read_balances
+
+logger = logging.getLogger(__name__)
+
+# prize name -> {"balance": int, "payouts_left": int, "payable": bool}
+payability = {}
+eth_balance = None  # best gas balance among the signers
+last_update = None
+
+_alerts = set()  # active alert keys, each alert is sent once until it clears
+_monitor_task = None
+
+def _poll():
+    """Read every signer gas balance and every prize token balance in one multicall (blocking)"""
+    w3, contract = web3_payment.w3, web3_payment.contract
+    token_balances, gas_balances = read_balances(
+        w3, contract,
+        tokens=[p['token'] for p in PRIZES],
+        addresses=[s.address for s in pool.signers]
+    )
+    if None in token_balances.values():
+        raise RuntimeError(f"token balance read failed: {token_balances}")
+    pool.update_balances(gas_balances)
+    gas = max(gas_balances.values())
+    return gas, {p['name']: token_balances[p['token']] for p in PRIZES}
+
+def _build_table(gas, balances):
+    table = {}
+    for prize in PRIZES:
+        balance = balances[prize['name']]
+        payouts_left = balance // int(prize['amount'])
+        table[prize['name']] = {
+            "balance": balance,
+            "payouts_left": payouts_left,
+            "payable": payouts_left > 0 and gas >= MIN_ETH_WEI
+        }
+    return table
+
+def _pending_alerts():
+    """Alert key -> message for every threshold currently crossed"""
+    alerts = {}
+    for signer in pool.needs_top_up():
+        alerts[f"gas:{signer.address}"] = (
+            f"⛽ Signer <code>{signer.address}</code> needs a gas top-up: {signer.balance / 10**18:.6f} ETH "
+            f"(minimum {TREASURY_MIN_ETH} ETH)."
+        )
+    for name, row in payability.items():
+        if row["payouts_left"] == 0:
+            effect = "it is no longer drawn" if TREASURY_UNPAYABLE_WEIGHT == 0 else "its odds were reduced"
+            alerts[f"empty:{name}"] = f"🚫 The contract can't pay {name} anymore, {effect}."
+        elif row["payouts_left"] < TREASURY_LOW_PAYOUTS:
+            alerts[f"low:{name}"] = f"⚠️ Only {row['payouts_left']} payouts of {name} left in the contract."
+    return alerts
+
+async def _send_alerts(bot):
+    pending = _pending_alerts()
+    for key, text in pending.items():
+        if key in _alerts:
+            continue
+        try:
+            await bot.send_message(chat_id=ADMIN_ID, text=f"🏦 Treasury\n\n{text}", parse_mode='HTML')
+            _alerts.add(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not send treasury alert: {e}")
+    # Cleared alerts can fire again next time the threshold is crossed
+    _alerts.intersection_update(pending)
+
+async def refresh(bot=None):
+    """Poll the balances once and update the payability table"""
+    global payability, eth_balance, last_update
+    if not await web3_payment.wait_until_ready():
+        return False
+    gas, balances = await asyncio.to_thread(_poll)
+    eth_balance = gas
+    payability = _build_table(gas, balances)
+    last_update = time.time()
+    if bot is not None:
+        await _send_alerts(bot)
+    return True
+
+async def run_monitor(bot):
+    while True:
+        try:
+            await refresh(bot)
+        except Exception as e:
+            logger.error(f"❌ Treasury poll failed: {e}")
+        await asyncio.sleep(TREASURY_POLL_INTERVAL)
+
+def start_monitor(bot):
+    """Start the background polling task (idempotent)"""
+    global _monitor_task
+    if _monitor_task is None:
+        _monitor_task = asyncio.create_task(run_monitor(bot))
+        logger.info(f"🏦 Treasury monitor started, polling every {TREASURY_POLL_INTERVAL}s")
+    return _monitor_task
+
+def record_payout(prize_name):
+    """Subtract a paid prize from the table so it stays accurate between polls"""
+    row = payability.get(prize_name)
+    if row is None:
+        return
+    prize = web3_payment.get_prize_by_name(prize_name)
+    for other in PRIZES:
+        if other['token'].lower() == prize['token'].lower():
+            other_row = payability[other['name']]
+            other_row["balance"] = max(0, other_row["balance"] - int(prize['amount']))
+            other_row["payouts_left"] = other_row["balance"] // int(other['amount'])
+            other_row["payable"] = other_row["payouts_left"] > 0 and other_row["payable"]
+
+def prize_weight(prize_name):
+    """
+    Multiplier applied to a prize probability.
+    Unknown prizes (no poll yet, Web3 not configured) are left untouched.
+    """
+    row = payability.get(prize_name)
+    if row is None or row["payable"]:
+        return 1.0
+    return TREASURY_UNPAYABLE_WEIGHT
@@ -0,0 +1,126 @@
+"""
+User directory: users, their wallets and who shares a wallet
+The backend "users" namespace stays the source of truth. On top of it:
+
+  - an in-memory index of the users this process has seen, so the
+    register_user() on every /slot only writes when the name changed
+  - a reverse index wallet -> user ids, stored in the backend and kept in
+    step by set_user_wallet, so "who else uses this wallet" (multi-account
+    farming) is one key lookup instead of a scan of every user
+
+The reverse index is built from the users once per backend (once per
+start for the json and memory backends, which keep it in memory).
+"""
+import logging
+from state_backend import get_backend
+
+logger = logging.getLogger(__name__)
+
+USERS = "users"
+WALLET_USERS = "wallet_users"  # lowercased wallet -> sorted [user_id]
+DIRECTORY_META = "user_directory"  # "wallet_index" -> 1 once the reverse index is built
+
+_users = {}  # str(user_id) -> user record as last read or written by this process
+_loaded = False
+
+def _link(wallet, user_id):
+    def _add(ids):
+        ids = ids or []
+        if user_id not in ids:
+            ids = sorted(ids + [user_id])
+        return ids, ids
+    return get_backend().update(WALLET_USERS, wallet.lower(), _add)
+
+def _unlink(wallet, user_id):
+    def _remove(ids):
+        ids = [i for i in ids or [] if i != user_id]
+        return ids or None, None
+    get_backend().update(WALLET_USERS, wallet.lower(), _remove)
+
+def load():
+    """Fill the in-memory index and, first time on this backend, the reverse index"""
+    global _loaded
+    if _loaded:
+        return
+    backend = get_backend()
+    users = backend.items(USERS)
+    _users.update(users)
+    if backend.set_if_absent(DIRECTORY_META, "wallet_index", 1):
+        for user_id, user in users.items():
+            if user.get("wallet"):
+                _link(user["wallet"], int(user_id))
+        logger.info(f"📇 Wallet index built from {len(users)} users")
+    _loaded = True
+
+def register_user(user_id, username):
+    """Register a user if not exists, writes only when the username changed"""
+    load()
+    key = str(user_id)
+    known = _users.get(key)
+    if known is not None and known.get("username") == username:
+        return
+
+    def _register(user):
+        if user is None:
+            user = {"username": username, "wallet": None}
+        elif user.get("username") != username:
+            user = dict(user, username=username)
+        return user, user
+
+    _users[key] = get_backend().update(USERS, key, _register)
+
+def set_user_wallet(user_id, wallet):
+    """Set wallet address for a user, False if the user is not registered"""
+    load()
+    key = str(user_id)
+
+    def _set_wallet(user):
+        if user is None:
+            return None, None
+        return dict(user, wallet=wallet), user
+
+    before = get_backend().update(USERS, key, _set_wallet)
+    if before is None:
+        return False
+    _users[key] = dict(before, wallet=wallet)
+    old = before.get("wallet")
+    if old and old.lower() != wallet.lower():
+        _unlink(old, user_id)
+    _link(wallet, user_id)
+    return True
+
+def get_user_wallet(user_id):
+    """Get wallet address for a user"""
+    return (get_user_data(user_id) or {}).get("wallet")
+
+def get_user_data(user_id):
+    """Get full user data"""
+    user = get_backend().get(USERS, str(user_id))
+    if user is not None:
+        _users[str(user_id)] = user
+    return user
+
+def get_username(user_id):
+    """Username from the in-memory index, falling back to the backend"""
+    user = _users.get(str(user_id)) or get_user_data(user_id) or {}
+    return user.get("username") or str(user_id)
+
+# -------------------- Shared wallets --------------------
+
+def users_for_wallet(wallet):
+    """Every user id registered with this wallet"""
+    load()
+    return get_backend().get(WALLET_USERS, wallet.lower(), [])
+
+def others_on_wallet(user_id, wallet):
+    """The other accounts using this wallet (empty unless it is shared)"""
+    return [i for i in users_for_wallet(wallet) if i != user_id]
+
+def shared_wallets(min_users=2):
+    """[(wallet, [user_id])] for wallets used by min_users or more, most shared first"""
+    load()
+    groups = [
+        (wallet, ids) for wallet, ids in get_backend().items(WALLET_USERS).items()
+        if len(ids) >= min_users
+    ]
+    return sorted(groups, key=lambda group: len(group[1]), reverse=True)
@@ -1,46 +1,107 @@
 import asyncio
-from web3 import Web3
-from eth_account import Account
-from config import RPC_URL, PRIVATE_KEY, CONTRACT_ADDRESS, CONTRACT_ABI, CHAIN_ID, PRIZES
+import logging
+import uuid
+from config import RPC_URL, CONTRACT_ADDRESS, CONTRACT_ABI, CHAIN_ID, PRIZES
+from signer_pool import pool, configured_keys, load_pool
+from multicall import read_balances
+from structured_log import log_context
+from circuit_breaker import middleware as circuit_middleware, CircuitOpenError
+from address_utils import validate_address
+import payout_ledger
+
+# web3 / eth_account are imported lazily (inside the init functions): they are
+# the heaviest part of startup and the bot must answer /slot before they load.
+
+logger = logging.getLogger(__name__)
 
 # Initialize Web3
 w3 = None
 account = None
 contract = None
 
+WEB3_READY_TIMEOUT = 30  # Max seconds a claim waits for the background warm-up
+_warm_up_task = None
+
+def _is_configured():
+    if not RPC_URL or not configured_keys() or not CONTRACT_ADDRESS:
+        logger.warning("⚠️ Web3 not configured. Set RPC_URL, PRIVATE_KEY (or PRIVATE_KEYS), and CONTRACT_ADDRESS environment variables.")
+        return False
+    return True
+
+def _load_account():
+    """Import eth_account and load the signer pool, returns the primary wallet"""
+    return load_pool().primary.account
+
+def _connect_rpc():
+    """Import web3, connect to the RPC and bind the contract"""
+    from web3 import Web3
+    web3 = Web3(Web3.HTTPProvider(RPC_URL))
+    web3.middleware_onion.add(circuit_middleware, "circuit_breaker")
+    if not web3.is_connected():
+        logger.warning(f"⚠️ RPC not reachable at startup: {RPC_URL}")
+    bound = web3.eth.contract(
+        address=web3.to_checksum_address(CONTRACT_ADDRESS),
+        abi=CONTRACT_ABI
+    )
+    return web3, bound
+
+def _log_ready():
+    logger.info(f"🔗 Web3 initialized. Bot wallet: {account.address} ({len(pool.signers)} signer(s)), "
+                f"contract {CONTRACT_ADDRESS}, chain {CHAIN_ID}")
+
 def init_web3():
     """Initialize Web3 connection"""
     global w3, account, contract
     
-    if not RPC_URL or not PRIVATE_KEY or not CONTRACT_ADDRESS:
-        print("[v0] Warning: Web3 not configured. Set RPC_URL, PRIVATE_KEY, and CONTRACT_ADDRESS environment variables.")
+    if not _is_configured():
         return False
     
     try:
-        w3 = Web3(Web3.HTTPProvider(RPC_URL))
-        account = Account.from_key(PRIVATE_KEY)
-        contract = w3.eth.contract(
-            address=w3.to_checksum_address(CONTRACT_ADDRESS),
-            abi=CONTRACT_ABI
-        )
-        print(f"[v0] Web3 initialized. Bot wallet: {account.address}")
-        print(f"[v0] Contract address: {CONTRACT_ADDRESS}")
-        print(f"[v0] Chain ID: {CHAIN_ID}")
+        account = _load_account()
+        w3, contract = _connect_rpc()
+        _log_ready()
         return True
     except Exception as e:
-        print(f"[v0] Error initializing Web3: {e}")
-        import traceback
-        print(f"[v0] Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Error initializing Web3: {e}")
+        return False
+
+async def _warm_up():
+    global w3, account, contract
+
+    if not _is_configured():
         return False
 
-def validate_address(addr):
-    """Validate Ethereum address"""
-    if not w3:
-        return None
     try:
-        return w3.to_checksum_address(addr)
-    except:
-        return None
+        # Account loading and the RPC connectivity check run in parallel threads
+        loaded_account, (web3, bound) = await asyncio.gather(
+            asyncio.to_thread(_load_account),
+            asyncio.to_thread(_connect_rpc)
+        )
+        account, w3, contract = loaded_account, web3, bound
+        _log_ready()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error initializing Web3: {e}")
+        return False
+
+def start_warm_up():
+    """
+    Initialize Web3 in the background without blocking the event loop.
+    Returns the task; claims arriving before it finishes wait for it.
+    """
+    global _warm_up_task
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.create_task(_warm_up())
+    return _warm_up_task
+
+async def wait_until_ready(timeout=WEB3_READY_TIMEOUT):
+    """Wait for the background warm-up, returns True if Web3 is usable"""
+    if _warm_up_task is not None and not _warm_up_task.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(_warm_up_task), timeout)
+        except asyncio.TimeoutError:
+            return False
+    return w3 is not None and account is not None and contract is not None
 
 def get_prize_by_name(prize_name):
     """Get prize configuration by name"""
@@ -49,127 +110,164 @@ def get_prize_by_name(prize_name):
             return prize
     return None
 
-async def process_claim(prize_name, wallet_address, bot, chat_id):
+async def process_claim(prize_name, wallet_address, bot, chat_id, on_sent=None, ref=None):
     """
     Process blockchain claim for a prize
-    Returns: (success: bool, message: str, tx_hash: str or None)
+    Returns: (success: bool or None, message: str, tx_hash: str or None)
+    success is None when a sent transaction is still unmined after every fee
+    bump, or could no longer be tracked: it may confirm later, so the claim
+    must not be sent again.
+    Raises CircuitOpenError if the RPC circuit opened before anything was sent.
+    on_sent(tx_hash) is awaited once the transaction is broadcast.
+    ref identifies the prize being paid (its message) in the payout ledger.
     """
-    print(f"[v0] === Starting process_claim ===")
-    print(f"[v0] Prize: {prize_name}")
-    print(f"[v0] Wallet: {wallet_address}")
-    print(f"[v0] Chat ID: {chat_id}")
+    claim_id = uuid.uuid4().hex[:8]
+    with log_context(claim_id=claim_id):
+        prize = get_prize_by_name(prize_name) or {}
+        attempt = payout_ledger.start(claim_id, ref, prize_name, prize.get('token'), prize.get('amount'), wallet_address)
+
+        async def _on_sent(tx_hash):
+            payout_ledger.sent(attempt, tx_hash, ref)
+            if on_sent is not None:
+                await on_sent(tx_hash)
+
+        try:
+            result = await _process_claim(prize_name, wallet_address, bot, chat_id, _on_sent, attempt)
+        except CircuitOpenError:
+            payout_ledger.finish(attempt, "parked", error="RPC circuit open")
+            raise
+        except BaseException as e:
+            payout_ledger.close(attempt, f"{type(e).__name__}: {e}")
+            raise
+        # Attempts that ended without a receipt: failed, or unconfirmed if something was sent
+        payout_ledger.close(attempt, result[1])
+        return result
+
+async def _process_claim(prize_name, wallet_address, bot, chat_id, on_sent, attempt):
+    # Imported here: gas_cache and treasury import web3_payment, fee_engine needs web3
+    from gas_cache import get_gas_limit, invalidate as invalidate_gas
+    from treasury import record_payout
+    from fee_engine import estimate_fees, max_fee_per_gas, send_with_replacement
+    
+    logger.info(f"💸 Claim started: {prize_name} to {wallet_address}")
     
-    if not w3 or not account or not contract:
-        print(f"[v0] Web3 not initialized: w3={w3 is not None}, account={account is not None}, contract={contract is not None}")
+    if not await wait_until_ready():
+        logger.error(f"❌ Web3 not initialized: w3={w3 is not None}, account={account is not None}, contract={contract is not None}")
         return False, "Web3 not configured. Please contact admin.", None
     
     prize = get_prize_by_name(prize_name)
     if not prize:
-        print(f"[v0] Prize not found: {prize_name}")
+        logger.warning(f"⚠️ Prize not found: {prize_name}")
         return False, "Invalid prize.", None
     
-    print(f"[v0] Prize found: {prize}")
-    
     wallet = validate_address(wallet_address)
     if not wallet:
-        print(f"[v0] Invalid wallet address: {wallet_address}")
+        logger.warning(f"⚠️ Invalid wallet address: {wallet_address}")
         return False, "Invalid wallet address.", None
     
-    print(f"[v0] Wallet validated: {wallet}")
+    if not pool.available:
+        logger.error("❌ No signer leased to this worker")
+        return False, "No payout wallet is available right now. Please try again in a minute.", None
     
-    try:
-        token_address = w3.to_checksum_address(prize['token'])
-        amount = int(prize['amount'])
-        
-        print(f"[v0] Token address: {token_address}")
-        print(f"[v0] Amount: {amount}")
-        
-        # Check bot balance
-        eth_balance = w3.eth.get_balance(account.address)
-        print(f"[v0] Bot ETH balance: {w3.from_wei(eth_balance, 'ether')} ETH")
-        
-        if eth_balance == 0:
-            return False, "Bot has no ETH for gas. Please contact admin to fund the bot wallet.", None
-        
-        # Check contract token balance
+    sent = []  # hashes broadcast for this claim (replacements included)
+
+    async def _on_sent(tx_hash):
+        sent.append(tx_hash)
+        await on_sent(tx_hash)
+
+    with pool.checkout() as signer:
         try:
-            contract_balance = contract.functions.getBalance(token_address).call()
-            print(f"[v0] Contract token balance: {contract_balance}")
+            token_address = prize['token']
+            amount = int(prize['amount'])
             
-            if contract_balance < amount:
-                return False, f"Insufficient token balance in contract. Please contact admin.", None
-        except Exception as e:
-            print(f"[v0] Error checking contract balance: {e}")
-            # Continue anyway, let the transaction fail if needed
-        
-        nonce = w3.eth.get_transaction_count(account.address)
-        gas_price = w3.eth.gas_price
-        
-        print(f"[v0] Nonce: {nonce}, Gas price: {w3.from_wei(gas_price, 'gwei')} gwei")
-        
-        # Build transaction function call
-        func = contract.functions.claim(token_address, amount, wallet)
-        
-        # Estimate gas
-        try:
-            gas_est = func.estimate_gas({'from': account.address})
-            print(f"[v0] Gas estimate: {gas_est}")
-        except Exception as e:
-            print(f"[v0] Gas estimation failed: {e}")
-            import traceback
-            print(f"[v0] Traceback: {traceback.format_exc()}")
-            return False, f"Transaction would fail: {str(e)}", None
-        
-        tx_cost = gas_est * gas_price
-        
-        print(f"[v0] Transaction cost: {w3.from_wei(tx_cost, 'ether')} ETH")
-        
-        if eth_balance < tx_cost:
-            return False, f"Insufficient ETH for gas. Bot needs {w3.from_wei(tx_cost, 'ether')} ETH but has {w3.from_wei(eth_balance, 'ether')} ETH.", None
-        
-        # Build transaction
-        print(f"[v0] Building transaction...")
-        
-        tx = func.build_transaction({
-            'from': account.address,
-            'nonce': nonce,
-            'gas': int(gas_est * 1.2),
-            'gasPrice': gas_price,
-            'chainId': CHAIN_ID
-        })
-        
-        print(f"[v0] Transaction built successfully")
-        print(f"[v0] Transaction details: {tx}")
-        
-        # Sign transaction
-        print(f"[v0] Signing transaction...")
-        signed_tx = account.sign_transaction(tx)
-        print(f"[v0] Transaction signed successfully")
-        
-        # Send raw transaction
-        print(f"[v0] Sending transaction...")
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        print(f"[v0] Transaction sent! Hash: {tx_hash.hex()}")
-        
-        # Wait for receipt
-        print(f"[v0] Waiting for transaction receipt...")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
-        
-        print(f"[v0] Transaction receipt received")
-        print(f"[v0] Transaction status: {receipt['status']}")
-        print(f"[v0] Gas used: {receipt['gasUsed']}")
-        
-        if receipt['status'] == 1:
-            print(f"[v0] Transaction successful!")
-            return True, f"Claim successful! Sent {prize['name']} to your wallet.", tx_hash.hex()
-        else:
-            print(f"[v0] Transaction failed!")
-            return False, f"Transaction failed. TxHash: {tx_hash.hex()}", tx_hash.hex()
+            # Blocking RPC reads run in threads: a dead endpoint must not stall the event loop
+            # while the circuit breaker is still counting its failures
             
-    except Exception as e:
-        error_msg = str(e)
-        print(f"[v0] Error processing claim: {error_msg}")
-        import traceback
-        print(f"[v0] Full traceback:")
-        print(traceback.format_exc())
-        return False, f"Error processing claim: {error_msg}", None
+            # Signer ETH and contract token balance in one multicall
+            token_balances, eth_balances = await asyncio.to_thread(
+                read_balances, w3, contract, [token_address], [signer.address]
+            )
+            eth_balance = eth_balances[signer.address]
+            signer.balance = eth_balance
+            logger.debug(f"Signer {signer.address} ETH balance: {w3.from_wei(eth_balance, 'ether')} ETH")
+            
+            if eth_balance == 0:
+                return False, "Bot has no ETH for gas. Please contact admin to fund the bot wallet.", None
+            
+            # Check contract token balance
+            contract_balance = token_balances[token_address]
+            if contract_balance is None:
+                logger.warning(f"⚠️ Could not read contract balance of {token_address}")
+                # Continue anyway, let the transaction fail if needed
+            else:
+                logger.debug(f"Contract token balance: {contract_balance}")
+                
+                if contract_balance < amount:
+                    return False, f"Insufficient token balance in contract. Please contact admin.", None
+            
+            fees = await asyncio.to_thread(estimate_fees, w3)
+            gas_price = max_fee_per_gas(fees)
+            
+            # Build transaction function call
+            func = contract.functions.claim(token_address, amount, wallet)
+            
+            # Gas limit from the per-token cache (estimates only on a miss)
+            try:
+                gas_limit = await asyncio.to_thread(get_gas_limit, prize, wallet)
+            except Exception as e:
+                logger.warning(f"⚠️ Gas estimation failed for {prize['name']}: {e}")
+                return False, f"Transaction would fail: {str(e)}", None
+            
+            tx_cost = gas_limit * gas_price
+            
+            logger.debug(f"Fees {fees}, gas limit {gas_limit}, max cost {w3.from_wei(tx_cost, 'ether')} ETH")
+            
+            if eth_balance < tx_cost:
+                return False, f"Insufficient ETH for gas. Bot needs {w3.from_wei(tx_cost, 'ether')} ETH but has {w3.from_wei(eth_balance, 'ether')} ETH.", None
+            
+            # Build transaction
+            nonce = await asyncio.to_thread(signer.allocate_nonce, w3)
+            tx = func.build_transaction({
+                'from': signer.address,
+                'nonce': nonce,
+                'gas': gas_limit,
+                'chainId': CHAIN_ID,
+                **fees
+            })
+            
+            # Sign, send and wait; rebroadcast with bumped fees if it gets stuck
+            receipt, tx_hash = await send_with_replacement(w3, signer.account, tx, _on_sent)
+            
+            if receipt is None:
+                logger.warning(f"⚠️ Claim tx still pending: {tx_hash.hex()}")
+                payout_ledger.finish(attempt, "pending", tx_hash.hex())
+                return None, f"Transaction is still pending, it will confirm later. TxHash: {tx_hash.hex()}", tx_hash.hex()
+            
+            if receipt['status'] == 1:
+                logger.info(f"✅ Claim paid: {prize['name']} to {wallet}, tx {tx_hash.hex()} (gas used {receipt['gasUsed']})")
+                record_payout(prize['name'])
+                payout_ledger.finish(attempt, "paid", tx_hash.hex())
+                return True, f"Claim successful! Sent {prize['name']} to your wallet.", tx_hash.hex()
+            else:
+                logger.error(f"❌ Claim tx reverted: {tx_hash.hex()}")
+                invalidate_gas(prize)
+                payout_ledger.finish(attempt, "reverted", tx_hash.hex())
+                return False, f"Transaction failed. TxHash: {tx_hash.hex()}", tx_hash.hex()
+                
+        except Exception as e:
+            if sent:
+                # Something may be mined: never hand this back as a failure a retry would pay again
+                logger.exception(f"❌ Error tracking claim tx {sent[-1]}: {e}")
+                signer.needs_resync = True
+                payout_ledger.finish(attempt, "pending", sent[-1])
+                return None, f"Transaction status unknown, it will confirm later. TxHash: {sent[-1]}", sent[-1]
+            if isinstance(e, CircuitOpenError):
+                # Nothing reached the chain, the caller parks the claim
+                signer.needs_resync = True
+                raise
+            error_msg = str(e)
+            logger.exception(f"❌ Error processing claim: {error_msg}")
+            invalidate_gas(prize)
+            # The nonce may or may not have been used, re-read it once the signer is idle
+            signer.needs_resync = True
+            return False, f"Error processing claim: {error_msg}", None